@@ -0,0 +1,295 @@
+"""
+End-to-end benchmark of ``CodingAgent.process_request``.
+
+Runs multi-tool scenarios through the real agent against the local fake
+OpenAI server, so it works offline and without an API key, and reports how
+much time each phase adds on top of the simulated model:
+
+    python -m benchmarks.agent_bench --iterations 10 --latency 0.2
+
+Phases, in milliseconds per request:
+
+- ``context``: building the prompt (history, retrieved turns and code)
+- ``llm``: chat completion calls, including the simulated ``model`` time
+- ``client``: ``llm`` minus ``model``: HTTP, parsing and stream assembly
+- ``tools``: tool execution, summed over the tools of the request
+- ``tool_wait``: time the agent blocked waiting for tool results
+- ``memory``: recording the interaction in the session memory
+- ``overhead``: wall time minus ``model``, everything Malaz adds
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The agent builds its own client at startup; requests go to the fake server
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import openai
+from benchmarks.fake_openai import FakeOpenAIServer, scripted
+from core.agent import CodingAgent
+from core.memory import SessionMemory
+from core.tool_runner import ToolRunner
+
+PHASES = ["wall", "model", "context", "llm", "client", "tools", "tool_wait", "memory", "overhead"]
+
+PROJECT_FILES = {
+    "shop/__init__.py": '"""Tiny shop used by the agent benchmark"""\n',
+    "shop/models.py": (
+        "from dataclasses import dataclass, field\n\n"
+        "@dataclass\n"
+        "class Item:\n"
+        "    name: str\n"
+        "    price: float\n"
+        "    quantity: int = 1\n\n"
+        "@dataclass\n"
+        "class Order:\n"
+        "    customer: str\n"
+        "    items: list = field(default_factory=list)\n\n"
+        "    def add_item(self, item):\n"
+        "        self.items.append(item)\n"
+    ),
+    "shop/orders.py": (
+        "from shop.models import Order, Item\n\n"
+        "TAX_RATE = 0.11\n\n"
+        "def subtotal(order):\n"
+        "    return sum(item.price * item.quantity for item in order.items)\n\n"
+        "def calculate_total(order):\n"
+        "    \"\"\"Total price of an order including tax\"\"\"\n"
+        "    return round(subtotal(order) * (1 + TAX_RATE), 2)\n\n"
+        "def checkout(customer, items):\n"
+        "    order = Order(customer)\n"
+        "    for name, price in items:\n"
+        "        order.add_item(Item(name, price))\n"
+        "    return calculate_total(order)\n"
+    ),
+    "shop/reports.py": (
+        "from shop.orders import calculate_total\n\n"
+        "def revenue(orders):\n"
+        "    return sum(calculate_total(order) for order in orders)\n\n"
+        "def largest_order(orders):\n"
+        "    return max(orders, key=calculate_total, default=None)\n"
+    ),
+    "tests/test_orders.py": (
+        "from shop.orders import checkout\n\n"
+        "def test_checkout():\n"
+        "    assert checkout('ana', [('book', 10.0)]) == 11.1\n"
+    ),
+    "README.md": "# Shop\n\nA tiny shop: orders, items and revenue reports.\n",
+}
+
+SCENARIOS = {
+    # Look around before answering a question about the code
+    "explore": [
+        [("search_code", {"pattern": "calculate_total"}), ("find_definition", {"symbol": "Order"})],
+        [("analyze_code", {"file_path": "shop/orders.py"}), ("find_callers", {"symbol": "calculate_total"})],
+        "calculate_total applies TAX_RATE to the subtotal; reports.revenue and checkout call it.",
+    ],
+    # Find the code, change it, add a module and check the change
+    "edit": [
+        [("search_code", {"pattern": "TAX_RATE"})],
+        [
+            ("modify_file", {
+                "file_path": "shop/orders.py",
+                "patches": [{"old_line": "TAX_RATE = 0.11", "new_line": "TAX_RATE = 0.12"}]
+            }),
+            ("create_file", {
+                "file_path": "shop/discounts.py",
+                "content": "def apply_discount(total, percent):\n    return total * (1 - percent / 100)\n"
+            }),
+        ],
+        [("find_references", {"symbol": "TAX_RATE"}), ("search_code", {"pattern": "apply_discount"})],
+        "TAX_RATE is now 0.12 and shop/discounts.py adds apply_discount.",
+    ],
+    # Run a command and inspect the result
+    "shell": [
+        [("run_shell", {"command": f"{sys.executable} -c \"print('ok')\""})],
+        [("search_code", {"pattern": "def test_"})],
+        "The check passed.",
+    ],
+}
+
+def write_project(project_path):
+    for rel_path, content in PROJECT_FILES.items():
+        full_path = os.path.join(project_path, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+class PhaseTimer:
+    """Accumulate the time spent in wrapped callables, per phase"""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self._lock = threading.Lock()
+        self._restore = []
+
+    def wrap(self, owner, attribute, phase):
+        """Time every call of ``owner.attribute`` until ``restore``"""
+        original = getattr(owner, attribute)
+        timer = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with timer._lock:
+                    timer.totals[phase] += time.perf_counter() - start
+
+        if isinstance(owner, type):
+            # Patched on the class, so ``original`` is the plain function
+            # and ``self`` arrives in args
+            setattr(owner, attribute, timed)
+            self._restore.append(lambda: setattr(owner, attribute, original))
+        else:
+            setattr(owner, attribute, timed)
+            self._restore.append(lambda: delattr(owner, attribute))
+
+    def take(self):
+        """Return the totals so far and start over"""
+        with self._lock:
+            totals = dict(self.totals)
+            self.totals.clear()
+        return totals
+
+    def restore(self):
+        while self._restore:
+            self._restore.pop()()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_scenario(name, steps, iterations=5, stream=True, latency=0.0, chunk_delay=0.0):
+    """Run one scenario ``iterations`` times; returns per-request phase timings in seconds"""
+    project_path = tempfile.mkdtemp(prefix=f"malaz-bench-{name}-")
+    server = FakeOpenAIServer(scripted(steps), latency=latency, chunk_delay=chunk_delay).start()
+    timer = PhaseTimer()
+    samples = []
+    try:
+        write_project(project_path)
+        agent = CodingAgent(project_path)
+        agent.openai_client = openai.OpenAI(api_key="benchmark", base_url=server.base_url, max_retries=0)
+        # History summaries run in the background; keep them out of the numbers
+        memory = SessionMemory(session_id=f"bench-{name}", max_history=1000,
+                               summary_tokens=10 ** 9, project_path=project_path)
+
+        timer.wrap(agent, '_prepare_messages', 'context')
+        timer.wrap(agent, '_create_completion', 'llm')
+        timer.wrap(agent.tool_manager, 'execute_tool', 'tools')
+        timer.wrap(memory, 'add_interaction', 'memory')
+        timer.wrap(ToolRunner, 'result', 'tool_wait')
+
+        on_token = (lambda text: None) if stream else None
+        # The first request builds the indexes; measure warm requests
+        for i in range(iterations + 1):
+            write_project(project_path)
+            server.reset_log()
+            timer.take()
+            start = time.perf_counter()
+            agent.process_request(f"{name} request {i}", memory, on_token=on_token, use_cache=False)
+            wall = time.perf_counter() - start
+            if i == 0:
+                continue
+            phases = timer.take()
+            phases['wall'] = wall
+            phases['model'] = server.simulated_delay
+            phases['client'] = phases.get('llm', 0.0) - phases['model']
+            phases['overhead'] = wall - phases['model']
+            samples.append(phases)
+    finally:
+        timer.restore()
+        server.stop()
+        shutil.rmtree(project_path, ignore_errors=True)
+    return samples
+
+def summarize(samples):
+    """Get the median and p95 of each phase, in milliseconds"""
+    return {
+        phase: {
+            'median': round(percentile([s.get(phase, 0.0) for s in samples], 0.5) * 1000, 3),
+            'p95': round(percentile([s.get(phase, 0.0) for s in samples], 0.95) * 1000, 3)
+        }
+        for phase in PHASES
+    }
+
+def run_benchmark(scenarios=None, iterations=5, modes=("stream", "no-stream"), latency=0.0, chunk_delay=0.0):
+    """Run scenarios in each mode; returns {scenario: {mode: {phase: stats}}}"""
+    results = {}
+    for name in scenarios or SCENARIOS:
+        results[name] = {}
+        for mode in modes:
+            samples = run_scenario(name, SCENARIOS[name], iterations, stream=(mode == "stream"),
+                                   latency=latency, chunk_delay=chunk_delay)
+            results[name][mode] = summarize(samples)
+    return results
+
+def format_results(results):
+    header = f"{'scenario':<10} {'mode':<10}" + "".join(f"{phase:>11}" for phase in PHASES)
+    lines = [header, "-" * len(header)]
+    for name, modes in results.items():
+        for mode, phases in modes.items():
+            lines.append(
+                f"{name:<10} {mode:<10}" + "".join(f"{phases[p]['median']:>11.2f}" for p in PHASES)
+            )
+    lines.append("Median milliseconds per request")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the agent loop against a fake OpenAI server')
+    parser.add_argument('--iterations', type=int, default=5, help='Measured requests per scenario and mode')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Scenario to run (default: all)')
+    parser.add_argument('--no-stream', action='store_true', help='Only benchmark non-streamed requests')
+    parser.add_argument('--stream-only', action='store_true', help='Only benchmark streamed requests')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds before the first byte of a reply')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='Simulated seconds between streamed chunks')
+    parser.add_argument('--json', type=str, help='Also write the results to this JSON file')
+    parser.add_argument('--max-overhead', type=float, help='Exit with an error if a median overhead exceeds this many ms')
+    args = parser.parse_args()
+
+    modes = ("stream", "no-stream")
+    if args.no_stream:
+        modes = ("no-stream",)
+    elif args.stream_only:
+        modes = ("stream",)
+
+    results = run_benchmark(args.scenario, args.iterations, modes, args.latency, args.chunk_delay)
+    print(format_results(results))
+
+    if args.json:
+        report = {
+            'config': {
+                'iterations': args.iterations,
+                'latency': args.latency,
+                'chunk_delay': args.chunk_delay,
+                'python': sys.version.split()[0]
+            },
+            'results': results
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.max_overhead is not None:
+        slow = [
+            f"{name}/{mode}: {phases['overhead']['median']:.2f} ms"
+            for name, modes_ in results.items()
+            for mode, phases in modes_.items()
+            if phases['overhead']['median'] > args.max_overhead
+        ]
+        if slow:
+            print(f"Overhead above {args.max_overhead} ms: {', '.join(slow)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
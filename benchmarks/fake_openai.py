@@ -0,0 +1,307 @@
+"""
+Local fake of the OpenAI chat completions API.
+
+Serves ``POST /v1/chat/completions`` with scripted replies, so the agent can
+be exercised end to end (HTTP client, streaming, tool calls) without network
+access or an API key. Replies can stream, and latency before the first chunk
+and between chunks is configurable.
+
+Run it standalone and point Malaz at it:
+
+    python -m benchmarks.fake_openai --port 8765 --latency 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python malaz_cli.py "hello"
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUMMARY_REPLY = "Summary: the user asked for code changes and the agent made them."
+
+def scripted(steps):
+    """Build a responder that plays a multi-round script.
+
+    ``steps`` holds one item per model round: a list of
+    ``(tool_name, arguments)`` tool calls, or the final text. The round is
+    the number of assistant messages after the last user message, so the
+    same responder serves any number of concurrent conversations. Requests
+    without tools (history summaries) get a short summary.
+    """
+    def respond(request):
+        if not request.get("tools"):
+            return {"content": SUMMARY_REPLY}
+        messages = request.get("messages", [])
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        round_index = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant")
+        if round_index >= len(steps):
+            return {"content": "Done."}
+        step = steps[round_index]
+        if isinstance(step, str):
+            return {"content": step}
+        return {"content": None, "tool_calls": list(step)}
+    return respond
+
+def echo(request):
+    """Default responder: repeat the last user message"""
+    messages = request.get("messages", [])
+    last = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")
+    return {"content": f"Echo: {last}"}
+
+def count_tokens(text):
+    """Rough token estimate; only used for the reported usage"""
+    return max(1, len(text) // 4)
+
+class FakeOpenAIServer:
+    """Threaded HTTP server speaking the chat completions protocol.
+
+    ``responder(request_body)`` returns ``{"content": str or None,
+    "tool_calls": [(name, arguments), ...]}``. ``latency`` is slept before
+    the first byte of a reply and ``chunk_delay`` between streamed chunks;
+    every request is logged in ``requests`` along with the delay simulated
+    for it.
+    Reported usage counts a prompt prefix already seen in an earlier request
+    as cached, like the provider's prompt cache.
+    """
+
+    def __init__(self, responder=None, latency=0.0, chunk_delay=0.0, chunk_size=16,
+                 host="127.0.0.1", port=0):
+        self.responder = responder or echo
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.requests = []
+        self._prefixes = set()
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def simulated_delay(self):
+        """Total time slept to simulate the model, over all requests"""
+        with self._lock:
+            return sum(r['delay'] for r in self.requests)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_log(self):
+        with self._lock:
+            self.requests = []
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError as e:
+                    self._send_json(400, {"error": {"message": f"Invalid JSON: {str(e)}"}})
+                    return
+                server._complete(self, request)
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _complete(self, handler, request):
+        reply = self.responder(request)
+        with self._lock:
+            self._counter += 1
+            number = self._counter
+            usage = self._usage(request, reply)
+        model = request.get("model", "fake")
+        tool_calls = [
+            {
+                "id": f"call_{number}_{i}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)}
+            }
+            for i, (name, arguments) in enumerate(reply.get("tool_calls") or [])
+        ]
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        completion_id = f"chatcmpl-fake-{number}"
+
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            events = self._stream_events(completion_id, model, reply.get("content"), tool_calls,
+                                         finish_reason, usage if include_usage else None)
+            delay = self.latency + self.chunk_delay * (len(events) - 1)
+        else:
+            delay = self.latency
+        with self._lock:
+            self.requests.append({
+                'stream': bool(request.get("stream")),
+                'messages': request.get("messages", []),
+                'tool_calls': [t["function"]["name"] for t in tool_calls],
+                'usage': usage,
+                'delay': delay
+            })
+
+        time.sleep(self.latency)
+        if request.get("stream"):
+            self._send_stream(handler, events)
+            return
+        message = {"role": "assistant", "content": reply.get("content")}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        handler._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage
+        })
+
+    def _stream_events(self, completion_id, model, content, tool_calls, finish_reason, usage):
+        """Split a reply into chunks of ``chunk_size`` characters"""
+        def chunk(delta=None, finish=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta or {}, "finish_reason": finish}]
+            }
+
+        size = self.chunk_size
+        events = [chunk({"role": "assistant", "content": ""})]
+        for start in range(0, len(content or ""), size):
+            events.append(chunk({"content": content[start:start + size]}))
+        for index, tool_call in enumerate(tool_calls):
+            events.append(chunk({"tool_calls": [{
+                "index": index,
+                "id": tool_call["id"],
+                "type": "function",
+                "function": {"name": tool_call["function"]["name"], "arguments": ""}
+            }]}))
+            arguments = tool_call["function"]["arguments"]
+            for start in range(0, len(arguments), size):
+                events.append(chunk({"tool_calls": [{
+                    "index": index,
+                    "function": {"arguments": arguments[start:start + size]}
+                }]}))
+        events.append(chunk(finish=finish_reason))
+        if usage is not None:
+            final = chunk()
+            final["choices"] = []
+            final["usage"] = usage
+            events.append(final)
+        return events
+
+    def _send_stream(self, handler, events):
+        """Send chunks as server-sent events, ``chunk_delay`` apart"""
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Cache-Control', 'no-cache')
+        # No length is known up front, so the connection ends the stream
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        handler.close_connection = True
+        for i, event in enumerate(events):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            handler.wfile.flush()
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+
+    def _usage(self, request, reply):
+        """Estimate usage, counting previously seen prompt prefixes as cached"""
+        # The tool schemas come first in the prompt, then the messages
+        parts = [request.get("tools") or []] + request.get("messages", [])
+        digest = hashlib.sha1()
+        total_chars = 0
+        cached_chars = 0
+        for part in parts:
+            text = json.dumps(part, sort_keys=True)
+            digest.update(text.encode('utf-8'))
+            key = digest.hexdigest()
+            if key in self._prefixes and cached_chars == total_chars:
+                cached_chars += len(text)
+            total_chars += len(text)
+            self._prefixes.add(key)
+
+        completion_text = (reply.get("content") or "") + json.dumps(reply.get("tool_calls") or [])
+        prompt_tokens = max(1, total_chars // 4)
+        completion_tokens = count_tokens(completion_text)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_chars // 4}
+        }
+
+def load_script(path):
+    """Read a responder script: a JSON list of final texts or tool call lists"""
+    with open(path, 'r', encoding='utf-8') as f:
+        steps = json.load(f)
+    return scripted([
+        step if isinstance(step, str) else [(call["name"], call.get("arguments", {})) for call in step]
+        for step in steps
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake OpenAI chat completions server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Address to bind')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before the first byte of a reply')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='Seconds between streamed chunks')
+    parser.add_argument('--chunk-size', type=int, default=16, help='Characters per streamed chunk')
+    parser.add_argument('--script', type=str, help='JSON script of replies; echoes the user message by default')
+    args = parser.parse_args()
+
+    responder = load_script(args.script) if args.script else echo
+    server = FakeOpenAIServer(responder, latency=args.latency, chunk_delay=args.chunk_delay,
+                              chunk_size=args.chunk_size, host=args.host, port=args.port)
+    print(f"Fake OpenAI API on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == '__main__':
+    main()
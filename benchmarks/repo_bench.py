@@ -0,0 +1,266 @@
+"""
+Scaling benchmark of the project operations on synthetic repositories.
+
+Generates repositories of 1k, 10k, 100k and 1M files (see
+``benchmarks.synthetic_repo``) and measures time and peak Python memory of
+``load_project_structure``, ``format_context``, ``search_code``,
+``analyze_code``, ``CodeReviewer.review_file`` and ``modify_file``:
+
+    python -m benchmarks.repo_bench --sizes 1000,10000
+    python -m benchmarks.repo_bench --sizes 1000 --compare bench-results/repo_bench-abc1234.json
+
+Each operation is timed cold (no ``.malaz`` caches, fresh in-process caches)
+and warm (median of repeated runs), and its peak memory is taken with
+tracemalloc on a separate cold run. Results are written as JSON, by default
+to ``bench-results/repo_bench-<commit>.json``, and ``--compare`` reports the
+ratio of each timing to an earlier result file.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_repo import generate_repo, MARKER
+from core.tool_manager import ToolManager
+from utils.ast_cache import get_ast_cache
+from utils.file_utils import load_project_structure, format_context, CACHE_DIR_NAME
+from utils.review_assistant import CodeReviewer
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+RESULTS_DIR = "bench-results"
+
+class BenchContext:
+    """State shared by the operations on one synthetic repository"""
+
+    def __init__(self, project_path, manifest):
+        self.project_path = project_path
+        self.manifest = manifest
+        self.target_file = manifest['target_file']
+        self.target_path = os.path.join(project_path, self.target_file)
+        with open(self.target_path, 'r', encoding='utf-8') as f:
+            self.target_source = f.read()
+        self.patches = self._make_patches()
+        self.structure = None
+        self.tool_manager = None
+
+    def reset(self):
+        """Drop every persistent and in-process cache"""
+        shutil.rmtree(os.path.join(self.project_path, CACHE_DIR_NAME), ignore_errors=True)
+        get_ast_cache().clear()
+        self.structure = None
+        self.tool_manager = None
+        gc.collect()
+
+    def get_structure(self):
+        if self.structure is None:
+            self.structure = load_project_structure(self.project_path)
+        return self.structure
+
+    def get_tool_manager(self):
+        if self.tool_manager is None:
+            self.tool_manager = ToolManager(self.project_path)
+        return self.tool_manager
+
+    def restore_target(self):
+        with open(self.target_path, 'w', encoding='utf-8') as f:
+            f.write(self.target_source)
+
+    def _make_patches(self, count=10):
+        """Replace ``count`` function headers spread over the target file"""
+        headers = [line for line in self.target_source.splitlines() if line.startswith("def ")]
+        step = max(1, len(headers) // count)
+        return [
+            {"old_line": line, "new_line": line + "  # edited"}
+            for line in headers[::step][:count]
+        ]
+
+def op_load_project_structure(ctx):
+    ctx.structure = load_project_structure(ctx.project_path)
+
+def op_format_context(ctx):
+    format_context(ctx.get_structure())
+
+def op_search_code(ctx):
+    ctx.get_tool_manager().search_code(MARKER)
+
+def op_analyze_code(ctx):
+    ctx.get_tool_manager().analyze_code(ctx.target_file)
+
+def op_review_file(ctx):
+    CodeReviewer().review_file(ctx.target_path)
+
+def op_modify_file(ctx):
+    ctx.get_tool_manager().modify_file(ctx.target_file, ctx.patches)
+
+# name -> (run, prepare before each timed run, clean up after it)
+OPERATIONS = {
+    "load_project_structure": (op_load_project_structure, None, None),
+    "format_context": (op_format_context, BenchContext.get_structure, None),
+    "search_code": (op_search_code, None, None),
+    "analyze_code": (op_analyze_code, None, None),
+    "review_file": (op_review_file, None, None),
+    "modify_file": (op_modify_file, BenchContext.get_tool_manager, BenchContext.restore_target),
+}
+
+def _timed(ctx, run, prepare, cleanup):
+    if prepare:
+        prepare(ctx)
+    start = time.perf_counter()
+    try:
+        run(ctx)
+        return time.perf_counter() - start
+    finally:
+        if cleanup:
+            cleanup(ctx)
+
+def _peak_memory(ctx, run, prepare, cleanup):
+    """Peak traced allocations of a cold run, in KiB"""
+    ctx.reset()
+    if prepare:
+        prepare(ctx)
+    tracemalloc.start()
+    try:
+        run(ctx)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+        if cleanup:
+            cleanup(ctx)
+
+def bench_operation(ctx, name, repeat=5, memory=True):
+    """Get cold and warm seconds and peak KiB of one operation"""
+    run, prepare, cleanup = OPERATIONS[name]
+    ctx.reset()
+    cold = _timed(ctx, run, prepare, cleanup)
+    warm = sorted(_timed(ctx, run, prepare, cleanup) for _ in range(repeat))
+    result = {'cold_s': round(cold, 6), 'warm_s': round(warm[len(warm) // 2], 6)}
+    if memory:
+        result['peak_kb'] = _peak_memory(ctx, run, prepare, cleanup)
+    return result
+
+def bench_size(file_count, workdir, operations=None, repeat=5, memory=True, seed=0):
+    """Generate (or reuse) a repository and benchmark every operation on it"""
+    project_path = os.path.join(workdir, f"repo-{file_count}-{seed}")
+    start = time.perf_counter()
+    manifest = generate_repo(project_path, file_count, seed)
+    generate_s = time.perf_counter() - start
+
+    ctx = BenchContext(project_path, manifest)
+    try:
+        ops = {
+            name: bench_operation(ctx, name, repeat, memory)
+            for name in operations or OPERATIONS
+        }
+    finally:
+        ctx.restore_target()
+        ctx.reset()
+    return {
+        'files': manifest['files'],
+        'bytes': manifest['bytes'],
+        'generate_s': round(generate_s, 3),
+        'operations': ops
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(current, baseline, threshold=1.25):
+    """Get (lines, regressions) comparing two result files' timings"""
+    lines = []
+    regressions = []
+    for size, result in current['sizes'].items():
+        old_ops = baseline.get('sizes', {}).get(size, {}).get('operations', {})
+        for name, timings in result['operations'].items():
+            old = old_ops.get(name)
+            if not old:
+                continue
+            for key in ('cold_s', 'warm_s', 'peak_kb'):
+                if key not in timings or not old.get(key):
+                    continue
+                ratio = timings[key] / old[key]
+                line = f"{size:>8} {name:<24} {key:<8} {old[key]:>12.4f} -> {timings[key]:>12.4f}  x{ratio:.2f}"
+                lines.append(line)
+                if ratio > threshold:
+                    regressions.append(line)
+    return lines, regressions
+
+def format_results(report):
+    lines = [f"{'files':>8} {'operation':<24} {'cold ms':>10} {'warm ms':>10} {'peak KiB':>10}"]
+    for size, result in report['sizes'].items():
+        for name, timings in result['operations'].items():
+            peak = timings.get('peak_kb')
+            lines.append(
+                f"{size:>8} {name:<24} {timings['cold_s'] * 1000:>10.2f} {timings['warm_s'] * 1000:>10.2f} "
+                f"{peak if peak is not None else '-':>10}"
+            )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark project operations on synthetic repositories')
+    parser.add_argument('--sizes', type=str, default=",".join(map(str, DEFAULT_SIZES)),
+                        help='Comma separated repository sizes in files')
+    parser.add_argument('--operation', action='append', choices=sorted(OPERATIONS),
+                        help='Operation to benchmark (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Warm runs per operation')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc peak memory runs')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic repositories')
+    parser.add_argument('--workdir', type=str, default=os.path.join(tempfile.gettempdir(), "malaz-synthetic"),
+                        help='Where synthetic repositories are generated and kept for reuse')
+    parser.add_argument('--output', type=str, help='Result file (default: bench-results/repo_bench-<commit>.json)')
+    parser.add_argument('--compare', type=str, help='Earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Ratio above which a timing counts as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with an error if --compare finds regressions')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'sizes': {}
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"Benchmarking {size} files...", flush=True)
+        report['sizes'][str(size)] = bench_size(
+            size, args.workdir, args.operation, args.repeat, not args.no_memory, args.seed
+        )
+    print(format_results(report))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"repo_bench-{commit or 'unknown'}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        lines, regressions = compare(report, baseline, args.threshold)
+        print(f"\nCompared with {baseline.get('commit') or args.compare}:")
+        print("\n".join(lines) or "No common operations")
+        if regressions:
+            print(f"\n{len(regressions)} timing(s) slower than x{args.threshold}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
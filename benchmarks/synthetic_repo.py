@@ -0,0 +1,287 @@
+"""
+Deterministic synthetic repositories for scaling benchmarks.
+
+``generate_repo(path, file_count)`` writes a tree of ``file_count`` files in
+mixed languages (Python, JavaScript, TypeScript, Go, Markdown, JSON, YAML)
+plus binary blobs and a hidden build directory, with mostly small files and
+a long tail of large ones. The same ``file_count`` and ``seed`` always give
+the same tree, and an existing tree with a matching manifest is reused.
+
+    python -m benchmarks.synthetic_repo /tmp/repo-10k --files 10000
+"""
+import os
+import json
+import random
+import shutil
+import argparse
+
+MANIFEST_FILE = ".synthetic.json"
+VERSION = 1
+
+# Files per directory before the tree grows another level
+DIR_FANOUT = 64
+
+# (extension, share of text files)
+LANGUAGES = [
+    (".py", 0.45),
+    (".js", 0.15),
+    (".ts", 0.10),
+    (".go", 0.08),
+    (".md", 0.08),
+    (".json", 0.07),
+    (".yaml", 0.07),
+]
+BINARY_SHARE = 0.05
+BINARY_EXTENSIONS = [".png", ".bin", ".so", ".zip"]
+# Files under a hidden directory, which the project walk skips
+HIDDEN_SHARE = 0.02
+
+# Rare marker planted in about one file in 200, for selective searches
+MARKER = "FIXME_SYNTHETIC"
+MARKER_RATE = 0.005
+
+# Large files are capped in number so 1M-file trees stay a few GB
+LARGE_FILES = 200
+HUGE_FILES = 5
+
+# Lines in the Python file modify_file and review_file are benchmarked on
+TARGET_LINES = 20000
+
+WORDS = (
+    "account address amount buffer cache client config connection context count "
+    "customer data event file handler index item key limit message node order "
+    "packet parser path payload price queue record request response result route "
+    "schema session state stream table task token user value worker"
+).split()
+
+def _name(rng, parts=2):
+    return "_".join(rng.choice(WORDS) for _ in range(parts))
+
+def _camel(rng, parts=2):
+    return "".join(rng.choice(WORDS).capitalize() for _ in range(parts))
+
+def python_source(rng, target_bytes, marker=False):
+    """A module of classes and functions of about ``target_bytes``"""
+    lines = [f'"""Synthetic module: {_name(rng, 3)}"""', "import os", "import json", ""]
+    size = sum(len(line) + 1 for line in lines)
+    index = 0
+    while size < target_bytes:
+        index += 1
+        if rng.random() < 0.3:
+            block = [
+                f"class {_camel(rng)}{index}:",
+                f'    """Manage {_name(rng)} records"""',
+                "",
+                "    def __init__(self, config=None):",
+                "        self.config = config or {}",
+                f"        self.{_name(rng)} = []",
+                "",
+                f"    def handle_{_name(rng)}(self, {_name(rng, 1)}):",
+                f"        for item in self.{_name(rng, 1)}s:",
+                "            if item is None:",
+                "                continue",
+                f"            self.config[item] = {index}",
+                "        return self.config",
+                "",
+            ]
+        else:
+            arg = _name(rng, 1)
+            block = [
+                f"def handle_request_{_name(rng)}_{index}({arg}, limit={rng.randint(1, 100)}):",
+                f'    """Process {_name(rng)} for a request"""',
+                f"    result = [{arg} * i for i in range(limit)]",
+                f"    if len(result) > {rng.randint(10, 1000)}:",
+                "        return json.dumps(result)",
+                "    return os.path.join(*map(str, result))",
+                "",
+            ]
+        if marker and index == 1:
+            block.insert(1, f"    # {MARKER}: synthetic marker for selective searches")
+        lines.extend(block)
+        size += sum(len(line) + 1 for line in block)
+    return "\n".join(lines) + "\n"
+
+def script_source(rng, target_bytes, extension, marker=False):
+    """JavaScript, TypeScript or Go functions of about ``target_bytes``"""
+    lines = ["package main", ""] if extension == ".go" else [f"// Synthetic module: {_name(rng, 3)}", ""]
+    size = sum(len(line) + 1 for line in lines)
+    index = 0
+    while size < target_bytes:
+        index += 1
+        name = f"{_camel(rng)}{index}"
+        if extension == ".go":
+            block = [f"func {name}(limit int) []int {{", "\tresult := []int{}",
+                     "\tfor i := 0; i < limit; i++ {", "\t\tresult = append(result, i*2)", "\t}",
+                     "\treturn result", "}", ""]
+        elif extension == ".ts":
+            block = [f"export function {name}(limit: number): number[] {{", "  const result: number[] = [];",
+                     "  for (let i = 0; i < limit; i++) {", "    result.push(i * 2);", "  }",
+                     "  return result;", "}", ""]
+        else:
+            block = [f"function {name}(limit) {{", "  const result = [];",
+                     "  for (let i = 0; i < limit; i++) {", "    result.push(i * 2);", "  }",
+                     "  return result;", "}", ""]
+        if marker and index == 1:
+            block.insert(1, f"  // {MARKER}: synthetic marker for selective searches")
+        lines.extend(block)
+        size += sum(len(line) + 1 for line in block)
+    return "\n".join(lines) + "\n"
+
+def text_source(rng, target_bytes, extension, marker=False):
+    """Markdown, JSON or YAML of about ``target_bytes``"""
+    if extension == ".json":
+        count = max(1, target_bytes // 40)
+        data = {_name(rng) + str(i): rng.randint(0, 10 ** 6) for i in range(count)}
+        if marker:
+            data[MARKER] = True
+        return json.dumps(data, indent=2) + "\n"
+
+    lines = [f"# {_name(rng, 3)}", ""] if extension == ".md" else [f"{_name(rng)}:"]
+    if marker:
+        lines.append(f"{MARKER}: synthetic marker")
+    size = sum(len(line) + 1 for line in lines)
+    while size < target_bytes:
+        if extension == ".md":
+            line = " ".join(rng.choice(WORDS) for _ in range(12)) + "."
+        else:
+            line = f"  {_name(rng)}: {rng.randint(0, 10 ** 6)}"
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+def binary_blob(rng, size):
+    """Random bytes; the leading NUL marks them as binary"""
+    return b"\x00" + rng.getrandbits(8 * size).to_bytes(size, 'little')[1:] if size else b""
+
+def _text_size(rng):
+    roll = rng.random()
+    if roll < 0.9:
+        return rng.randint(100, 2048)
+    return rng.randint(2048, 16384)
+
+def _directory(index):
+    """Spread files over a tree with at most DIR_FANOUT entries per level"""
+    parts = []
+    number = index // DIR_FANOUT
+    while number:
+        parts.append(f"d{number % DIR_FANOUT:02d}")
+        number //= DIR_FANOUT
+    return os.path.join("src", *reversed(parts)) if parts else "src"
+
+def _pick_language(rng):
+    roll = rng.random()
+    for extension, share in LANGUAGES:
+        if roll < share:
+            return extension
+        roll -= share
+    return LANGUAGES[0][0]
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def generate_repo(path, file_count, seed=0, force=False):
+    """Write a synthetic repository; returns its manifest.
+
+    The manifest records the file count, total bytes and a few files the
+    benchmarks operate on (``target_file``: a Python file of about
+    TARGET_LINES lines). A tree whose manifest matches is reused unless
+    ``force`` is set.
+    """
+    manifest = _read_manifest(path)
+    if (not force and manifest and manifest.get('version') == VERSION
+            and manifest.get('files') == file_count and manifest.get('seed') == seed):
+        return manifest
+    if manifest is not None:
+        shutil.rmtree(path)
+    elif os.path.isdir(path) and os.listdir(path):
+        raise FileExistsError(f"{path} exists and is not a synthetic repository")
+    os.makedirs(path, exist_ok=True)
+
+    rng = random.Random(seed)
+    large_left = min(LARGE_FILES, file_count // 100)
+    huge_left = min(HUGE_FILES, file_count // 1000)
+    total_bytes = 0
+    languages = {}
+
+    # Fixed files: the benchmark target and a few manifests of dependencies
+    target_file = os.path.join("src", "target_module.py")
+    fixed = {
+        target_file: python_source(rng, TARGET_LINES * 30).encode('utf-8'),
+        "requirements.txt": b"requests\nflask\n",
+        "package.json": json.dumps({"dependencies": {"react": "^18.0.0"}}).encode('utf-8'),
+        "README.md": b"# Synthetic repository\n",
+    }
+    for rel_path, data in fixed.items():
+        total_bytes += _write(path, rel_path, data)
+
+    for index in range(file_count - len(fixed)):
+        roll = rng.random()
+        if roll < HIDDEN_SHARE:
+            rel_path = os.path.join(".build", f"artifact{index}.o")
+            data = binary_blob(rng, rng.randint(256, 4096))
+            extension = "hidden"
+        elif roll < HIDDEN_SHARE + BINARY_SHARE:
+            extension = rng.choice(BINARY_EXTENSIONS)
+            rel_path = os.path.join(_directory(index), f"blob{index}{extension}")
+            size = rng.randint(1024, 64 * 1024)
+            if huge_left and rng.random() < 0.01:
+                huge_left -= 1
+                size = rng.randint(1, 4) * 1024 * 1024
+            data = binary_blob(rng, size)
+        else:
+            extension = _pick_language(rng)
+            size = _text_size(rng)
+            if large_left and rng.random() < 0.02:
+                large_left -= 1
+                size = rng.randint(64 * 1024, 512 * 1024)
+            marker = rng.random() < MARKER_RATE
+            rel_path = os.path.join(_directory(index), f"{_name(rng)}_{index}{extension}")
+            if extension == ".py":
+                text = python_source(rng, size, marker)
+            elif extension in (".js", ".ts", ".go"):
+                text = script_source(rng, size, extension, marker)
+            else:
+                text = text_source(rng, size, extension, marker)
+            data = text.encode('utf-8')
+        languages[extension] = languages.get(extension, 0) + 1
+        total_bytes += _write(path, rel_path, data)
+
+    manifest = {
+        'version': VERSION,
+        'files': file_count,
+        'seed': seed,
+        'bytes': total_bytes,
+        'languages': languages,
+        'target_file': target_file,
+        'marker': MARKER
+    }
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def _write(root, rel_path, data):
+    full_path = os.path.join(root, rel_path)
+    directory = os.path.dirname(full_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    with open(full_path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic repository')
+    parser.add_argument('path', type=str, help='Directory to generate into (replaced if it exists)')
+    parser.add_argument('--files', type=int, default=1000, help='Number of files')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--force', action='store_true', help='Regenerate even if a matching tree exists')
+    args = parser.parse_args()
+
+    manifest = generate_repo(args.path, args.files, args.seed, args.force)
+    print(json.dumps(manifest, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,211 @@
-import json
 import os
-import openai
+import time
+import threading
 from core.tool_manager import ToolManager
-from utils.file_utils import load_project_structure, format_context
+from core.tool_runner import ToolRunner
+from utils.file_utils import load_project_structure, format_context, get_cache_dir
+from utils.response_cache import ResponseCache
+from utils.tokenizer import get_tokenizer, count_message_tokens, count_tools_tokens
 from core.memory import SessionMemory
-from dotenv import load_dotenv
-from utils.review_assistant import CodeReviewer
-from core.debugger import CodeDebugger
-from core.vcs_integration import VCSIntegration
+from core.usage import UsageStats
+from core.tracing import Tracer
+from core.env import load_env
 
-load_dotenv()
+load_env()
+
+def read_message(message, on_tool_call=None):
+    """Get (content, tool_calls) from a non-streamed completion message"""
+    tool_calls = [
+        {
+            "id": tool_call.id,
+            "type": "function",
+            "function": {
+                "name": tool_call.function.name,
+                "arguments": tool_call.function.arguments
+            }
+        }
+        for tool_call in message.tool_calls or []
+    ]
+    if on_tool_call:
+        for tool_call in tool_calls:
+            on_tool_call(tool_call)
+    return message.content, tool_calls
+
+def replay_cached(cached, on_token=None, on_tool_call=None):
+    """Feed a cached (content, tool_calls) result through the callbacks"""
+    content, tool_calls = cached
+    if content and on_token:
+        on_token(content)
+    if on_tool_call:
+        for tool_call in tool_calls:
+            on_tool_call(tool_call)
+    return content, tool_calls
+
+class StreamAssembler:
+    """Assemble streamed completion chunks into content and tool calls"""
+
+    def __init__(self, on_token=None, on_tool_call=None):
+        self.on_token = on_token
+        self.on_tool_call = on_tool_call
+        self.content = []
+        self.tool_calls = []
+        self.usage = None
+
+    def add(self, chunk):
+        # With include_usage, the last chunk carries usage and no choices
+        usage = getattr(chunk, 'usage', None)
+        if usage is not None:
+            self.usage = usage
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        if delta.content:
+            self.content.append(delta.content)
+            if self.on_token:
+                self.on_token(delta.content)
+
+        for part in delta.tool_calls or []:
+            if part.index >= len(self.tool_calls):
+                # A new tool call begins, so the previous one is complete
+                self._complete_last()
+                self.tool_calls.append({
+                    "id": part.id,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+            tool_call = self.tool_calls[part.index]
+            if part.id:
+                tool_call["id"] = part.id
+            if part.function:
+                if part.function.name:
+                    tool_call["function"]["name"] += part.function.name
+                if part.function.arguments:
+                    tool_call["function"]["arguments"] += part.function.arguments
+
+    def finish(self):
+        """Complete the last tool call and return (content, tool_calls)"""
+        self._complete_last()
+        return "".join(self.content) or None, self.tool_calls
+
+    def _complete_last(self):
+        if self.tool_calls and self.on_tool_call:
+            self.on_tool_call(self.tool_calls[-1])
+
+class RoundSeparator:
+    """Forward streamed text, separating the text of successive model rounds"""
+
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.streamed = False
+        self.new_round = False
+
+    def next_round(self):
+        self.new_round = True
+
+    def __call__(self, text):
+        if self.new_round and self.streamed:
+            self.on_token("\n\n")
+        self.streamed = True
+        self.new_round = False
+        self.on_token(text)
 
 class CodingAgent:
-    def __init__(self, project_path=None):
+    """Coding assistant that answers requests with the model and project tools.
+
+    Subsystems are built on first use: the project scan behind ``context``,
+    the API client, the tokenizer, and the reviewer, debugger and VCS
+    integration, which are shared with the ToolManager. ``!review``,
+    ``!debug`` and ``!commit`` therefore never scan the project or create a
+    client.
+    """
+
+    # Longest snippet of retrieved code put into the prompt
+    MAX_SNIPPET_LINES = 80
+
+    def __init__(self, project_path=None, max_steps=None):
         self.project_path = project_path or os.getcwd()
-        project_structure = load_project_structure(self.project_path)
-        self.context = format_context(project_structure)
-        self.tool_manager = ToolManager(self.project_path)
-        self.reviewer = CodeReviewer()
-        self.debugger = CodeDebugger(self.project_path)
-        self.vcs = VCSIntegration(self.project_path)
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.max_steps = max_steps or int(os.getenv("MALAZ_MAX_STEPS", "10"))
+        # Spans of context building, completions, tools and memory, for /stats
+        self.tracer = Tracer()
+        self.tool_manager = ToolManager(self.project_path, tracer=self.tracer)
+        self.response_cache = ResponseCache.from_env(self.project_path)
+        self._context = None
+        # (tool_manager.files_version, time) the context was built at
+        self._context_state = None
+        self._context_lock = threading.Lock()
+        self._openai_client = None
+        self._tokenizer = None
+        # Token budget for the whole prompt: instructions, context, tools and history
+        self.prompt_budget = int(os.getenv("MALAZ_PROMPT_TOKENS", "16000"))
+        self.code_budget = int(os.getenv("MALAZ_CODE_CONTEXT_TOKENS", "3000"))
+        self._tools_tokens = None
+        self.usage = UsageStats()
+
+    @property
+    def context(self):
+        """Project summary for the system prompt.
+
+        Scanned on first use and rebuilt after tools changed project files.
+        Changes made outside the tools (e.g. while the daemon keeps this
+        agent alive) are picked up once the summary is older than
+        ``ToolManager.INDEX_MAX_AGE``; the project index makes the re-scan
+        incremental.
+        """
+        with self._context_lock:
+            version = self.tool_manager.files_version
+            state = self._context_state
+            if (self._context is None or state[0] != version
+                    or time.time() - state[1] > self.tool_manager.INDEX_MAX_AGE):
+                self._context = format_context(load_project_structure(self.project_path))
+                self._context_state = (version, time.time())
+            return self._context
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            import openai
+            self._openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._openai_client
+
+    @openai_client.setter
+    def openai_client(self, client):
+        self._openai_client = client
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = get_tokenizer()
+        return self._tokenizer
+
+    @tokenizer.setter
+    def tokenizer(self, tokenizer):
+        self._tokenizer = tokenizer
+
+    @property
+    def reviewer(self):
+        return self.tool_manager.reviewer
+
+    @property
+    def debugger(self):
+        return self.tool_manager.debugger
+
+    @property
+    def vcs(self):
+        return self.tool_manager.vcs
     
-    def process_request(self, user_input: str, memory: SessionMemory):
-        """Process user request with memory and tool manager"""
+    def process_request(self, user_input: str, memory: SessionMemory, on_token=None,
+                        use_cache=True, refresh_cache=False):
+        """Process user request with memory and tool manager.
+
+        When ``on_token`` is given, completions are streamed and every text
+        delta is passed to it as soon as it arrives. With the response cache
+        enabled, ``use_cache=False`` bypasses it and ``refresh_cache=True``
+        ignores cached entries and replaces them with fresh completions.
+        """
+        with self.tracer.span("request", "process_request", session=memory.session_id):
+            return self._process_request(user_input, memory, on_token, use_cache, refresh_cache)
+
+    def _process_request(self, user_input, memory, on_token, use_cache, refresh_cache):
         # Handle special commands directly
         if user_input.startswith("!review"):
             return self.handle_code_review(user_input)
@@ -33,62 +215,139 @@ class CodingAgent:
             return self.handle_commit_command(user_input)
         
         # Prepare messages with context and memory
-        messages = self._prepare_messages(user_input, memory)
-        
-        # First API call to determine if tool is needed
-        response = self.openai_client.chat.completions.create(
-            model=os.getenv("MALAZ_MODEL", "gpt-4o-mini"),
-            messages=messages,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_choice="auto",
-            max_tokens=2000
-        )
+        with self.tracer.span("context", "prepare_messages"):
+            messages = self._prepare_messages(user_input, memory)
         
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
-        
-        # Handle tool calls
-        if tool_calls:
-            messages.append({
-                "role": "assistant",
-                "content": response_message.content,
-                "tool_calls": response_message.tool_calls
-            })
-            
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                # Execute tool
-                tool_response = self.tool_manager.execute_tool(function_name, function_args)
+        # Tools start running as soon as their arguments are complete,
+        # while the rest of the response is still streaming in
+        runner = ToolRunner(self.tool_manager)
+        if on_token is not None:
+            on_token = RoundSeparator(on_token)
+        cache_options = {"use_cache": use_cache, "refresh_cache": refresh_cache}
+        final_response = None
+        try:
+            for _ in range(self.max_steps):
+                if on_token is not None:
+                    on_token.next_round()
+                content, tool_calls = self._create_completion(
+                    messages,
+                    on_token=on_token,
+                    on_tool_call=runner.submit,
+                    tools=self.tool_manager.get_tool_definitions(),
+                    tool_choice="auto",
+                    max_tokens=2000,
+                    **cache_options
+                )
+                if not tool_calls:
+                    final_response = content
+                    break
                 
                 messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": function_name,
-                    "content": tool_response,
+                    "role": "assistant",
+                    "content": content,
+                    "tool_calls": tool_calls
                 })
-            
-            # Second call with tool responses
-            second_response = self.openai_client.chat.completions.create(
-                model=os.getenv("MALAZ_MODEL", "gpt-4o-mini"),
-                messages=messages
-            )
-            final_response = second_response.choices[0].message.content
-        else:
-            final_response = response_message.content
+                
+                for tool_call in tool_calls:
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call["id"],
+                        "name": tool_call["function"]["name"],
+                        "content": runner.result(tool_call["id"]),
+                    })
+            else:
+                # Step budget used up: ask for an answer without more tools
+                if on_token is not None:
+                    on_token.next_round()
+                final_response, _ = self._create_completion(messages, on_token=on_token, **cache_options)
+        finally:
+            runner.shutdown()
         
         # Update memory and return response
-        memory.add_interaction(user_input, final_response)
+        with self.tracer.span("memory", "add_interaction"):
+            memory.add_interaction(user_input, final_response)
+        memory.compact_in_background(self.summarize_history)
         return final_response
+
+    def summarize_history(self, previous_summary, entries):
+        """Fold conversation turns into the running summary of a session"""
+        turns = "\n".join(SessionMemory.format_entry(item) for item in entries)
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You maintain the running summary of a conversation between a user and "
+                    "Malaz, an AI coding assistant. Merge the new turns into the summary. "
+                    "Keep decisions, file names, code changes, open tasks and facts the user "
+                    "stated; drop pleasantries. Reply with the updated summary only, "
+                    "in at most 300 words."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{turns}"
+            }
+        ]
+        summary, _ = self._create_completion(
+            messages, model=os.getenv("MALAZ_SUMMARY_MODEL"), max_tokens=600
+        )
+        return summary
+
+    def _create_completion(self, messages, on_token=None, on_tool_call=None,
+                           use_cache=True, refresh_cache=False, model=None, **kwargs):
+        """Run one chat completion and return (content, tool_calls).
+
+        Tool calls are returned as plain dicts. ``on_tool_call`` is invoked
+        for each one as soon as its arguments are complete; when streaming,
+        that is when the next tool call starts or the stream ends.
+        """
+        model = model or os.getenv("MALAZ_MODEL", "gpt-4o-mini")
+        cache_key, cached = self._cache_lookup(model, messages, kwargs, use_cache, refresh_cache)
+        if cached is not None:
+            with self.tracer.span("cache", "response_cache", model=model):
+                return replay_cached(cached, on_token, on_tool_call)
+
+        with self.tracer.span("llm", "chat.completion", model=model, stream=on_token is not None) as span:
+            if on_token is None:
+                response = self.openai_client.chat.completions.create(model=model, messages=messages, **kwargs)
+                usage = self.usage.record(getattr(response, 'usage', None))
+                result = read_message(response.choices[0].message, on_tool_call)
+            else:
+                stream = self.openai_client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    stream_options={"include_usage": True}, **kwargs
+                )
+                assembler = StreamAssembler(on_token, on_tool_call)
+                for chunk in stream:
+                    assembler.add(chunk)
+                usage = self.usage.record(assembler.usage)
+                result = assembler.finish()
+            if usage:
+                span.update(prompt_tokens=usage[0], cached_tokens=usage[1], completion_tokens=usage[2])
+
+        if cache_key is not None:
+            self.response_cache.put(cache_key, *result)
+        return result
+
+    def _cache_lookup(self, model, messages, params, use_cache, refresh_cache):
+        """Get (cache_key, cached_result); the key is None when not caching"""
+        if self.response_cache is None or not use_cache:
+            return None, None
+        key = ResponseCache.make_key(model, messages, params)
+        if refresh_cache:
+            return key, None
+        return key, self.response_cache.get(key)
+
     def handle_code_review(self, command):
         """Handle code review requests"""
         parts = command.split(maxsplit=1)
         if len(parts) < 2:
-            return "Please specify file path: !review path/to/file.py"
+            return "Please specify file or directory path: !review path/to/file.py"
         
-        file_path = parts[1].strip()
-        return self.reviewer.review_file(os.path.join(self.project_path, file_path))
+        target = os.path.join(self.project_path, parts[1].strip())
+        if os.path.isdir(target):
+            return self.reviewer.review_directory(target, cache_dir=get_cache_dir(self.project_path))
+        return self.reviewer.review_file(target)
 
     def handle_debug_command(self, command):
         """Handle debugging requests"""
@@ -106,31 +365,111 @@ class CodingAgent:
         return self.vcs.commit_changes(message)
     
     def _prepare_messages(self, user_input, memory):
-        """Prepare messages for OpenAI API"""
+        """Prepare messages for OpenAI API.
 
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are Malaz, an expert AI coding assistant. "
-                    "Your role is to help with software development tasks including "
-                    "code generation, debugging, refactoring, and project management. "
-                    "Current project context:\n"
-                    f"{self.context}\n\n"
-                    "When creating or modifying files, use relative paths. "
-                    "For code changes, prefer providing exact diffs when possible. "
-                    "Always verify paths before file operations."
-                )
-            }
-        ]
-        
-        # Add conversation history if any
-        history_context = memory.get_context()
-        if history_context:
+        Messages go from most to least stable so the provider can reuse its
+        prompt cache: the static system prompt (sent along with the tool
+        schemas), the history summary and the recent turns as user/assistant
+        messages, which only grow between requests, and last the context
+        retrieved for this request and the request itself.
+        """
+        messages = [{"role": "system", "content": self.system_prompt()}]
+        user_message = {"role": "user", "content": user_input}
+        relevant_header = "Relevant earlier turns:\n"
+        code_header = "Code relevant to this request:\n"
+
+        # Retrieved code takes up to half of what the fixed parts leave,
+        # and history gets the rest
+        used = count_message_tokens(
+            messages + [user_message, {"content": relevant_header + code_header}],
+            self.tokenizer
+        )
+        remaining = max(0, self.prompt_budget - used - self.tools_tokens())
+        code_context = self._code_context(user_input, min(self.code_budget, remaining // 2))
+        remaining -= self.tokenizer.count(code_context)
+
+        parts = memory.get_prompt_parts(max_tokens=remaining, query=user_input)
+        if parts['summary']:
             messages.append({
                 "role": "system",
-                "content": f"Conversation history:\n{history_context}"
+                "content": f"Summary of earlier conversation:\n{parts['summary']}"
             })
+        for item in parts['turns']:
+            messages.append({"role": "user", "content": item['user']})
+            messages.append({"role": "assistant", "content": item['agent'] or ""})
+
+        retrieved = []
+        if parts['relevant']:
+            retrieved.append(relevant_header + "".join(SessionMemory.format_entry(item) for item in parts['relevant']))
+        if code_context:
+            retrieved.append(code_header + code_context)
+        if retrieved:
+            messages.append({"role": "system", "content": "\n".join(retrieved)})
         
-        messages.append({"role": "user", "content": user_input})
-        return messages
\ No newline at end of file
+        messages.append(user_message)
+        return messages
+
+    def system_prompt(self):
+        """Static system prompt; kept byte-identical so it stays cacheable"""
+        return (
+            "You are Malaz, an expert AI coding assistant. "
+            "Your role is to help with software development tasks including "
+            "code generation, debugging, refactoring, and project management. "
+            "Current project context:\n"
+            f"{self.context}\n\n"
+            "When creating or modifying files, use relative paths. "
+            "For code changes, prefer providing exact diffs when possible. "
+            "Always verify paths before file operations."
+        )
+
+    def _code_context(self, query, max_tokens):
+        """Fill a token budget with the code chunks that best match the query"""
+        if max_tokens <= 0:
+            return ""
+        try:
+            hits = self.tool_manager.retrieve_code(query)
+        except Exception:
+            return ""
+
+        blocks = []
+        included = set()
+        skipped = []
+        file_lines = {}
+        used = 0
+        for rel_path, start, end, name, _ in hits:
+            if rel_path not in file_lines:
+                try:
+                    with open(os.path.join(self.project_path, rel_path), 'r', encoding='utf-8') as f:
+                        file_lines[rel_path] = f.read().splitlines()
+                except (OSError, UnicodeDecodeError):
+                    file_lines[rel_path] = None
+            lines = file_lines[rel_path]
+            if not lines:
+                continue
+
+            snippet = lines[start - 1:end]
+            if len(snippet) > self.MAX_SNIPPET_LINES:
+                snippet = snippet[:self.MAX_SNIPPET_LINES] + ["..."]
+            label = f"{rel_path}:{start}-{end}" + (f" ({name})" if name else "")
+            block = f"### {label}\n```\n" + "\n".join(snippet) + "\n```\n"
+            block_tokens = self.tokenizer.count(block)
+            if used + block_tokens > max_tokens:
+                if rel_path not in included and rel_path not in skipped:
+                    skipped.append(rel_path)
+                continue
+            blocks.append(block)
+            included.add(rel_path)
+            used += block_tokens
+
+        others = [p for p in skipped if p not in included]
+        if others:
+            line = f"Other relevant files: {', '.join(others)}\n"
+            if used + self.tokenizer.count(line) <= max_tokens:
+                blocks.append(line)
+        return "".join(blocks)
+
+    def tools_tokens(self):
+        """Tokens taken by the tool definitions sent with every request"""
+        if self._tools_tokens is None:
+            self._tools_tokens = count_tools_tokens(self.tool_manager.get_tool_definitions(), self.tokenizer)
+        return self._tools_tokens
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import asyncio
+from core.agent import CodingAgent, StreamAssembler, read_message, replay_cached, RoundSeparator
+from core.memory import SessionMemory
+from core.tool_runner import AsyncToolRunner
+
+class AsyncCodingAgent(CodingAgent):
+    """asyncio variant of CodingAgent built on ``openai.AsyncOpenAI``.
+
+    One instance can serve many sessions at once: each ``process_request``
+    is a coroutine with its own SessionMemory, shell tools run as asyncio
+    subprocesses and file I/O is offloaded to threads, so no session ties up
+    a thread while it waits on the model.
+    """
+
+    def __init__(self, project_path=None, max_steps=None):
+        super().__init__(project_path, max_steps)
+        self._async_client = None
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import openai
+            self._async_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+
+    async def process_request(self, user_input: str, memory: SessionMemory, on_token=None,
+                              use_cache=True, refresh_cache=False):
+        """Process user request with memory and tool manager"""
+        with self.tracer.span("request", "process_request", session=memory.session_id):
+            return await self._process_request_async(user_input, memory, on_token, use_cache, refresh_cache)
+
+    async def _process_request_async(self, user_input, memory, on_token, use_cache, refresh_cache):
+        loop = asyncio.get_running_loop()
+
+        # Special commands do blocking file and VCS work
+        if user_input.startswith(("!review", "!debug", "!commit")):
+            return await loop.run_in_executor(None, self._process_request, user_input, memory, None, True, False)
+
+        # Scanning the project, refreshing the code index and reading the
+        # memory store block, so they must not run on the event loop
+        with self.tracer.span("context", "prepare_messages"):
+            messages = await loop.run_in_executor(None, self._prepare_messages, user_input, memory)
+
+        runner = AsyncToolRunner(self.tool_manager)
+        if on_token is not None:
+            on_token = RoundSeparator(on_token)
+        cache_options = {"use_cache": use_cache, "refresh_cache": refresh_cache}
+        final_response = None
+        try:
+            for _ in range(self.max_steps):
+                if on_token is not None:
+                    on_token.next_round()
+                content, tool_calls = await self._create_completion_async(
+                    messages,
+                    on_token=on_token,
+                    on_tool_call=runner.submit,
+                    tools=self.tool_manager.get_tool_definitions(),
+                    tool_choice="auto",
+                    max_tokens=2000,
+                    **cache_options
+                )
+                if not tool_calls:
+                    final_response = content
+                    break
+
+                messages.append({
+                    "role": "assistant",
+                    "content": content,
+                    "tool_calls": tool_calls
+                })
+
+                for tool_call in tool_calls:
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": tool_call["id"],
+                        "name": tool_call["function"]["name"],
+                        "content": await runner.result(tool_call["id"]),
+                    })
+            else:
+                # Step budget used up: ask for an answer without more tools
+                if on_token is not None:
+                    on_token.next_round()
+                final_response, _ = await self._create_completion_async(messages, on_token=on_token, **cache_options)
+        finally:
+            await runner.shutdown()
+
+        with self.tracer.span("memory", "add_interaction"):
+            await loop.run_in_executor(None, memory.add_interaction, user_input, final_response)
+        # Counts history tokens and may wait for the memory lock
+        await loop.run_in_executor(None, memory.compact_in_background, self.summarize_history)
+        return final_response
+
+    async def _create_completion_async(self, messages, on_token=None, on_tool_call=None,
+                                       use_cache=True, refresh_cache=False, model=None, **kwargs):
+        """Async counterpart of ``_create_completion``"""
+        model = model or os.getenv("MALAZ_MODEL", "gpt-4o-mini")
+        cache_key, cached = None, None
+        if self.response_cache is not None and use_cache:
+            # SQLite reads, writes and WAL syncs block; keep them off the loop
+            cache_key, cached = await asyncio.get_running_loop().run_in_executor(
+                None, self._cache_lookup, model, messages, kwargs, use_cache, refresh_cache
+            )
+        if cached is not None:
+            with self.tracer.span("cache", "response_cache", model=model):
+                return replay_cached(cached, on_token, on_tool_call)
+
+        with self.tracer.span("llm", "chat.completion", model=model, stream=on_token is not None) as span:
+            if on_token is None:
+                response = await self.async_client.chat.completions.create(model=model, messages=messages, **kwargs)
+                usage = self.usage.record(getattr(response, 'usage', None))
+                result = read_message(response.choices[0].message, on_tool_call)
+            else:
+                stream = await self.async_client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    stream_options={"include_usage": True}, **kwargs
+                )
+                assembler = StreamAssembler(on_token, on_tool_call)
+                async for chunk in stream:
+                    assembler.add(chunk)
+                usage = self.usage.record(assembler.usage)
+                result = assembler.finish()
+            if usage:
+                span.update(prompt_tokens=usage[0], cached_tokens=usage[1], completion_tokens=usage[2])
+
+        if cache_key is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.response_cache.put, cache_key, *result)
+        return result
+
+    async def close(self):
+        """Close the underlying HTTP connection pool"""
+        if self._async_client is not None:
+            await self._async_client.close()
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import asyncio
+from core.async_agent import AsyncCodingAgent
+from core.memory import SessionMemory, COMPACTION_EXIT_TIMEOUT
+from core.daemon_client import socket_path, config_fingerprint
+from core.tracing import debug_enabled, trace_path
+from utils.file_utils import get_cache_dir
+
+class MalazDaemon:
+    """Per-project server that keeps an agent warm between invocations.
+
+    Clients connect over a Unix socket and exchange JSON lines. A request
+    ``{"input": ..., "session": ..., "stream": true}`` is answered with
+    ``{"token": ...}`` lines while streaming and a final ``{"response": ...}``
+    (or ``{"error": ...}``). ``{"command": "ping"}`` and
+    ``{"command": "shutdown"}`` are also understood.
+    """
+
+    def __init__(self, project_path, idle_timeout=None):
+        self.project_path = os.path.abspath(project_path)
+        self.socket_path = socket_path(self.project_path)
+        self.idle_timeout = idle_timeout or float(os.getenv("MALAZ_DAEMON_IDLE", "1800"))
+        self.fingerprint = config_fingerprint()
+        self.agent = AsyncCodingAgent(self.project_path)
+        self.sessions = {}
+        self.active_requests = 0
+        self.last_activity = time.time()
+        self._stopped = None
+
+    def warm_up(self):
+        """Build the indexes up front so the first request doesn't pay for it"""
+        tool_manager = self.agent.tool_manager
+        with tool_manager._index_lock:
+            tool_manager._get_search_index()
+            tool_manager._get_xref_index()
+            tool_manager._get_code_index()
+
+    def get_session(self, session_id):
+        if session_id not in self.sessions:
+            self.sessions[session_id] = SessionMemory(session_id=session_id, project_path=self.project_path)
+        return self.sessions[session_id]
+
+    async def serve(self):
+        """Listen on the project socket until shut down or idle"""
+        self._stopped = asyncio.Event()
+        get_cache_dir(self.project_path)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        await asyncio.get_running_loop().run_in_executor(None, self.warm_up)
+
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        finally:
+            os.umask(old_umask)
+
+        idle_watch = asyncio.ensure_future(self._watch_idle())
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            idle_watch.cancel()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            for memory in self.sessions.values():
+                await asyncio.get_running_loop().run_in_executor(
+                    None, memory.wait_for_compaction, COMPACTION_EXIT_TIMEOUT
+                )
+            if debug_enabled() and self.agent.tracer.spans:
+                self.agent.tracer.export_chrome(trace_path(get_cache_dir(self.project_path), "daemon"))
+            await self.agent.close()
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def _watch_idle(self):
+        while True:
+            await asyncio.sleep(min(60, self.idle_timeout))
+            if self.active_requests == 0 and time.time() - self.last_activity > self.idle_timeout:
+                self.stop()
+                return
+
+    async def _handle_client(self, reader, writer):
+        self.active_requests += 1
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = json.loads(line)
+
+            async def send(message):
+                writer.write((json.dumps(message) + "\n").encode('utf-8'))
+                await writer.drain()
+
+            command = request.get("command")
+            if command == "ping":
+                await send({"pong": True, "pid": os.getpid(), "fingerprint": self.fingerprint})
+            elif command == "shutdown":
+                await send({"stopping": True})
+                self.stop()
+            else:
+                await self._handle_request(request, writer, send)
+        except Exception as e:
+            try:
+                writer.write((json.dumps({"error": str(e)}) + "\n").encode('utf-8'))
+                await writer.drain()
+            except Exception:
+                pass
+        finally:
+            self.active_requests -= 1
+            self.last_activity = time.time()
+            writer.close()
+
+    async def _handle_request(self, request, writer, send):
+        memory = self.get_session(request.get("session", "default"))
+        def send_token(text):
+            # Buffered by the transport; drained together with the response
+            writer.write((json.dumps({"token": text}) + "\n").encode('utf-8'))
+
+        on_token = send_token if request.get("stream") else None
+
+        response = await self.agent.process_request(
+            request["input"], memory, on_token=on_token,
+            use_cache=request.get("use_cache", True),
+            refresh_cache=request.get("refresh_cache", False)
+        )
+        await send({"response": response})
+
+def run_daemon(project_path):
+    """Run the daemon for a project in the foreground"""
+    asyncio.run(MalazDaemon(project_path).serve())
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import tempfile
+import subprocess
+from core.env import load_env
+
+# Keep module-level imports stdlib-only: this is what the CLI imports on the
+# fast path. The one exception is python-dotenv, which core.env imports
+# only when config_fingerprint() loads .env for a daemon request.
+
+# Environment the daemon captures at start-up; a change means it must restart
+CONFIG_ENV_PREFIXES = ("MALAZ_", "OPENAI_")
+STARTUP_TIMEOUT = 15
+
+def daemon_supported():
+    """Check whether Unix sockets are available on this platform"""
+    return hasattr(socket, "AF_UNIX") and os.name != "nt"
+
+def socket_path(project_path):
+    """Get the socket path for a project's daemon"""
+    project_path = os.path.abspath(project_path)
+    path = os.path.join(project_path, ".malaz", "daemon.sock")
+    if len(path) < 100:
+        return path
+    # Unix socket paths are limited to ~104 bytes
+    digest = hashlib.sha1(project_path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"malaz-{digest}.sock")
+
+def config_fingerprint():
+    """Hash the configuration a daemon would have been started with"""
+    # The daemon has loaded .env by the time it fingerprints; do the same here
+    load_env()
+    items = sorted(
+        (key, value) for key, value in os.environ.items()
+        if key.startswith(CONFIG_ENV_PREFIXES)
+    )
+    return hashlib.sha1(json.dumps(items).encode('utf-8')).hexdigest()
+
+class DaemonClient:
+    """Thin client for the per-project Malaz daemon"""
+
+    def __init__(self, project_path):
+        self.project_path = os.path.abspath(project_path)
+        self.socket_path = socket_path(self.project_path)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return sock
+
+    def _exchange(self, message, on_message=None):
+        """Send one request and read JSON lines until the final reply"""
+        sock = self._connect()
+        if sock is None:
+            return None
+        try:
+            sock.sendall((json.dumps(message) + "\n").encode('utf-8'))
+            with sock.makefile('r', encoding='utf-8') as stream:
+                for line in stream:
+                    reply = json.loads(line)
+                    if "token" in reply and on_message:
+                        on_message(reply)
+                        continue
+                    return reply
+        finally:
+            sock.close()
+        return None
+
+    def ping(self):
+        """Get the daemon's status, or None if no daemon is listening"""
+        try:
+            return self._exchange({"command": "ping"})
+        except (OSError, ValueError):
+            return None
+
+    def shutdown(self):
+        """Ask a running daemon to exit"""
+        try:
+            return self._exchange({"command": "shutdown"}) is not None
+        except (OSError, ValueError):
+            return False
+
+    def ensure_running(self):
+        """Make sure a daemon with the current configuration is listening"""
+        status = self.ping()
+        if status and status.get("fingerprint") == config_fingerprint():
+            return True
+        if status:
+            # Started with different settings (API key, model...): replace it
+            self.shutdown()
+            self._wait_for(lambda: self.ping() is None)
+        self._spawn()
+        return self._wait_for(lambda: self.ping() is not None)
+
+    def request(self, user_input, session="default", on_token=None, use_cache=True, refresh_cache=False):
+        """Run a request on the daemon and return the final response"""
+        on_message = (lambda reply: on_token(reply["token"])) if on_token else None
+        reply = self._exchange(
+            {
+                "input": user_input,
+                "session": session,
+                "stream": on_token is not None,
+                "use_cache": use_cache,
+                "refresh_cache": refresh_cache
+            },
+            on_message
+        )
+        if reply is None:
+            raise ConnectionError("Malaz daemon closed the connection")
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply["response"]
+
+    def _spawn(self):
+        """Start a detached daemon for the project"""
+        if getattr(sys, "frozen", False):
+            command = [sys.executable]
+        else:
+            command = [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "malaz_cli.py")]
+        command += ["--project", self.project_path, "serve"]
+
+        log_dir = os.path.join(self.project_path, ".malaz")
+        os.makedirs(log_dir, exist_ok=True)
+        with open(os.path.join(log_dir, "daemon.log"), 'ab') as log:
+            subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                start_new_session=True
+            )
+
+    @staticmethod
+    def _wait_for(condition, timeout=STARTUP_TIMEOUT):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return False
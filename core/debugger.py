@@ -1,12 +1,21 @@
 import os
 import re
-import ast
 from core.tool_manager import ToolManager
+from utils.ast_cache import get_ast_cache
+from utils.file_utils import walk_project
+from utils.scope_analysis import analyze_tree
 
 class CodeDebugger:
-    def __init__(self, project_path):
+    def __init__(self, project_path, tool_manager=None):
         self.project_path = project_path
-        self.tool_manager = ToolManager(project_path)
+        self._tool_manager = tool_manager
+
+    @property
+    def tool_manager(self):
+        """The agent's ToolManager when shared, else one created on first use"""
+        if self._tool_manager is None:
+            self._tool_manager = ToolManager(self.project_path)
+        return self._tool_manager
     
     def analyze_exception(self, exception_trace):
         """Analyze exception trace and suggest fixes"""
@@ -50,39 +59,46 @@ class CodeDebugger:
         full_path = os.path.join(self.project_path, file_path)
         if not os.path.exists(full_path):
             return f"File not found: {file_path}"
+        if os.path.isdir(full_path):
+            return self.static_analysis_project(file_path)
         
-        issues = []
         try:
-            with open(full_path, 'r') as f:
-                tree = ast.parse(f.read())
-            
-            # Walk through AST to find potential issues
-            for node in ast.walk(tree):
-                # Check for undefined variables
-                if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
-                    # This is a simplified check - real implementation would track scope
-                    pass
-                
-                # Check for unused imports
-                if isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                    for alias in node.names:
-                        if alias.asname:
-                            name = alias.asname
-                        else:
-                            name = alias.name.split('.')[0]
-                        
-                        # Check if name is used
-                        used = any(isinstance(n, ast.Name) and n.id == name 
-                                  for n in ast.walk(tree))
-                        
-                        if not used:
-                            issues.append(f"Unused import: {name}")
-            
-            # Add more checks as needed
-            
+            issues = self._analyze_file(full_path)
         except Exception as e:
             return f"Analysis failed: {str(e)}"
         
         if issues:
-            return "Potential issues found:\n" + "\n".join(f"- {issue}" for issue in issues)
-        return "No issues found in static analysis"
\ No newline at end of file
+            return "Potential issues found:\n" + "\n".join(
+                f"- {message} (line {lineno})" for lineno, message in issues)
+        return "No issues found in static analysis"
+
+    def static_analysis_project(self, dir_path="."):
+        """Perform static code analysis on every Python file under a directory"""
+        root_path = os.path.join(self.project_path, dir_path)
+        issues = []
+        failures = []
+        file_count = 0
+
+        for root, _, files in walk_project(root_path):
+            for file_name, _ in files:
+                if not file_name.endswith('.py'):
+                    continue
+                full_path = os.path.join(root, file_name)
+                rel_path = os.path.relpath(full_path, self.project_path)
+                file_count += 1
+                try:
+                    for lineno, message in self._analyze_file(full_path):
+                        issues.append(f"- {rel_path}:{lineno}: {message}")
+                except Exception as e:
+                    failures.append(f"- {rel_path}: Analysis failed: {str(e)}")
+
+        report = f"Analyzed {file_count} files: {len(issues)} potential issues found"
+        if issues or failures:
+            report += "\n" + "\n".join(issues + failures)
+        return report
+
+    def _analyze_file(self, full_path):
+        """Run the scope analysis on one file"""
+        with open(full_path, 'r') as f:
+            tree = get_ast_cache().parse(f.read())
+        return analyze_tree(tree, is_package_init=os.path.basename(full_path) == '__init__.py')
@@ -0,0 +1,29 @@
+import os
+
+# Installation directory, whose .env is used when none is found from the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_loaded = False
+
+def find_env_file():
+    """Get the .env file to load: the nearest one from the working directory up, else the installation's"""
+    from dotenv import find_dotenv
+    path = find_dotenv(usecwd=True)
+    if not path and os.path.isfile(os.path.join(ROOT, ".env")):
+        path = os.path.join(ROOT, ".env")
+    return path
+
+def load_env():
+    """Load the .env file once; variables already set are kept.
+
+    The agent, the daemon and the daemon client all call this before
+    reading configuration, so they agree on it (see ``config_fingerprint``).
+    """
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    path = find_env_file()
+    if path:
+        from dotenv import load_dotenv
+        load_dotenv(path)
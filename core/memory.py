@@ -1,63 +1,344 @@
 import os
 import json
+import uuid
+import threading
 from datetime import datetime
+from utils.tokenizer import get_tokenizer
+from utils.file_utils import get_cache_dir
+from core.memory_store import MemoryStore
+from utils.bm25 import BM25Index
+
+LEGACY_MEMORY_FILE = "malaz_memory.json"
+
+# The window keeps at most this many times max_history entries when
+# summarization is unavailable or falling behind
+HISTORY_LIMIT_FACTOR = 4
+
+# Seconds to wait at exit for a summary still being written
+COMPACTION_EXIT_TIMEOUT = 30
 
 class SessionMemory:
-    def __init__(self, session_id="default", max_history=20):
+    """Conversation history of one session, persisted in a MemoryStore.
+
+    Each session has its own append-only log under ``.malaz/memory`` of the
+    project. History is loaded lazily on first use, and interactions other
+    processes add to the same session are picked up before each read.
+
+    Once the recent history grows past ``max_history`` entries or
+    ``summary_tokens`` tokens, ``compact_in_background`` folds the oldest
+    turns into a running summary, so the prompt stays bounded however long
+    the session runs.
+
+    With a ``query``, ``get_context`` also retrieves the earlier turns most
+    relevant to it (BM25 over every stored turn, including the ones already
+    folded into the summary) alongside the most recent ones.
+    """
+
+    def __init__(self, session_id="default", max_history=20, tokenizer=None, project_path=None,
+                 summary_tokens=None):
         self.session_id = session_id
-        self.history = []
         self.max_history = max_history
-        self.memory_file = "malaz_memory.json"
-        self.load()
-    
+        self.project_path = os.path.abspath(project_path or os.getcwd())
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.summary_tokens = summary_tokens or int(os.getenv("MALAZ_SUMMARY_TOKENS", "3000"))
+        self.store = MemoryStore(os.path.join(get_cache_dir(self.project_path), "memory"), session_id)
+        self._summary = ""
+        self._history = None
+        self.retrieval_k = int(os.getenv("MALAZ_RETRIEVAL_K", "3"))
+        self._lock = threading.RLock()
+        self._compaction = None
+        self._retriever = None
+        self._entries = {}
+        self._window_start = None
+
+    @property
+    def history(self):
+        with self._lock:
+            if self._history is None:
+                self.load()
+            return self._history
+
+    @property
+    def summary(self):
+        """Running summary of the turns folded out of the history"""
+        with self._lock:
+            if self._history is None:
+                self.load()
+            return self._summary
+
     def add_interaction(self, user_input: str, agent_response: str):
         timestamp = datetime.now().isoformat()
-        self.history.append({
+        entry = {
+            'id': uuid.uuid4().hex,
             'timestamp': timestamp,
             'user': user_input,
             'agent': agent_response
-        })
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-        self.save()
-    
-    def get_context(self, max_tokens=2000):
-        context = ""
+        }
+        with self._lock:
+            if self._history is None:
+                self.load()
+            new_records = self.store.append(entry)
+            if new_records is None:
+                # Compacted by another process: the reload includes our entry
+                self.load()
+                return
+            self._apply(new_records + [{'op': 'add', 'entry': entry}])
+
+    def get_prompt_parts(self, max_tokens=2000, query=None, sticky=True):
+        """Split a token budget between summary, relevant and recent turns.
+
+        Returns a dict with the running ``summary`` (or ""), ``relevant``
+        older turns retrieved for ``query`` (a third of the budget is kept
+        for them, oldest first) and the most recent ``turns``; any turn not
+        among the recent ones can be retrieved. With ``sticky``, the
+        first recent turn only moves when the window overflows, and then by
+        half the budget, so the turns form a prefix that stays identical
+        from one request to the next.
+        """
+        with self._lock:
+            self.sync()
+            history = list(self._history)
+            summary = self._summary
+
         token_count = 0
-        
-        # Iterate from latest to oldest
-        for item in reversed(self.history):
-            entry = f"User: {item['user']}\nAgent: {item['agent']}\n"
-            entry_tokens = len(entry.split())
-            
-            if token_count + entry_tokens > max_tokens:
-                break
-                
-            context = entry + context
-            token_count += entry_tokens
-        
+        if summary:
+            token_count = self.tokenizer.count(summary)
+            if token_count > max_tokens:
+                summary = ""
+                token_count = 0
+
+        # Relevant older turns get up to a third of what is left; the recent
+        # turns are picked first so retrieval only skips turns they include
+        relevant_budget = (max_tokens - token_count) // 3 if query else 0
+        turns = self._select_turns(history, max_tokens - token_count - relevant_budget, sticky)
+        relevant = self.retrieve(query, exclude={self._entry_id(item) for item in turns}) if query else []
+
+        selected = []
+        for item in relevant:
+            entry_tokens = self.count_entry_tokens(item)
+            if entry_tokens <= relevant_budget:
+                selected.append(item)
+                relevant_budget -= entry_tokens
+        selected.sort(key=lambda item: item.get('timestamp', ''))
+
+        return {'summary': summary, 'relevant': selected, 'turns': turns}
+
+    def get_context(self, max_tokens=2000, query=None):
+        parts = self.get_prompt_parts(max_tokens, query, sticky=False)
+        context = ""
+        if parts['summary']:
+            context += f"Summary of earlier conversation:\n{parts['summary']}\n\n"
+        if parts['relevant']:
+            context += "Relevant earlier turns:\n" + "".join(self.format_entry(item) for item in parts['relevant']) + "\n"
+        context += "".join(self.format_entry(item) for item in parts['turns'])
         return context.strip()
-    
-    def save(self):
-        data = {
-            'session_id': self.session_id,
-            'history': self.history
-        }
-        with open(self.memory_file, 'w') as f:
-            json.dump(data, f, indent=2)
-    
+
+    def _select_turns(self, history, max_tokens, sticky):
+        """Pick the recent turns that fit, oldest first"""
+        counts = [self.count_entry_tokens(item) for item in history]
+
+        if sticky and self._window_start is not None:
+            for i, item in enumerate(history):
+                if self._entry_id(item) == self._window_start:
+                    if sum(counts[i:]) <= max_tokens:
+                        return history[i:]
+                    # Overflow: restart the window with room to grow
+                    max_tokens //= 2
+                    break
+
+        # Iterate from latest to oldest
+        start = len(history)
+        token_count = 0
+        while start > 0 and token_count + counts[start - 1] <= max_tokens:
+            start -= 1
+            token_count += counts[start]
+        turns = history[start:]
+        if sticky:
+            self._window_start = self._entry_id(turns[0]) if turns else None
+        return turns
+
+    def retrieve(self, query, k=None, exclude=()):
+        """Get the stored turns most relevant to a query, best first"""
+        with self._lock:
+            retriever = self._get_retriever()
+            hits = retriever.search(query, k or self.retrieval_k, exclude=exclude)
+            return [self._entries[doc_id] for doc_id, _ in hits]
+
+    @staticmethod
+    def format_entry(item):
+        return f"User: {item['user']}\nAgent: {item['agent']}\n"
+
+    def count_entry_tokens(self, item):
+        """Count the tokens of a history entry, caching the result on it"""
+        cached = item.get('tokens')
+        if cached and cached[0] == self.tokenizer.name:
+            return cached[1]
+        count = self.tokenizer.count(self.format_entry(item))
+        item['tokens'] = [self.tokenizer.name, count]
+        return count
+
+    def needs_compaction(self):
+        """Check whether the recent history should be folded into the summary"""
+        history = self.history
+        if len(history) > self.max_history:
+            return True
+        return sum(self.count_entry_tokens(item) for item in history) > self.summary_tokens
+
+    def compact(self, summarizer):
+        """Fold the oldest turns into the running summary.
+
+        ``summarizer(previous_summary, entries)`` returns the updated summary
+        text. The newest turns, up to half of the thresholds, stay verbatim.
+        Returns True if a summary was written.
+        """
+        with self._lock:
+            self.sync()
+            if not self.needs_compaction():
+                return False
+            history = self._history
+            keep = 0
+            kept_tokens = 0
+            for item in reversed(history):
+                kept_tokens += self.count_entry_tokens(item)
+                if keep >= self.max_history // 2 or kept_tokens > self.summary_tokens // 2:
+                    break
+                keep += 1
+            to_fold = history[:max(1, len(history) - keep)]
+            previous = self._summary
+
+        # The model call runs without the lock, so new turns are not blocked
+        summary = summarizer(previous, to_fold)
+        if not summary or 'id' not in to_fold[-1]:
+            return False
+
+        with self._lock:
+            self.sync()
+            if not any(item.get('id') == to_fold[-1]['id'] for item in self._history):
+                # Reset or folded elsewhere while we were summarizing
+                return False
+            record = {'op': 'summary', 'summary': summary, 'through': to_fold[-1]['id']}
+            new_records = self.store.summarize(summary, record['through'])
+            if new_records is None:
+                self.load()
+            else:
+                self._apply(new_records + [record])
+        return True
+
+    def compact_in_background(self, summarizer):
+        """Start ``compact`` on a background thread if it is needed"""
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            if not self.needs_compaction():
+                return
+            self._compaction = threading.Thread(target=self._compact_quietly, args=(summarizer,), daemon=True)
+            self._compaction.start()
+
+    def wait_for_compaction(self, timeout=None):
+        """Wait for a background compaction; returns False if it is still running.
+
+        Call it before the process exits: the compaction thread is a daemon
+        thread, so an unfinished summary would otherwise be lost.
+        """
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join(timeout)
+            return not compaction.is_alive()
+        return True
+
+    def _compact_quietly(self, summarizer):
+        try:
+            self.compact(summarizer)
+        except Exception:
+            # Retried after the next turn; the history stays as it was
+            pass
+
     def load(self):
-        if not os.path.exists(self.memory_file):
+        """(Re)load the latest entries of the session from the store"""
+        with self._lock:
+            if not self.store.exists():
+                self._import_legacy()
+            self._history, summary = self.store.tail(self.max_history * HISTORY_LIMIT_FACTOR)
+            self._summary = summary or ""
+            # Rebuilt from the log on the next retrieval
+            self._retriever = None
+            self._entries = {}
+
+    def sync(self):
+        """Pick up interactions other processes added to this session"""
+        with self._lock:
+            if self._history is None:
+                self.load()
+                return
+            new_records = self.store.read_new()
+            if new_records is None:
+                self.load()
+            else:
+                self._apply(new_records)
+
+    def reset(self):
+        with self._lock:
+            self.store.reset()
+            self._history = []
+            self._summary = ""
+            self._retriever = None
+            self._entries = {}
+
+    def _apply(self, records):
+        history = self._history
+        for record in records:
+            op = record.get('op')
+            if op == 'reset':
+                history.clear()
+                self._summary = ""
+                self._retriever = None
+                self._entries = {}
+            elif op == 'add':
+                history.append(record['entry'])
+                if self._retriever is not None:
+                    self._index_entry(record['entry'])
+            elif op == 'summary':
+                self._summary = record['summary']
+                for i, item in enumerate(history):
+                    if item.get('id') == record['through']:
+                        del history[:i + 1]
+                        break
+        limit = self.max_history * HISTORY_LIMIT_FACTOR
+        if len(history) > limit:
+            del history[:-limit]
+
+    def _get_retriever(self):
+        """Get the BM25 index over all turns, building it on first use"""
+        if self._retriever is None:
+            self._retriever = BM25Index()
+            self._entries = {}
+            # Covers turns that left the window or were folded into the summary
+            for entry in self.store.iter_entries():
+                self._index_entry(entry)
+        return self._retriever
+
+    def _index_entry(self, entry):
+        doc_id = self._entry_id(entry)
+        self._entries[doc_id] = entry
+        self._retriever.add(doc_id, f"{entry['user']}\n{entry['agent'] or ''}")
+
+    @staticmethod
+    def _entry_id(entry):
+        return entry.get('id') or entry.get('timestamp')
+
+    def _import_legacy(self):
+        """Move history from the old single-file format into the store"""
+        legacy_file = os.path.join(self.project_path, LEGACY_MEMORY_FILE)
+        if not os.path.exists(legacy_file):
             return
-            
         try:
-            with open(self.memory_file, 'r') as f:
+            with open(legacy_file, 'r') as f:
                 data = json.load(f)
-                self.session_id = data.get('session_id', self.session_id)
-                self.history = data.get('history', [])
         except Exception as e:
             print(f"Error loading memory: {e}")
-    
-    def reset(self):
-        self.history = []
-        self.save()
\ No newline at end of file
+            return
+        if data.get('session_id', 'default') != self.session_id:
+            return
+        for entry in data.get('history', []):
+            entry.setdefault('id', uuid.uuid4().hex)
+            self.store.append(entry)
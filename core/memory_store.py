@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import hashlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# How every add record line starts (see _write)
+ADD_PREFIX = b'{"op":"add",'
+
+@contextmanager
+def file_lock(lock_path):
+    """Hold an exclusive inter-process lock on ``lock_path``"""
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def session_file_name(session_id):
+    """Get a filesystem-safe file name for a session id"""
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', session_id)[:64]
+    if safe != session_id:
+        safe += '-' + hashlib.sha1(session_id.encode('utf-8')).hexdigest()[:8]
+    return safe
+
+class MemoryStore:
+    """Append-only JSONL log of one session's interactions.
+
+    Each line is a record: ``{"op": "add", "entry": {...}}``,
+    ``{"op": "summary", "summary": ..., "through": <entry id>}`` (the
+    running summary now covers every entry up to ``through``) or
+    ``{"op": "reset"}``. Writes append a single line under an inter-process
+    lock, so concurrent malaz processes never clobber each other, and each
+    reader tracks the offset it has seen to pick up records appended by
+    others. Records before the last reset (and entries beyond
+    ``max_entries``) are dropped by periodic compaction.
+    """
+
+    READ_CHUNK = 64 * 1024
+
+    def __init__(self, memory_dir, session_id, max_entries=None, compact_bytes=None):
+        os.makedirs(memory_dir, exist_ok=True)
+        name = session_file_name(session_id)
+        self.path = os.path.join(memory_dir, f"{name}.jsonl")
+        self.lock_path = os.path.join(memory_dir, f"{name}.lock")
+        self.max_entries = max_entries or int(os.getenv("MALAZ_MEMORY_MAX_ENTRIES", "5000"))
+        self.compact_bytes = compact_bytes or int(float(os.getenv("MALAZ_MEMORY_COMPACT_MB", "8")) * 1024 * 1024)
+        self.offset = 0
+        self.inode = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def tail(self, count):
+        """Get (entries, summary) for the current session state.
+
+        Entries are the last ``count`` ones since the last reset that the
+        latest summary does not cover yet. Only the end of the log is
+        parsed, so loading a session does not decode its whole history;
+        past ``count`` entries the scan only looks for the latest summary,
+        skipping add records without decoding them. Afterwards ``read_new``
+        continues from the end of the file.
+        """
+        entries = []
+        summary = None
+        through = None
+        with file_lock(self.lock_path):
+            try:
+                f = open(self.path, 'rb')
+            except FileNotFoundError:
+                self.offset, self.inode = 0, None
+                return entries, summary
+            with f:
+                stat = os.fstat(f.fileno())
+                self.offset, self.inode = stat.st_size, stat.st_ino
+                full = False
+                for line in self._iter_reversed(f, stat.st_size):
+                    if full and line.startswith(ADD_PREFIX):
+                        # Only a summary or reset further back still matters
+                        continue
+                    records = self._parse_lines([line])
+                    if not records:
+                        continue
+                    record = records[0]
+                    op = record.get('op')
+                    if op == 'reset':
+                        break
+                    if op == 'summary':
+                        if summary is None:
+                            summary, through = record['summary'], record.get('through')
+                        if full:
+                            break
+                    elif op == 'add' and not full:
+                        if through is not None and record['entry'].get('id') == through:
+                            break
+                        if len(entries) >= count:
+                            if summary is not None:
+                                break
+                            full = True
+                            continue
+                        entries.append(record['entry'])
+        entries.reverse()
+        return entries, summary
+
+    def read_new(self):
+        """Get records appended since the last read.
+
+        Returns None when the log was compacted or replaced by another
+        process, in which case the caller should reload with ``tail``.
+        """
+        with file_lock(self.lock_path):
+            return self._read_new()
+
+    def append(self, entry):
+        """Append an entry; returns the records other processes wrote first"""
+        return self._write({'op': 'add', 'entry': entry})
+
+    def summarize(self, summary, through):
+        """Record a running summary covering entries up to id ``through``"""
+        return self._write({'op': 'summary', 'summary': summary, 'through': through})
+
+    def reset(self):
+        """Record that the session was cleared"""
+        self._write({'op': 'reset'})
+
+    def iter_entries(self):
+        """Iterate over every entry since the last reset, oldest first"""
+        return iter(self._live_records()[0])
+
+    def _live_records(self):
+        """Get the entries since the last reset and the latest summary record"""
+        entries = []
+        summary = None
+        for record in self._iter_records():
+            op = record.get('op')
+            if op == 'reset':
+                entries = []
+                summary = None
+            elif op == 'add':
+                entries.append(record['entry'])
+            elif op == 'summary':
+                summary = record
+        return entries, summary
+
+    def compact(self):
+        """Rewrite the log without records that no longer matter"""
+        with file_lock(self.lock_path):
+            self._compact()
+
+    def _write(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        with file_lock(self.lock_path):
+            new_records = self._read_new()
+            with open(self.path, 'ab') as f:
+                f.write(line)
+            stat = os.stat(self.path)
+            self.offset, self.inode = stat.st_size, stat.st_ino
+            if stat.st_size > self.compact_bytes:
+                self._compact()
+        return new_records
+
+    def _read_new(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None if self.offset else []
+        if self.inode is not None and (stat.st_ino != self.inode or stat.st_size < self.offset):
+            return None
+        if stat.st_size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        # Only consume complete lines; a writer may be mid-way
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        self.inode = stat.st_ino
+        return self._parse_lines(data[:end].splitlines())
+
+    def _compact(self):
+        entries, summary = self._live_records()
+        entries = entries[-self.max_entries:]
+        records = [{'op': 'add', 'entry': entry} for entry in entries]
+        if summary is not None:
+            # Keep the summary right after the last entry it covers
+            position = 0
+            for i, entry in enumerate(entries):
+                if entry.get('id') == summary.get('through'):
+                    position = i + 1
+                    break
+            records.insert(position, summary)
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for record in records:
+                f.write((json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8'))
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self.offset, self.inode = stat.st_size, stat.st_ino
+
+    def _iter_records(self):
+        try:
+            with open(self.path, 'rb') as f:
+                for record in self._parse_lines(f):
+                    yield record
+        except FileNotFoundError:
+            return
+
+    def _iter_reversed(self, f, size):
+        """Yield the raw lines of the file from the end backwards"""
+        position = size
+        remainder = b''
+        while position > 0:
+            step = min(self.READ_CHUNK, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b'\n')
+            # The first piece may be the tail of an earlier line
+            remainder = lines.pop(0)
+            yield from reversed(lines)
+        yield remainder
+
+    @staticmethod
+    def _parse_lines(lines):
+        records = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn write from a crashed process
+                continue
+        return records
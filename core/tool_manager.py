@@ -1,19 +1,105 @@
 import os
 import subprocess
-import re
-import ast
 import json
+import time
+import asyncio
+import threading
 from utils.security import validate_path, SecurityException
+from utils.file_utils import get_cache_dir, scan_project
+from utils.ast_cache import get_ast_cache, summary_dir
+from utils.trigram_index import TrigramIndex
+from utils.xref_index import XRefIndex
+from utils.code_index import CodeIndex
+from utils.search_engine import CodeSearcher
+from utils.patch_engine import patch_file
+from utils.changeset import Changeset, ChangesetError
 from core.scaffold import ProjectScaffolder
+from core.tracing import Tracer
 
 class ToolManager:
-    def __init__(self, project_path):
+    SEARCH_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.go', '.rs', '.c', '.cpp', '.h')
+    # Seconds after which the search index re-checks the tree for outside edits
+    INDEX_MAX_AGE = 30
+    # Default caps that keep search_code responses a reasonable size
+    DEFAULT_MAX_RESULTS = 200
+    DEFAULT_MAX_PER_FILE = 20
+    # Tools that never change project files and can run concurrently
+    READ_ONLY_TOOLS = {
+        "search_code", "analyze_code", "code_review", "auto_debug",
+        "find_definition", "find_references", "find_callers",
+    }
+    # Tools that edit exactly the file named in their "file_path" argument
+    FILE_TOOLS = {"create_file", "modify_file"}
+    GLOBAL_LOCK_KEY = "*"
+
+    def __init__(self, project_path, tracer=None):
         self.project_path = project_path
-        self.scaffolder = ProjectScaffolder()
+        self.tracer = tracer or Tracer(enabled=False)
         self.tools = self._get_builtin_tools()
+        self._indexes = {}
+        self._stale_indexes = set()
+        # (time, scan_project listing) shared by the index refreshes
+        self._scan = None
+        # Bumped whenever a tool may have changed project files
+        self.files_version = 0
+        # Tools run concurrently (thread pool or asyncio), so index access is serialized
+        self._index_lock = threading.RLock()
+        # Subsystems behind the tools, built on first use
+        self._subsystems = {}
+        self._subsystem_lock = threading.Lock()
+
+    def _subsystem(self, name, factory):
+        """Get a shared subsystem, creating it on first use"""
+        with self._subsystem_lock:
+            if name not in self._subsystems:
+                self._subsystems[name] = factory()
+            return self._subsystems[name]
+
+    @property
+    def scaffolder(self):
+        return self._subsystem('scaffolder', ProjectScaffolder)
+
+    @property
+    def reviewer(self):
+        from utils.review_assistant import CodeReviewer
+        return self._subsystem('reviewer', CodeReviewer)
+
+    @property
+    def debugger(self):
+        # Imported here: core.debugger imports this module
+        from core.debugger import CodeDebugger
+        return self._subsystem('debugger', lambda: CodeDebugger(self.project_path, tool_manager=self))
+
+    @property
+    def vcs(self):
+        from core.vcs_integration import VCSIntegration
+        return self._subsystem('vcs', lambda: VCSIntegration(self.project_path))
 
     def _get_builtin_tools(self):
         """Get all builtin tools"""
+        patches = {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "diff": {
+                        "type": "string",
+                        "description": "Unified diff with one or more @@ hunks"
+                    },
+                    "search": {
+                        "type": "string",
+                        "description": "Exact lines to replace; must match one place"
+                    },
+                    "replace": {"type": "string"},
+                    "replace_all": {
+                        "type": "boolean",
+                        "description": "Replace every match of search or old_line"
+                    },
+                    "old_line": {"type": "string"},
+                    "new_line": {"type": "string"}
+                }
+            }
+        }
         return [
             {
                 "type": "function",
@@ -34,23 +120,58 @@ class ToolManager:
                 "type": "function",
                 "function": {
                     "name": "modify_file",
-                    "description": "Modify existing file using diff patches",
+                    "description": (
+                        "Modify existing file. Each patch is a unified diff, a search/replace block "
+                        "or a single line replacement; patches that do not match are reported"
+                    ),
                     "parameters": {
                         "type": "object",
                         "properties": {
                             "file_path": {"type": "string"},
-                            "patches": {
+                            "patches": patches
+                        },
+                        "required": ["file_path", "patches"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "apply_changeset",
+                    "description": (
+                        "Create, modify and delete many files in one call. "
+                        "Either every change is applied or no file is changed"
+                    ),
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "creates": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "file_path": {"type": "string"},
+                                        "content": {"type": "string"}
+                                    },
+                                    "required": ["file_path", "content"]
+                                }
+                            },
+                            "modifications": {
                                 "type": "array",
                                 "items": {
                                     "type": "object",
                                     "properties": {
-                                        "old_line": {"type": "string"},
-                                        "new_line": {"type": "string"}
-                                    }
+                                        "file_path": {"type": "string"},
+                                        "patches": patches
+                                    },
+                                    "required": ["file_path", "patches"]
                                 }
+                            },
+                            "deletions": {
+                                "type": "array",
+                                "items": {"type": "string"}
                             }
-                        },
-                        "required": ["file_path", "patches"]
+                        }
                     }
                 }
             },
@@ -76,7 +197,15 @@ class ToolManager:
                     "parameters": {
                         "type": "object",
                         "properties": {
-                            "pattern": {"type": "string"}
+                            "pattern": {"type": "string"},
+                            "max_results": {
+                                "type": "integer",
+                                "description": f"Maximum matches to return (default {self.DEFAULT_MAX_RESULTS})"
+                            },
+                            "max_per_file": {
+                                "type": "integer",
+                                "description": f"Maximum matches per file (default {self.DEFAULT_MAX_PER_FILE})"
+                            }
                         },
                         "required": ["pattern"]
                     }
@@ -95,6 +224,57 @@ class ToolManager:
                     }
                 }
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "find_definition",
+                    "description": "Find where a Python class, function, method or variable is defined",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "symbol": {
+                                "type": "string",
+                                "description": "Name or dotted name, e.g. 'ToolManager' or 'ToolManager.search_code'"
+                            }
+                        },
+                        "required": ["symbol"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "find_references",
+                    "description": (
+                        "Find every place a Python name is used. Matches the bare name: "
+                        "for 'Cache.get' every use of 'get' is returned"
+                    ),
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "symbol": {"type": "string"}
+                        },
+                        "required": ["symbol"]
+                    }
+                }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "find_callers",
+                    "description": (
+                        "Find the call sites of a Python function or method and the functions they are in. "
+                        "Matches the bare name: for 'Cache.get' every call of 'get' is returned"
+                    ),
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "symbol": {"type": "string"}
+                        },
+                        "required": ["symbol"]
+                    }
+                }
+            },
             {
                 "type": "function",
                 "function": {
@@ -105,7 +285,7 @@ class ToolManager:
                         "properties": {
                             "template": {
                                 "type": "string",
-                                "enum": list(self.scaffolder.TEMPLATES.keys())
+                                "enum": list(ProjectScaffolder.TEMPLATES.keys())
                             },
                             "project_path": {"type": "string"}
                         },
@@ -167,19 +347,43 @@ class ToolManager:
             "description": tool["function"]["description"]
         } for tool in self.tools]
 
+    def get_lock_key(self, tool_name, arguments):
+        """Get what a tool call must be serialized on.
+
+        Returns None for read-only tools, the normalized file path for
+        single-file edits and GLOBAL_LOCK_KEY for anything else.
+        """
+        if tool_name in self.READ_ONLY_TOOLS:
+            return None
+        if tool_name in self.FILE_TOOLS and isinstance(arguments.get("file_path"), str):
+            return os.path.normcase(os.path.normpath(os.path.join(self.project_path, arguments["file_path"])))
+        return self.GLOBAL_LOCK_KEY
+
     def execute_tool(self, tool_name, arguments):
         """Execute a tool with given name and arguments"""
+        with self.tracer.span("tool", tool_name):
+            return self._execute_tool(tool_name, arguments)
+
+    def _execute_tool(self, tool_name, arguments):
         try:
             if tool_name == "create_file":
                 return self.create_file(**arguments)
             elif tool_name == "modify_file":
                 return self.modify_file(**arguments)
+            elif tool_name == "apply_changeset":
+                return self.apply_changeset(**arguments)
             elif tool_name == "run_shell":
                 return self.run_shell(**arguments)
             elif tool_name == "search_code":
                 return self.search_code(**arguments)
             elif tool_name == "analyze_code":
                 return self.analyze_code(**arguments)
+            elif tool_name == "find_definition":
+                return self.find_definition(**arguments)
+            elif tool_name == "find_references":
+                return self.find_references(**arguments)
+            elif tool_name == "find_callers":
+                return self.find_callers(**arguments)
             elif tool_name == "scaffold_project":
                 return self.scaffold_project(**arguments)
             elif tool_name == "code_review":
@@ -195,10 +399,85 @@ class ToolManager:
         except Exception as e:
             return f"Tool Error: {str(e)}"
     
+    async def execute_tool_async(self, tool_name, arguments):
+        """Execute a tool without blocking the event loop.
+
+        Shell commands run as asyncio subprocesses; every other tool does
+        file I/O and is offloaded to the default thread pool.
+        """
+        if tool_name == "run_shell":
+            with self.tracer.span("tool", tool_name):
+                try:
+                    return await self.run_shell_async(**arguments)
+                except Exception as e:
+                    return f"Tool Error: {str(e)}"
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.execute_tool, tool_name, arguments)
+
     def _resolve_path(self, file_path):
         """Resolve file path relative to project with security check"""
         full_path = os.path.join(self.project_path, file_path)
         return validate_path(self.project_path, full_path)
+
+    def _notify_file_changed(self, full_path):
+        """Keep loaded indexes in sync after a tool changed a file"""
+        rel_path = os.path.relpath(full_path, self.project_path)
+        with self._index_lock:
+            self._scan = None
+            self.files_version += 1
+            for index in self._indexes.values():
+                index.update_file(rel_path)
+
+    def _mark_indexes_stale(self):
+        """Force a re-scan before the next index lookup"""
+        with self._index_lock:
+            self._scan = None
+            self.files_version += 1
+            self._stale_indexes.update(self._indexes)
+
+    def _get_index(self, name, factory):
+        """Get a project index, refreshing it if it may be out of date.
+
+        Callers must hold ``_index_lock`` while they use the index.
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = factory()
+            self._stale_indexes.add(name)
+
+        if name in self._stale_indexes or time.time() - index.last_refresh > self.INDEX_MAX_AGE:
+            index.refresh(self._project_files())
+            self._stale_indexes.discard(name)
+        if index.dirty:
+            index.save()
+        return index
+
+    def _project_files(self):
+        """Get the project file listing, walking the tree once for all indexes.
+
+        Callers must hold ``_index_lock``. Tool edits and ``run_shell``
+        discard the listing.
+        """
+        if self._scan is None or time.time() - self._scan[0] > self.INDEX_MAX_AGE:
+            self._scan = (time.time(), scan_project(self.project_path))
+        return self._scan[1]
+
+    def _get_search_index(self):
+        """Get the trigram index used by search_code"""
+        return self._get_index('search', lambda: TrigramIndex(self.project_path, self.SEARCH_EXTENSIONS))
+
+    def _get_xref_index(self):
+        """Get the cross-reference index used by the navigation tools"""
+        return self._get_index('xref', lambda: XRefIndex(self.project_path))
+
+    def _get_code_index(self):
+        """Get the chunk-level BM25 index used for prompt code retrieval"""
+        return self._get_index('code', lambda: CodeIndex(self.project_path, self.SEARCH_EXTENSIONS))
+
+    def retrieve_code(self, query, k=20):
+        """Get the code chunks most relevant to a query, best first"""
+        with self._index_lock:
+            return self._get_code_index().search(query, k)
     
     def create_file(self, file_path, content):
         """Create a new file with specified content"""
@@ -207,41 +486,61 @@ class ToolManager:
         
         with open(full_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        self._notify_file_changed(full_path)
         return f"File created: {file_path}"
     
     def modify_file(self, file_path, patches):
-        """Modify existing file using diff patches"""
+        """Modify an existing file with unified-diff hunks, search/replace blocks or line patches"""
         full_path = self._resolve_path(file_path)
         
         if not os.path.exists(full_path):
             return f"Error: File not found - {file_path}"
         
-        with open(full_path, 'r', encoding='utf-8') as f:
-            original_lines = f.readlines()
-        
-        new_lines = original_lines.copy()
-        
-        # Apply patches
-        changes = 0
-        for patch in patches:
-            try:
-                old_line = patch['old_line'] + '\n'
-                new_line = patch['new_line'] + '\n'
-                
-                if old_line in new_lines:
-                    index = new_lines.index(old_line)
-                    new_lines[index] = new_line
-                    changes += 1
-            except Exception:
-                continue
-        
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.writelines(new_lines)
-        
-        return f"File modified: {file_path} ({changes}/{len(patches)} changes applied)"
+        applied, failures = patch_file(full_path, patches)
+        if applied:
+            self._notify_file_changed(full_path)
+            result = f"File modified: {file_path} ({applied}/{len(patches)} changes applied)"
+        else:
+            result = f"Error: No changes applied to {file_path}"
+        if failures:
+            result += "\nFailed patches:\n" + "\n".join(f"- {failure}" for failure in failures)
+        return result
+    
+    def apply_changeset(self, creates=None, modifications=None, deletions=None):
+        """Create, modify and delete many files; all changes are applied or none"""
+        creates = creates or []
+        modifications = modifications or []
+        deletions = deletions or []
+        if not (creates or modifications or deletions):
+            return "Error: Empty changeset"
+
+        # Every path is checked before any file is touched
+        changeset = Changeset(
+            [(self._resolve_path(item["file_path"]), item["content"]) for item in creates],
+            [(self._resolve_path(item["file_path"]), item["patches"]) for item in modifications],
+            [self._resolve_path(file_path) for file_path in deletions],
+            root=self.project_path
+        )
+        try:
+            changeset.apply()
+        except ChangesetError as e:
+            return "Error: Changeset not applied, no files changed\n" + "\n".join(f"- {p}" for p in e.problems)
+        except OSError as e:
+            return f"Error: Changeset rolled back, no files changed - {str(e)}"
+
+        for full_path, _ in changeset.creates + changeset.modifications:
+            self._notify_file_changed(full_path)
+        for full_path in changeset.deletions:
+            self._notify_file_changed(full_path)
+        return (
+            f"Changeset applied: {len(creates)} created, {len(modifications)} modified, "
+            f"{len(deletions)} deleted"
+        )
     
     def run_shell(self, command):
         """Execute shell command in project directory"""
+        # Shell commands can touch any file, so re-scan before the next search
+        self._mark_indexes_stale()
         try:
             result = subprocess.run(
                 command,
@@ -260,25 +559,56 @@ class ToolManager:
         except Exception as e:
             return f"Command execution failed: {str(e)}"
         
-    def search_code(self, pattern):
+    async def run_shell_async(self, command):
+        """Execute shell command in project directory without blocking"""
+        self._mark_indexes_stale()
+        try:
+            process = await asyncio.create_subprocess_shell(
+                command,
+                cwd=self.project_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=30)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise TimeoutError(f"Command '{command}' timed out after 30 seconds")
+            output = f"Command: {command}\nExit code: {process.returncode}\n"
+            if stdout:
+                output += f"Stdout:\n{stdout.decode('utf-8', errors='replace')}\n"
+            if stderr:
+                output += f"Stderr:\n{stderr.decode('utf-8', errors='replace')}"
+            return output
+        except Exception as e:
+            return f"Command execution failed: {str(e)}"
+
+    def search_code(self, pattern, max_results=None, max_per_file=None):
         """Search codebase for pattern"""
+        max_results = max_results or self.DEFAULT_MAX_RESULTS
         results = []
-        regex = re.compile(pattern)
-        
-        for root, _, files in os.walk(self.project_path):
-            for file in files:
-                if file.endswith(('.py', '.js', '.ts', '.java', '.go', '.rs', '.c', '.cpp', '.h')):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            for i, line in enumerate(f, 1):
-                                if regex.search(line):
-                                    rel_path = os.path.relpath(file_path, self.project_path)
-                                    results.append(f"{rel_path}:{i}: {line.strip()}")
-                    except Exception:
-                        continue
-        
-        return "\n".join(results) if results else "No matches found"
+        truncated = False
+
+        for rel_path, line_number, line in self.iter_search(pattern, max_per_file):
+            if len(results) >= max_results:
+                truncated = True
+                break
+            results.append(f"{rel_path}:{line_number}: {line}")
+
+        if not results:
+            return "No matches found"
+        if truncated:
+            results.append(f"... (stopped after {max_results} matches, narrow the pattern to see more)")
+        return "\n".join(results)
+
+    def iter_search(self, pattern, max_per_file=None):
+        """Stream (rel_path, line_number, line) matches for a pattern"""
+        searcher = CodeSearcher(pattern, max_per_file=max_per_file or self.DEFAULT_MAX_PER_FILE)
+        # Only files containing every trigram the regex requires can match
+        with self._index_lock:
+            candidates = self._get_search_index().candidates(pattern)
+        return searcher.iter_matches(self.project_path, candidates)
 
     def analyze_code(self, file_path=None):
         """Analyze code structure and dependencies"""
@@ -302,24 +632,18 @@ class ToolManager:
                 for file in files if file.endswith('.py')
             ]
         
+        ast_cache = get_ast_cache()
+        cache_dir = summary_dir(get_cache_dir(self.project_path))
         for file in files:
             try:
                 with open(file, 'r', encoding='utf-8') as f:
-                    tree = ast.parse(f.read())
+                    summary = ast_cache.summarize(f.read(), cache_dir)
                 
                 rel_path = os.path.relpath(file, self.project_path)
                 
-                for node in ast.walk(tree):
-                    if isinstance(node, ast.Import):
-                        for alias in node.names:
-                            analysis["imports"].append(f"{rel_path}: import {alias.name}")
-                    elif isinstance(node, ast.ImportFrom):
-                        module = node.module if node.module else ""
-                        analysis["imports"].append(f"{rel_path}: from {module} import {', '.join(a.name for a in node.names)}")
-                    elif isinstance(node, ast.ClassDef):
-                        analysis["classes"].append(f"{rel_path}: class {node.name}")
-                    elif isinstance(node, ast.FunctionDef):
-                        analysis["functions"].append(f"{rel_path}: function {node.name}")
+                analysis["imports"].extend(f"{rel_path}: {imp}" for imp in summary["imports"])
+                analysis["classes"].extend(f"{rel_path}: class {name}" for name in summary["classes"])
+                analysis["functions"].extend(f"{rel_path}: function {name}" for name in summary["functions"])
             
             except Exception as e:
                 print(f"Error analyzing {file}: {e}")
@@ -327,8 +651,46 @@ class ToolManager:
         
         return json.dumps(analysis, indent=2)
     
+    def find_definition(self, symbol):
+        """Find where a symbol is defined"""
+        with self._index_lock:
+            definitions = self._get_xref_index().find_definitions(symbol)
+        results = [f"{rel_path}:{line}: {kind} {qualname}" for rel_path, line, kind, qualname in definitions]
+        return self._format_lookup(results, f"No definitions found for {symbol}")
+
+    def find_references(self, symbol):
+        """Find every place a symbol is used"""
+        with self._index_lock:
+            references = self._get_xref_index().find_references(symbol)
+        results = [f"{rel_path}:{line}" for rel_path, line in references]
+        return self._format_lookup(results, f"No references found for {symbol}", symbol)
+
+    def find_callers(self, symbol):
+        """Find the call sites of a function or method"""
+        with self._index_lock:
+            callers = self._get_xref_index().find_callers(symbol)
+        results = [f"{rel_path}:{line}: in {caller}" for rel_path, line, caller in callers]
+        return self._format_lookup(results, f"No callers found for {symbol}", symbol)
+
+    def _format_lookup(self, results, empty_message, by_name=None):
+        """Join index lookup results, capped like search_code.
+
+        ``by_name`` is the symbol of a lookup that matches bare names only;
+        if it is dotted, the results say the qualifier was not checked.
+        """
+        if not results:
+            return empty_message
+        if len(results) > self.DEFAULT_MAX_RESULTS:
+            extra = len(results) - self.DEFAULT_MAX_RESULTS
+            results = results[:self.DEFAULT_MAX_RESULTS] + [f"... ({extra} more)"]
+        if by_name and '.' in by_name:
+            qualifier, name = by_name.rsplit('.', 1)
+            results.insert(0, f"Matched by name '{name}'; the qualifier '{qualifier}' is not checked")
+        return "\n".join(results)
+
     def scaffold_project(self, template, project_path):
         """Create a new project from template"""
+        self._mark_indexes_stale()
         return self.scaffolder.create_project(template, project_path)
     
     def code_review(self, file_path):
@@ -0,0 +1,109 @@
+import os
+import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+def parse_tool_call(tool_call):
+    """Get (name, arguments, error) for a tool call dict"""
+    name = tool_call["function"]["name"]
+    try:
+        return name, json.loads(tool_call["function"]["arguments"] or "{}"), None
+    except json.JSONDecodeError as e:
+        return name, None, f"Tool Error: invalid arguments for {name}: {str(e)}"
+
+class _OrderedScheduling:
+    """Track which earlier tool calls a new call has to wait for.
+
+    Read-only tools wait for nothing. Mutating tools are chained per file:
+    each waits for the previous mutation of the same file, and tools that can
+    touch anything (shell, scaffold, commit) wait for all earlier mutations
+    and act as a barrier for later ones.
+    """
+
+    def __init__(self, tool_manager):
+        self.tool_manager = tool_manager
+        self.futures = {}
+        self._last_by_key = {}
+        self._barrier = None
+
+    def _dependencies(self, key):
+        if key is None:
+            return []
+        if key == self.tool_manager.GLOBAL_LOCK_KEY:
+            return [f for f in list(self._last_by_key.values()) + [self._barrier] if f is not None]
+        return [f for f in (self._last_by_key.get(key), self._barrier) if f is not None]
+
+    def _track(self, key, future):
+        if key == self.tool_manager.GLOBAL_LOCK_KEY:
+            self._last_by_key.clear()
+            self._barrier = future
+        elif key is not None:
+            self._last_by_key[key] = future
+
+class ToolRunner(_OrderedScheduling):
+    """Execute tool calls concurrently on a thread pool, keeping edits ordered"""
+
+    def __init__(self, tool_manager, max_workers=None):
+        super().__init__(tool_manager)
+        workers = max_workers or int(os.getenv("MALAZ_TOOL_WORKERS", "8"))
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+
+    def submit(self, tool_call):
+        """Schedule a tool call; its result is available via ``result``"""
+        name, arguments, error = parse_tool_call(tool_call)
+        if error:
+            self.futures[tool_call["id"]] = self.executor.submit(lambda: error)
+            return
+
+        key = self.tool_manager.get_lock_key(name, arguments)
+        with self._lock:
+            future = self.executor.submit(self._run, name, arguments, self._dependencies(key))
+            self._track(key, future)
+        self.futures[tool_call["id"]] = future
+
+    def result(self, tool_call_id):
+        """Wait for a tool call and return its response"""
+        return self.futures[tool_call_id].result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def _run(self, name, arguments, depends_on):
+        # Predecessors were submitted earlier, so with the pool's FIFO queue
+        # they are already running or ahead of us: waiting cannot deadlock
+        for future in depends_on:
+            future.result()
+        return self.tool_manager.execute_tool(name, arguments)
+
+class AsyncToolRunner(_OrderedScheduling):
+    """Execute tool calls as asyncio tasks, keeping edits ordered"""
+
+    def submit(self, tool_call):
+        """Schedule a tool call on the running event loop"""
+        name, arguments, error = parse_tool_call(tool_call)
+        if error:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(error)
+            self.futures[tool_call["id"]] = future
+            return
+
+        key = self.tool_manager.get_lock_key(name, arguments)
+        task = asyncio.ensure_future(self._run(name, arguments, self._dependencies(key)))
+        self._track(key, task)
+        self.futures[tool_call["id"]] = task
+
+    async def result(self, tool_call_id):
+        """Wait for a tool call and return its response"""
+        return await self.futures[tool_call_id]
+
+    async def shutdown(self):
+        pending = [f for f in self.futures.values() if not f.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run(self, name, arguments, depends_on):
+        for future in depends_on:
+            await future
+        return await self.tool_manager.execute_tool_async(name, arguments)
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger("malaz.trace")
+
+# Phases shown by format_stats, in request order
+PHASES = ["request", "context", "llm", "cache", "tool", "memory"]
+
+def debug_enabled():
+    """Whether MALAZ_DEBUG asks for verbose logging and trace export"""
+    return os.getenv("MALAZ_DEBUG", "0").lower() in ("1", "true", "yes")
+
+def configure_logging():
+    """Send Malaz debug logs (one line per span) to stderr when MALAZ_DEBUG is set"""
+    if not debug_enabled():
+        return
+    malaz_logger = logging.getLogger("malaz")
+    if not malaz_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+        malaz_logger.addHandler(handler)
+    malaz_logger.setLevel(logging.DEBUG)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class Tracer:
+    """Record timed spans of a session for /stats and Chrome trace export.
+
+    A span is a phase (``category``) and a name, e.g. ``("llm",
+    "chat.completion")`` or ``("tool", "search_code")``, with optional
+    arguments such as token usage. Spans are kept in a bounded buffer and
+    cost a couple of microseconds each, so tracing stays on by default.
+    """
+
+    def __init__(self, enabled=True, max_spans=10000):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.origin = time.perf_counter_ns()
+        self.started = datetime.now()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, category, name, **args):
+        """Time the enclosed block; the yielded dict can take more arguments"""
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            self.record(category, name, start, time.perf_counter_ns(), args)
+
+    def record(self, category, name, start_ns, end_ns, args=None):
+        """Add a finished span with ``perf_counter_ns`` timestamps"""
+        span = (category, name, start_ns, end_ns - start_ns, threading.get_ident(), args or {})
+        with self._lock:
+            self.spans.append(span)
+        if logger.isEnabledFor(logging.DEBUG):
+            details = " ".join(f"{key}={value}" for key, value in (args or {}).items())
+            logger.debug("%s %s %.1f ms %s", category, name, (end_ns - start_ns) / 1e6, details)
+
+    def phase_stats(self):
+        """Get {phase: {count, p50, p95, total}} in milliseconds"""
+        durations = {}
+        with self._lock:
+            spans = list(self.spans)
+        for category, _, _, duration, _, _ in spans:
+            durations.setdefault(category, []).append(duration / 1e6)
+        return {
+            phase: {
+                'count': len(values),
+                'p50': percentile(values, 0.5),
+                'p95': percentile(values, 0.95),
+                'total': sum(values)
+            }
+            for phase, values in durations.items()
+        }
+
+    def format_stats(self):
+        stats = self.phase_stats()
+        if not stats:
+            return "No requests traced yet"
+        phases = [p for p in PHASES if p in stats] + sorted(p for p in stats if p not in PHASES)
+        lines = [f"{'Phase':<10} {'Count':>6} {'p50 ms':>10} {'p95 ms':>10} {'Total ms':>10}"]
+        for phase in phases:
+            s = stats[phase]
+            lines.append(f"{phase:<10} {s['count']:>6} {s['p50']:>10.1f} {s['p95']:>10.1f} {s['total']:>10.1f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Get the spans as a Chrome trace-event document (chrome://tracing, Perfetto)"""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": thread_id,
+                "args": args
+            }
+            for category, name, start, duration, thread_id, args in spans
+        ]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"started": self.started.isoformat()}
+        }
+
+    def export_chrome(self, path):
+        """Write the Chrome trace of the session atomically; returns the path"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, default=str)
+        os.replace(tmp_file, path)
+        return path
+
+def trace_path(cache_dir, session_id="default"):
+    """Path of the trace file of a session started now"""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(cache_dir, "traces", f"{session_id}-{stamp}-{os.getpid()}.json")
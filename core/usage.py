@@ -0,0 +1,44 @@
+import threading
+
+class UsageStats:
+    """Accumulate token usage reported by the API, including cached prompt tokens"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.last = None
+        self._lock = threading.Lock()
+
+    def record(self, usage):
+        """Add a ``response.usage`` object; returns (prompt, cached, completion)"""
+        if usage is None:
+            return None
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = (getattr(details, 'cached_tokens', None) or 0) if details is not None else 0
+        prompt = getattr(usage, 'prompt_tokens', 0) or 0
+        completion = getattr(usage, 'completion_tokens', 0) or 0
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt
+            self.cached_tokens += cached
+            self.completion_tokens += completion
+            self.last = (prompt, cached, completion)
+        return self.last
+
+    @property
+    def hit_rate(self):
+        """Share of prompt tokens served from the provider's prompt cache"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def format(self):
+        lines = [
+            f"Requests: {self.requests}",
+            f"Prompt tokens: {self.prompt_tokens} (cached: {self.cached_tokens}, {self.hit_rate:.0%})",
+            f"Completion tokens: {self.completion_tokens}"
+        ]
+        if self.last:
+            prompt, cached, completion = self.last
+            lines.append(f"Last request: {prompt} prompt ({cached} cached), {completion} completion")
+        return "\n".join(lines)
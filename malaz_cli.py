@@ -1,33 +1,101 @@
 import os
 import argparse
-from rich.console import Console
-from rich.syntax import Syntax
-from core.agent import CodingAgent
-from core.memory import SessionMemory
+from typing import TYPE_CHECKING
+
+# Keep module-level imports light: --version and --help must not pay for
+# rich, openai or the agent. Everything else is imported where it is used
+# (checked by scripts/check_import_time.py).
+if TYPE_CHECKING:
+    from core.memory import SessionMemory
+    from core.daemon_client import DaemonClient
 
 try:
     from core import __version__
 except ImportError:
     __version__ = "1.0.0"
 
-console = Console()
+_console = None
+
+def get_console():
+    """Get the rich Console, creating it on first use; importing rich takes ~40ms"""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+class LazyConsole:
+    """Stand-in for the rich Console that defers creating it"""
+
+    def __getattr__(self, name):
+        return getattr(get_console(), name)
+
+console = LazyConsole()
 
 def main():
-    console.print("Malaz - AI Coding Agent", style="bold green")
     parser = argparse.ArgumentParser(description='Malaz - AI Coding Agent')
     parser.add_argument('--project', type=str, default=os.getcwd(), help='Project directory')
     parser.add_argument('--version', action='version', version=f'Malaz {__version__}')
-    parser.add_argument('command', nargs='?', type=str, help='Direct command to execute')
+    parser.add_argument('--no-stream', action='store_true', help='Wait for the full response instead of streaming it')
+    parser.add_argument('--no-daemon', action='store_true', help='Run direct commands in this process instead of the project daemon')
+    parser.add_argument('--stop-daemon', action='store_true', help='Stop the daemon of the project and exit')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache for this request')
+    parser.add_argument('--refresh-cache', action='store_true', help='Ignore cached responses and store fresh ones')
+    parser.add_argument('--clear-cache', action='store_true', help='Delete every cached response of the project and exit')
+    parser.add_argument('command', nargs='?', type=str, help="Direct command to execute, or 'serve' to run the project daemon")
     args = parser.parse_args()
+    console.print("Malaz - AI Coding Agent", style="bold green")
+
+    from core.daemon_client import DaemonClient, daemon_supported
+    from core.tracing import configure_logging
+    configure_logging()
+
+    if args.stop_daemon:
+        stopped = daemon_supported() and DaemonClient(args.project).shutdown()
+        console.print("Daemon stopped" if stopped else "No daemon running")
+        return
+
+    if args.clear_cache:
+        from utils.response_cache import ResponseCache
+        from utils.file_utils import get_cache_dir
+        cache = ResponseCache(os.path.join(get_cache_dir(args.project), ResponseCache.DB_FILE))
+        cache.clear()
+        console.print("Response cache cleared")
+        return
+
+    cache_options = {'use_cache': not args.no_cache, 'refresh_cache': args.refresh_cache}
+
+    if args.command == 'serve':
+        from core.daemon import run_daemon
+        console.print(f"[bold cyan]Serving:[/] {os.path.abspath(args.project)}")
+        run_daemon(args.project)
+        return
+
+    if args.command:
+        console.print(f"[bold cyan]Executing:[/] {args.command}")
 
-    session_memory = SessionMemory()
+    if args.command and not args.no_daemon and daemon_supported():
+        client = DaemonClient(args.project)
+        if client.ensure_running():
+            daemon_request(client, args.command, stream=not (args.command.startswith('!') or args.no_stream), **cache_options)
+            return
+        console.print("[yellow]Daemon failed to start, running in-process[/]")
+
+    from core.agent import CodingAgent
+    from core.memory import SessionMemory
+    session_memory = SessionMemory(project_path=args.project)
     agent = CodingAgent(project_path=args.project)
 
     if args.command:
         # Direct command execution
-        console.print(f"[bold cyan]Executing:[/] {args.command}")
-        response = agent.process_request(args.command, session_memory)
-        console.print(f"[bold green]\n{response}\n[/]")
+        try:
+            if args.command.startswith('!') or args.no_stream:
+                response = agent.process_request(args.command, session_memory, **cache_options)
+                console.print(f"[bold green]\n{response}\n[/]")
+            else:
+                stream_request(agent, args.command, session_memory, **cache_options)
+        finally:
+            end_session(agent, session_memory)
         return
     
      # Interactive mode
@@ -51,21 +119,71 @@ def main():
                 response = agent.process_request(user_input, session_memory)
                 # Format code review output
                 if user_input.startswith('!review'):
+                    from rich.syntax import Syntax
                     console.print(Syntax(response, "text", theme="monokai", line_numbers=True))
                 else:
                     console.print(f"[bold green]\n{response}\n[/]")
                 continue
                 
             # Process natural language request
-            response = agent.process_request(user_input, session_memory)
-            console.print(f"[bold green]\n{response}\n[/]")
+            if args.no_stream:
+                response = agent.process_request(user_input, session_memory, **cache_options)
+                console.print(f"[bold green]\n{response}\n[/]")
+            else:
+                stream_request(agent, user_input, session_memory, **cache_options)
             
         except KeyboardInterrupt:
             console.print("\n[bold yellow]Session interrupted. Type /exit to quit[/]")
         except Exception as e:
             console.print(f"[bold red]Error: {str(e)}[/]")
 
-def handle_command(command: str, agent: CodingAgent, memory: SessionMemory):
+    end_session(agent, session_memory)
+
+def end_session(agent, memory: 'SessionMemory'):
+    """Let a pending history summary finish, then write the trace"""
+    from core.memory import COMPACTION_EXIT_TIMEOUT
+    if not memory.wait_for_compaction(0.1):
+        console.print("[dim]Saving session summary...[/]")
+        memory.wait_for_compaction(COMPACTION_EXIT_TIMEOUT)
+    export_trace(agent, memory)
+
+def export_trace(agent, memory: 'SessionMemory', force=False):
+    """Write the Chrome trace of this session when MALAZ_DEBUG is set (or ``force``)"""
+    from core.tracing import debug_enabled, trace_path
+    if not (force or debug_enabled()) or not agent.tracer.spans:
+        return None
+    from utils.file_utils import get_cache_dir
+    path = agent.tracer.export_chrome(trace_path(get_cache_dir(agent.project_path), memory.session_id))
+    console.print(f"[dim]Trace written to {path} (open in chrome://tracing or ui.perfetto.dev)[/]")
+    return path
+
+def daemon_request(client: 'DaemonClient', user_input: str, stream=True, **options):
+    """Run a direct command on the project daemon"""
+    if not stream:
+        response = client.request(user_input, **options)
+        console.print(f"[bold green]\n{response}\n[/]")
+        return response
+    return render_stream(lambda on_token: client.request(user_input, on_token=on_token, **options))
+
+def stream_request(agent, user_input: str, memory: 'SessionMemory', **options):
+    """Process a request, rendering the response live as tokens arrive"""
+    return render_stream(lambda on_token: agent.process_request(user_input, memory, on_token=on_token, **options))
+
+def render_stream(run):
+    """Call ``run(on_token)`` while rendering the streamed tokens live"""
+    from rich.live import Live
+    from rich.text import Text
+    text = Text(style="bold green")
+    console.print()
+    with Live(text, console=get_console(), refresh_per_second=15, vertical_overflow="visible"):
+        response = run(text.append)
+    if not text.plain and response:
+        # Nothing was streamed (e.g. an empty model reply with tool output only)
+        console.print(f"[bold green]{response}[/]")
+    console.print()
+    return response
+
+def handle_command(command: str, agent, memory: 'SessionMemory'):
     """Handle custom commands"""
     cmd_parts = command[1:].split()
     if not cmd_parts:
@@ -81,6 +199,9 @@ def handle_command(command: str, agent: CodingAgent, memory: SessionMemory):
         console.print("/history - Show conversation history")
         console.print("/tools - List available tools")
         console.print("/state - Show current project state")
+        console.print("/usage - Show token usage and prompt cache hits")
+        console.print("/stats - Show p50/p95 latency per phase")
+        console.print("/trace - Export a Chrome trace of this session")
         console.print("/exit - Exit the program")
     
     elif cmd == "reset":
@@ -101,6 +222,16 @@ def handle_command(command: str, agent: CodingAgent, memory: SessionMemory):
         for tool in agent.tool_manager.list_tools():
             console.print(f"- {tool['name']}: {tool['description']}")
     
+    elif cmd == "usage":
+        console.print(f"[bold]Token Usage:[/]\n{agent.usage.format()}")
+    
+    elif cmd == "stats":
+        console.print(f"[bold]Latency per Phase:[/]\n{agent.tracer.format_stats()}")
+    
+    elif cmd == "trace":
+        if not export_trace(agent, memory, force=True):
+            console.print("No requests traced yet")
+    
     elif cmd == "state":
         console.print(f"[bold]Project Path:[/] {agent.project_path}")
         console.print(f"[bold]Context:[/]\n{agent.context}")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Import-time regression check for the Malaz CLI.
+
+Runs trivial invocations (--version, --help) under ``python -X importtime``
+and fails if they import any heavy module (rich, openai, the agent, ...) or
+if the modules they import on top of a bare interpreter take longer than
+the budget.
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "malaz_cli.py")
+
+INVOCATIONS = [["--version"], ["--help"]]
+
+# Never needed to print the version or the help text
+FORBIDDEN = (
+    "rich", "openai", "httpx", "pydantic", "dotenv", "tiktoken", "pygments",
+    "core.agent", "core.memory", "core.tool_manager", "utils",
+)
+
+def parse_importtime(stderr):
+    """Get {module: self microseconds} from ``-X importtime`` output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        modules[parts[2].strip()] = int(parts[0])
+    return modules
+
+def measure(args, python=sys.executable):
+    """Get (wall seconds, {module: self us}) of one CLI invocation"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [python, "-X", "importtime", CLI] + args,
+        capture_output=True, text=True, timeout=60
+    )
+    return time.perf_counter() - start, parse_importtime(result.stderr)
+
+def baseline_modules(python=sys.executable):
+    """Modules a bare interpreter imports at start-up"""
+    result = subprocess.run([python, "-X", "importtime", "-c", "pass"], capture_output=True, text=True, timeout=60)
+    return set(parse_importtime(result.stderr))
+
+def check(budget_ms=30.0, max_wall_ms=None, runs=5):
+    """Check every trivial invocation; returns a list of problems"""
+    baseline = baseline_modules()
+    problems = []
+    for args in INVOCATIONS:
+        samples = [measure(args) for _ in range(runs)]
+        wall = min(sample[0] for sample in samples)
+        # The fastest run is the least noisy estimate
+        modules = min((sample[1] for sample in samples),
+                      key=lambda m: sum(us for name, us in m.items() if name not in baseline))
+        extra = {name: us for name, us in modules.items() if name not in baseline}
+        extra_ms = sum(extra.values()) / 1000
+        label = " ".join(args)
+        print(f"{label}: {wall * 1000:.0f} ms wall, {extra_ms:.1f} ms importing {len(extra)} modules")
+
+        heavy = sorted(name for name in extra if name.startswith(FORBIDDEN))
+        if heavy:
+            problems.append(f"{label} imports {', '.join(heavy)}")
+        if extra_ms > budget_ms:
+            slowest = sorted(extra.items(), key=lambda item: item[1], reverse=True)[:5]
+            details = ", ".join(f"{name} {us / 1000:.1f} ms" for name, us in slowest)
+            problems.append(f"{label} spends {extra_ms:.1f} ms importing (budget {budget_ms} ms): {details}")
+        if max_wall_ms is not None and wall * 1000 > max_wall_ms:
+            problems.append(f"{label} takes {wall * 1000:.0f} ms (limit {max_wall_ms} ms)")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of trivial CLI invocations')
+    parser.add_argument('--budget-ms', type=float, default=30.0,
+                        help='Allowed import time on top of a bare interpreter')
+    parser.add_argument('--max-wall-ms', type=float, help='Also fail if an invocation takes longer than this')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per invocation; the fastest counts')
+    args = parser.parse_args()
+
+    problems = check(args.budget_ms, args.max_wall_ms, args.runs)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ Import time within budget")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+"""
+Tests for CodingAgent request processing with a fake OpenAI client
+"""
+import unittest
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "dummy-key-for-testing")
+
+from core.agent import CodingAgent
+from core.async_agent import AsyncCodingAgent
+from core.daemon import MalazDaemon
+from core.daemon_client import DaemonClient, daemon_supported
+from core.memory import SessionMemory
+from core.tool_manager import ToolManager
+from core.tool_runner import ToolRunner
+from utils.response_cache import ResponseCache
+import core.env
+
+
+def chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def tool_delta(index, call_id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index,
+        id=call_id,
+        function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+class FakeCompletions:
+    """Return scripted streamed responses, one script per create() call"""
+
+    def __init__(self, scripts):
+        self.scripts = list(scripts)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return iter(self.scripts.pop(0))
+
+
+class TestAgentStreaming(unittest.TestCase):
+    """Test streaming and tool call assembly"""
+
+    def setUp(self):
+        """Create an agent over a throwaway project"""
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+        self.agent = CodingAgent(self.project_path)
+        self.memory = SessionMemory(project_path=self.project_path)
+
+    def tearDown(self):
+        self.memory.reset()
+        shutil.rmtree(self.project_path)
+
+    def use_scripts(self, *scripts):
+        completions = FakeCompletions(scripts)
+        self.agent.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        return completions
+
+    def test_streams_tokens(self):
+        """Test that text deltas reach on_token and the final response"""
+        self.use_scripts([chunk("Hel"), chunk("lo"), chunk(None)])
+        tokens = []
+        response = self.agent.process_request("hi", self.memory, on_token=tokens.append)
+        self.assertEqual(tokens, ["Hel", "lo"])
+        self.assertEqual(response, "Hello")
+
+    def test_records_cached_prompt_tokens(self):
+        """Test that usage from the final stream chunk is recorded"""
+        usage = SimpleNamespace(
+            prompt_tokens=1200, completion_tokens=5,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=1024)
+        )
+        completions = self.use_scripts([chunk("ok"), SimpleNamespace(choices=[], usage=usage)])
+        self.agent.process_request("hi", self.memory, on_token=lambda text: None)
+
+        self.assertEqual(completions.calls[0]["stream_options"], {"include_usage": True})
+        self.assertEqual(self.agent.usage.last, (1200, 1024, 5))
+        self.assertAlmostEqual(self.agent.usage.hit_rate, 1024 / 1200)
+
+    def test_assembles_streamed_tool_calls(self):
+        """Test that tool call arguments split across chunks are executed"""
+        arguments = json.dumps({"pattern": "def main"})
+        completions = self.use_scripts(
+            [
+                chunk(tool_calls=[tool_delta(0, "call_1", "search_code", arguments[:5])]),
+                chunk(tool_calls=[tool_delta(0, arguments=arguments[5:])]),
+                chunk(tool_calls=[tool_delta(1, "call_2", "find_definition", '{"symbol": "main"}')]),
+            ],
+            [chunk("Found it.")]
+        )
+        tokens = []
+        response = self.agent.process_request("where is main?", self.memory, on_token=tokens.append)
+
+        self.assertEqual(response, "Found it.")
+        tool_messages = [m for m in completions.calls[1]["messages"] if m["role"] == "tool"]
+        self.assertEqual([m["tool_call_id"] for m in tool_messages], ["call_1", "call_2"])
+        self.assertEqual(tool_messages[0]["content"], "app.py:1: def main():")
+        self.assertEqual(tool_messages[1]["content"], "app.py:1: function main")
+
+    def test_multi_round_tool_loop(self):
+        """Test that the agent keeps calling tools until the model answers"""
+        completions = self.use_scripts(
+            [chunk(tool_calls=[tool_delta(0, "call_1", "create_file", '{"file_path": "b.py", "content": "x = 1"}')])],
+            [chunk(tool_calls=[tool_delta(0, "call_2", "search_code", '{"pattern": "x = 1"}')])],
+            [chunk("Done.")]
+        )
+        response = self.agent.process_request("make b.py", self.memory, on_token=lambda text: None)
+        self.assertEqual(response, "Done.")
+        self.assertEqual(len(completions.calls), 3)
+        self.assertEqual(completions.calls[2]["messages"][-1]["content"], "b.py:1: x = 1")
+
+    def test_step_limit(self):
+        """Test that a final answer is requested once max_steps is reached"""
+        self.agent.max_steps = 1
+        completions = self.use_scripts(
+            [chunk(tool_calls=[tool_delta(0, "call_1", "search_code", '{"pattern": "main"}')])],
+            [chunk("Stopped.")]
+        )
+        self.assertEqual(self.agent.process_request("loop", self.memory, on_token=lambda text: None), "Stopped.")
+        self.assertNotIn("tools", completions.calls[1])
+
+
+class SlowToolManager(ToolManager):
+    """Tool manager whose tools sleep and record their execution order"""
+
+    def __init__(self, project_path):
+        super().__init__(project_path)
+        self.order = []
+        self.lock = threading.Lock()
+
+    def execute_tool(self, tool_name, arguments):
+        time.sleep(arguments.get("delay", 0.1))
+        with self.lock:
+            self.order.append((tool_name, arguments.get("n")))
+        return tool_name
+
+
+def call(call_id, name, **arguments):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+class TestToolRunner(unittest.TestCase):
+    """Test concurrent execution of independent tool calls"""
+
+    def test_read_only_tools_run_concurrently(self):
+        """Test that five searches cost about as much as the slowest one"""
+        runner = ToolRunner(SlowToolManager(tempfile.gettempdir()))
+        start = time.time()
+        for i in range(5):
+            runner.submit(call(f"c{i}", "search_code", pattern="x", delay=0.2))
+        results = [runner.result(f"c{i}") for i in range(5)]
+        runner.shutdown()
+        self.assertEqual(results, ["search_code"] * 5)
+        self.assertLess(time.time() - start, 0.6)
+
+    def test_edits_to_one_file_keep_order(self):
+        """Test that edits to the same file run in submission order"""
+        tool_manager = SlowToolManager(tempfile.gettempdir())
+        runner = ToolRunner(tool_manager)
+        runner.submit(call("c1", "modify_file", file_path="a.py", n=1, delay=0.2))
+        runner.submit(call("c2", "modify_file", file_path="a.py", n=2, delay=0.0))
+        runner.submit(call("c3", "run_shell", command="ls", n=3, delay=0.0))
+        runner.submit(call("c4", "create_file", file_path="b.py", n=4, delay=0.0))
+        runner.shutdown()
+        self.assertEqual(tool_manager.order, [
+            ("modify_file", 1), ("modify_file", 2), ("run_shell", 3), ("create_file", 4)
+        ])
+
+
+class TestLazySubsystems(unittest.TestCase):
+    """Test that subsystems are built on first use and shared"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_special_commands_skip_scan_and_client(self):
+        agent = CodingAgent(self.project_path)
+        memory = SessionMemory(project_path=self.project_path)
+        self.assertIn("app.py", agent.process_request("!review app.py", memory))
+        self.assertIsNone(agent._openai_client)
+        self.assertIsNone(agent._context)
+        self.assertEqual(set(agent.tool_manager._subsystems), {"reviewer"})
+
+    def test_subsystems_are_shared(self):
+        agent = CodingAgent(self.project_path)
+        self.assertIs(agent.reviewer, agent.tool_manager.reviewer)
+        self.assertIs(agent.debugger, agent.tool_manager.debugger)
+        self.assertIs(agent.debugger.tool_manager, agent.tool_manager)
+        self.assertIn("app.py", agent.context)
+
+    def test_context_follows_project_changes(self):
+        agent = CodingAgent(self.project_path)
+        self.assertNotIn("models.py", agent.context)
+
+        # Files written by tools show up in the next prompt
+        agent.tool_manager.create_file("models.py", "class User:\n    pass\n")
+        self.assertIn("models.py", agent.context)
+
+        # Files written by someone else once the context is old enough
+        with open(os.path.join(self.project_path, 'views.py'), 'w') as f:
+            f.write("def index():\n    pass\n")
+        self.assertNotIn("views.py", agent.context)
+        agent._context_state = (agent._context_state[0], 0)
+        self.assertIn("views.py", agent.context)
+
+    def test_tool_manager_review_and_debug(self):
+        tool_manager = ToolManager(self.project_path)
+        self.assertIn("app.py", tool_manager.code_review("app.py"))
+        trace = f'File "{os.path.join(self.project_path, "app.py")}", line 2\nNameError: x'
+        self.assertNotIn("Error executing", tool_manager.execute_tool("auto_debug", {"error_trace": trace}))
+
+
+class FakeAsyncStream:
+    """Async iterator over scripted chunks with a delay per chunk"""
+
+    def __init__(self, chunks, delay):
+        self.chunks = list(chunks)
+        self.delay = delay
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delay)
+        return self.chunks.pop(0)
+
+
+class FakeAsyncCompletions:
+    """Answer every request with the same scripted stream"""
+
+    def __init__(self, script, delay=0.0):
+        self.script = script
+        self.delay = delay
+
+    async def create(self, **kwargs):
+        return FakeAsyncStream(self.script(kwargs), self.delay)
+
+
+class TestAsyncAgent(unittest.TestCase):
+    """Test AsyncCodingAgent sessions and async tools"""
+
+    def setUp(self):
+        """Create an async agent over a throwaway project"""
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+        self.agent = AsyncCodingAgent(self.project_path)
+        self.memories = [SessionMemory(session_id=f"async-{i}", project_path=self.project_path) for i in range(5)]
+
+    def tearDown(self):
+        for memory in self.memories:
+            memory.reset()
+        shutil.rmtree(self.project_path)
+
+    def test_concurrent_sessions(self):
+        """Test that sessions overlap instead of running back to back"""
+        def script(kwargs):
+            if kwargs["messages"][-1]["role"] == "tool":
+                return [chunk("done: "), chunk(kwargs["messages"][-1]["content"])]
+            return [chunk(tool_calls=[tool_delta(0, "call_1", "run_shell", '{"command": "echo hi"}')])]
+
+        self.agent.async_client = SimpleNamespace(
+            chat=SimpleNamespace(completions=FakeAsyncCompletions(script, delay=0.1))
+        )
+
+        async def run_all():
+            return await asyncio.gather(*[
+                self.agent.process_request("say hi", memory, on_token=lambda text: None)
+                for memory in self.memories
+            ])
+
+        start = time.time()
+        responses = asyncio.run(run_all())
+        self.assertLess(time.time() - start, 1.0)
+        for response in responses:
+            self.assertTrue(response.startswith("done: Command: echo hi\nExit code: 0\nStdout:\nhi"))
+
+
+    def test_prompt_preparation_does_not_block_the_loop(self):
+        """Test that slow context building in one session doesn't stall the others"""
+        prepare_messages = self.agent._prepare_messages
+
+        def slow_prepare_messages(user_input, memory):
+            time.sleep(0.2)
+            return prepare_messages(user_input, memory)
+
+        self.agent._prepare_messages = slow_prepare_messages
+        self.agent.async_client = SimpleNamespace(
+            chat=SimpleNamespace(completions=FakeAsyncCompletions(lambda kwargs: [chunk("ok")]))
+        )
+
+        async def run_all():
+            return await asyncio.gather(*[
+                self.agent.process_request("hi", memory, on_token=lambda text: None)
+                for memory in self.memories
+            ])
+
+        start = time.time()
+        self.assertEqual(asyncio.run(run_all()), ["ok"] * 5)
+        self.assertLess(time.time() - start, 0.8)
+
+    def test_response_cache_runs_off_the_loop(self):
+        """Test that cache reads and writes don't run on the event loop thread"""
+        threads = []
+
+        class RecordingCache(ResponseCache):
+            def get(self, key):
+                threads.append(threading.current_thread())
+                return super().get(key)
+
+            def put(self, key, content, tool_calls):
+                threads.append(threading.current_thread())
+                return super().put(key, content, tool_calls)
+
+        self.agent.response_cache = RecordingCache(os.path.join(self.project_path, "cache.sqlite"))
+        completions = FakeAsyncCompletions(lambda kwargs: [chunk("cached")])
+        self.agent.async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+        async def ask():
+            self.memories[0].reset()
+            return await self.agent.process_request("hi", self.memories[0], on_token=lambda text: None)
+
+        self.assertEqual(asyncio.run(ask()), "cached")
+        self.assertEqual(asyncio.run(ask()), "cached")
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+@unittest.skipUnless(daemon_supported(), "Unix sockets not available")
+class TestDaemon(unittest.TestCase):
+    """Test the project daemon and its client"""
+
+    def setUp(self):
+        """Run a daemon with a scripted model in a background thread"""
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+        self.daemon = MalazDaemon(self.project_path)
+
+        async def close():
+            pass
+
+        self.daemon.agent.async_client = SimpleNamespace(
+            chat=SimpleNamespace(completions=FakeAsyncCompletions(
+                lambda kwargs: [chunk("echo: "), chunk(kwargs["messages"][-1]["content"])]
+            )),
+            close=close
+        )
+        self.thread = threading.Thread(target=asyncio.run, args=(self.daemon.serve(),))
+        self.thread.start()
+        self.client = DaemonClient(self.project_path)
+        deadline = time.time() + 10
+        while self.client.ping() is None and time.time() < deadline:
+            time.sleep(0.05)
+
+    def tearDown(self):
+        self.client.shutdown()
+        self.thread.join(timeout=10)
+        for memory in self.daemon.sessions.values():
+            memory.reset()
+        shutil.rmtree(self.project_path)
+
+    def test_ping(self):
+        """Test that the daemon reports its configuration"""
+        status = self.client.ping()
+        self.assertEqual(status["pid"], os.getpid())
+        self.assertEqual(status["fingerprint"], self.daemon.fingerprint)
+
+    def test_streamed_request(self):
+        """Test that tokens and the final response reach the client"""
+        tokens = []
+        response = self.client.request("hello daemon", session="daemon-test", on_token=tokens.append)
+        self.assertEqual(response, "echo: hello daemon")
+        self.assertEqual("".join(tokens), response)
+        self.assertEqual(len(self.daemon.sessions["daemon-test"].history), 1)
+
+    def test_shutdown_removes_socket(self):
+        """Test that a stopped daemon cleans up its socket"""
+        self.assertTrue(self.client.shutdown())
+        self.thread.join(timeout=10)
+        self.assertFalse(os.path.exists(self.client.socket_path))
+        self.assertIsNone(self.client.ping())
+
+
+@unittest.skipUnless(daemon_supported(), "Unix sockets not available")
+class TestDaemonEnvFile(unittest.TestCase):
+    """Test that settings from .env do not make every call restart the daemon"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, '.env'), 'w') as f:
+            f.write("MALAZ_DOTENV_TEST=from-dotenv\n")
+        self.cwd = os.getcwd()
+        os.chdir(self.project_path)
+        self.client = DaemonClient(self.project_path)
+
+    def tearDown(self):
+        self.client.shutdown()
+        self.client._wait_for(lambda: not os.path.exists(self.client.socket_path), timeout=10)
+        os.chdir(self.cwd)
+        os.environ.pop("MALAZ_DOTENV_TEST", None)
+        shutil.rmtree(self.project_path, ignore_errors=True)
+
+    def test_calls_reuse_daemon(self):
+        # Start from a process that has not read this project's .env yet
+        with mock.patch.object(core.env, '_loaded', False):
+            self.assertTrue(self.client.ensure_running())
+            first = self.client.ping()
+            self.assertTrue(self.client.ensure_running())
+            second = self.client.ping()
+        self.assertEqual(os.environ.get("MALAZ_DOTENV_TEST"), "from-dotenv")
+        self.assertEqual(first["pid"], second["pid"])
+
+
+if __name__ == '__main__':
+    unittest.main()
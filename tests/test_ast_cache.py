@@ -0,0 +1,63 @@
+"""
+Tests for the shared AST cache
+"""
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ast_cache import ASTCache, get_ast_cache
+
+
+SOURCE = "import os\nfrom a import b, c\n\nclass A:\n    def method(self):\n        pass\n\ndef f():\n    pass\n"
+
+
+class TestASTCache(unittest.TestCase):
+    """Test parse reuse, eviction and persisted summaries"""
+
+    def test_parse_reuses_tree(self):
+        """Test that identical content is parsed only once"""
+        cache = ASTCache()
+        tree = cache.parse(SOURCE)
+        self.assertIs(cache.parse(SOURCE), tree)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used tree is evicted"""
+        cache = ASTCache(max_entries=2)
+        first = cache.parse("a = 1")
+        cache.parse("b = 2")
+        cache.parse("a = 1")
+        cache.parse("c = 3")
+        self.assertIs(cache.parse("a = 1"), first)
+        self.assertEqual(len(cache.trees), 2)
+        self.assertEqual(cache.misses, 3)
+
+    def test_summary_persisted(self):
+        """Test that a fresh cache loads summaries from disk without parsing"""
+        cache_dir = tempfile.mkdtemp()
+        try:
+            summary = ASTCache().summarize(SOURCE, cache_dir)
+            self.assertEqual(summary, {
+                "imports": ["import os", "from a import b, c"],
+                "classes": ["A"],
+                "functions": ["f", "method"]
+            })
+
+            fresh = ASTCache()
+            self.assertEqual(fresh.summarize(SOURCE, cache_dir), summary)
+            self.assertEqual(fresh.misses, 0)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_shared_instance(self):
+        """Test that analyzers share one cache"""
+        self.assertIs(get_ast_cache(), get_ast_cache())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,8 @@ Basic tests for Malaz AI Coding Agent
 import unittest
 import os
 import sys
+import shutil
+import tempfile
 
 # Add parent directory to path to import modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -18,6 +20,11 @@ class TestBasicFunctionality(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures"""
         self.test_project_path = os.path.dirname(__file__)
+        # Session memory is persisted under the project; keep it out of the repo
+        self.memory_project_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.memory_project_path)
         
     def test_tool_manager_initialization(self):
         """Test that ToolManager can be initialized"""
@@ -43,12 +50,12 @@ class TestBasicFunctionality(unittest.TestCase):
     
     def test_session_memory_initialization(self):
         """Test that SessionMemory can be initialized"""
-        memory = SessionMemory()
+        memory = SessionMemory(project_path=self.memory_project_path)
         self.assertIsNotNone(memory)
         
     def test_session_memory_add_interaction(self):
         """Test adding interactions to session memory"""
-        memory = SessionMemory()
+        memory = SessionMemory(project_path=self.memory_project_path)
         
         # Test adding interaction
         memory.add_interaction("test input", "test response")
@@ -59,7 +66,7 @@ class TestBasicFunctionality(unittest.TestCase):
         
     def test_session_memory_reset(self):
         """Test resetting session memory"""
-        memory = SessionMemory()
+        memory = SessionMemory(project_path=self.memory_project_path)
         
         # Add some interactions
         memory.add_interaction("test1", "response1")
@@ -0,0 +1,124 @@
+"""
+Tests for the fake OpenAI server and the offline agent benchmark
+"""
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "dummy-key-for-testing")
+
+import openai
+from benchmarks.fake_openai import FakeOpenAIServer, scripted
+from benchmarks.agent_bench import run_benchmark, PHASES
+from benchmarks.synthetic_repo import generate_repo, MANIFEST_FILE
+from benchmarks.repo_bench import bench_size, compare
+from core.agent import CodingAgent
+from core.memory import SessionMemory
+
+
+class TestFakeOpenAIServer(unittest.TestCase):
+    """Test the agent end to end against the fake server"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+        script = scripted([
+            [("search_code", {"pattern": "def main"}), ("analyze_code", {"file_path": "app.py"})],
+            "main returns hello."
+        ])
+        self.server = FakeOpenAIServer(script).start()
+        self.agent = CodingAgent(self.project_path)
+        self.agent.openai_client = openai.OpenAI(api_key="test", base_url=self.server.base_url, max_retries=0)
+        self.memory = SessionMemory(project_path=self.project_path)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.project_path)
+
+    def test_streamed_tool_round(self):
+        """Test that streamed tool calls run and their results reach the model"""
+        tokens = []
+        response = self.agent.process_request("what does main do?", self.memory, on_token=tokens.append)
+        self.assertEqual(response, "main returns hello.")
+        self.assertEqual("".join(tokens), "main returns hello.")
+
+        first, second = self.server.requests
+        self.assertTrue(first['stream'])
+        self.assertEqual(first['tool_calls'], ["search_code", "analyze_code"])
+        tool_messages = [m for m in second['messages'] if m['role'] == 'tool']
+        self.assertEqual(tool_messages[0]['content'], "app.py:1: def main():")
+        self.assertEqual(self.agent.usage.requests, 2)
+
+    def test_non_streamed_request_and_cached_prefix(self):
+        """Test non-streamed replies and the simulated prompt cache"""
+        self.agent.process_request("what does main do?", self.memory)
+        self.assertFalse(self.server.requests[0]['stream'])
+        # The second round repeats the whole first prompt
+        self.assertGreater(self.server.requests[1]['usage']['prompt_tokens_details']['cached_tokens'], 0)
+        self.assertGreater(self.agent.usage.cached_tokens, 0)
+
+
+class TestAgentBenchmark(unittest.TestCase):
+    """Test that the benchmark runs offline and reports every phase"""
+
+    def test_run_benchmark(self):
+        results = run_benchmark(["explore"], iterations=1, modes=("stream",), latency=0.01)
+        phases = results["explore"]["stream"]
+        self.assertEqual(set(phases), set(PHASES))
+        self.assertGreaterEqual(phases["model"]["median"], 20)
+        self.assertGreaterEqual(phases["wall"]["median"], phases["model"]["median"])
+
+
+class TestRepoBenchmark(unittest.TestCase):
+    """Test the synthetic repositories and the scaling benchmark"""
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_generate_repo_is_deterministic(self):
+        first = generate_repo(os.path.join(self.workdir, "a"), 300)
+        second = generate_repo(os.path.join(self.workdir, "b"), 300)
+        self.assertEqual(first, second)
+        files = sum(len(names) for _, _, names in os.walk(os.path.join(self.workdir, "a")))
+        # Every generated file plus the manifest
+        self.assertEqual(files, 301)
+        self.assertIn(".py", first['languages'])
+        self.assertTrue(os.path.exists(os.path.join(self.workdir, "a", MANIFEST_FILE)))
+
+    def test_refuses_to_replace_other_directories(self):
+        path = os.path.join(self.workdir, "project")
+        os.makedirs(path)
+        with open(os.path.join(path, "keep.txt"), 'w') as f:
+            f.write("mine")
+        with self.assertRaises(FileExistsError):
+            generate_repo(path, 100)
+
+    def test_bench_size_and_compare(self):
+        operations = ["load_project_structure", "format_context", "modify_file"]
+        result = bench_size(200, self.workdir, operations, repeat=1, memory=True)
+        self.assertEqual(set(result['operations']), set(operations))
+        for timings in result['operations'].values():
+            self.assertGreater(timings['cold_s'], 0)
+            self.assertIn('peak_kb', timings)
+
+        report = {'sizes': {'200': result}}
+        slower = {'sizes': {'200': {'operations': {
+            name: {key: value / 2 for key, value in timings.items()}
+            for name, timings in result['operations'].items()
+        }}}}
+        lines, regressions = compare(report, slower, threshold=1.5)
+        self.assertEqual(len(lines), len(regressions))
+        self.assertEqual(len(lines), 3 * len(operations))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Tests for the BM25 index"""
+
+import unittest
+import os
+import sys
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utils.bm25 import BM25Index, tokenize
+
+
+class TestBM25(unittest.TestCase):
+    """Test tokenization and ranking"""
+
+    def test_tokenize_splits_identifiers(self):
+        """Test that identifiers match as a whole and by their parts"""
+        terms = tokenize("Where is load_project_structure used by CodeReviewer?")
+        for term in ("load_project_structure", "load", "project", "structure", "codereviewer", "code", "reviewer", "used"):
+            self.assertIn(term, terms)
+        self.assertNotIn("is", terms)
+
+    def test_ranking(self):
+        """Test that the most specific match ranks first"""
+        index = BM25Index()
+        index.add(1, "the database connection pool settings")
+        index.add(2, "rename the button label")
+        index.add(3, "connection retries for the http client")
+        hits = index.search("database connection", k=2)
+        self.assertEqual([doc_id for doc_id, _ in hits], [1, 3])
+        self.assertEqual(index.search("nothing matches this"), [])
+        self.assertEqual([d for d, _ in index.search("connection", exclude={1})], [3])
+
+    def test_update_and_remove(self):
+        """Test that re-adding and removing documents keep postings exact"""
+        index = BM25Index()
+        index.add("a", "alpha beta")
+        index.add("a", "gamma")
+        index.add("b", "beta")
+        self.assertEqual(index.search("alpha"), [])
+        index.remove("b")
+        self.assertEqual(index.search("beta"), [])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.total_length, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for the apply_changeset tool
+"""
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "dummy-key-for-testing")
+
+from core.tool_manager import ToolManager
+from utils import changeset
+
+
+class TestApplyChangeset(unittest.TestCase):
+    """Test that a changeset applies completely or not at all"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        self.files = {
+            'app.py': "from config import load\n\ndef main():\n    return load()\n",
+            'config.py': "def load():\n    return {}\n",
+            'legacy.py': "OLD = True\n",
+        }
+        for name, content in self.files.items():
+            self.write(name, content)
+        self.tool_manager = ToolManager(self.project_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def write(self, name, content):
+        with open(os.path.join(self.project_path, name), 'w') as f:
+            f.write(content)
+
+    def read(self, name):
+        with open(os.path.join(self.project_path, name)) as f:
+            return f.read()
+
+    def listing(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.project_path)
+            for root, _, names in os.walk(self.project_path)
+            for name in names
+            if '.malaz' not in root
+        )
+
+    def rename_changeset(self, **overrides):
+        arguments = {
+            "creates": [{"file_path": "settings/loader.py", "content": "def load_settings():\n    return {}\n"}],
+            "modifications": [
+                {"file_path": "app.py", "patches": [
+                    {"search": "from config import load", "replace": "from settings.loader import load_settings"},
+                    {"old_line": "    return load()", "new_line": "    return load_settings()"},
+                ]},
+            ],
+            "deletions": ["config.py"],
+        }
+        arguments.update(overrides)
+        return arguments
+
+    def assert_unchanged(self):
+        self.assertEqual(self.listing(), sorted(self.files))
+        for name, content in self.files.items():
+            self.assertEqual(self.read(name), content)
+
+    def test_applies_every_change(self):
+        self.tool_manager.search_code("load")
+        result = self.tool_manager.execute_tool("apply_changeset", self.rename_changeset())
+        self.assertEqual(result, "Changeset applied: 1 created, 1 modified, 1 deleted")
+        self.assertEqual(self.listing(), ['app.py', 'legacy.py', os.path.join('settings', 'loader.py')])
+        self.assertEqual(self.read('app.py'), "from settings.loader import load_settings\n\ndef main():\n    return load_settings()\n")
+        self.assertNotIn("config.py", self.tool_manager.search_code("def load"))
+        self.assertIn("loader.py", self.tool_manager.search_code("def load_settings"))
+
+    def test_failed_patch_changes_nothing(self):
+        arguments = self.rename_changeset(modifications=[
+            {"file_path": "app.py", "patches": [{"search": "from config import load", "replace": "import settings"}]},
+            {"file_path": "legacy.py", "patches": [{"old_line": "NEW = True", "new_line": "NEW = False"}]},
+        ])
+        result = self.tool_manager.execute_tool("apply_changeset", arguments)
+        self.assertEqual(result, "Error: Changeset not applied, no files changed\n- legacy.py: patch 1: no match for 'NEW = True'")
+        self.assert_unchanged()
+        self.assertFalse(os.path.exists(os.path.join(self.project_path, 'settings')))
+
+    def test_paths_are_validated_first(self):
+        arguments = self.rename_changeset(deletions=["config.py", "../outside.py"])
+        result = self.tool_manager.execute_tool("apply_changeset", arguments)
+        self.assertTrue(result.startswith("Security Error"))
+        self.assert_unchanged()
+
+    def test_rejects_missing_and_duplicate_files(self):
+        arguments = self.rename_changeset(deletions=["config.py", "config.py", "gone.py"])
+        result = self.tool_manager.execute_tool("apply_changeset", arguments)
+        self.assertIn("- config.py: listed more than once", result)
+        self.assertIn("- gone.py: file not found", result)
+        self.assert_unchanged()
+
+    def test_rolls_back_when_commit_fails(self):
+        real_replace = os.replace
+        calls = []
+
+        def failing_replace(source, target):
+            calls.append(target)
+            if len(calls) == 3:
+                raise OSError("disk full")
+            return real_replace(source, target)
+
+        with mock.patch.object(changeset.os, 'replace', side_effect=failing_replace):
+            result = self.tool_manager.execute_tool("apply_changeset", self.rename_changeset())
+        self.assertEqual(result, "Error: Changeset rolled back, no files changed - disk full")
+        self.assert_unchanged()
+
+    def test_empty_changeset(self):
+        self.assertEqual(self.tool_manager.apply_changeset(), "Error: Empty changeset")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,354 @@
+"""
+Tests for the persistent project indexes
+"""
+import unittest
+import os
+import sys
+import shutil
+import pickle
+import tempfile
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_utils import load_project_structure, scan_project
+from utils.project_index import ProjectIndex
+from utils.trigram_index import TrigramIndex, regex_to_query, ignores_case, MATCH_ALL
+from utils.xref_index import XRefIndex
+from utils.code_index import CodeIndex, python_chunks
+from core.tool_manager import ToolManager
+
+
+def write_file(root, rel_path, content):
+    full_path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return full_path
+
+
+UNPICKLED = []
+
+
+class Payload:
+    """Records being unpickled, standing in for a crafted cache file"""
+
+    def __reduce__(self):
+        return (UNPICKLED.append, ("unpickled",))
+
+
+def plant_pickle(path):
+    with open(path, 'wb') as f:
+        pickle.dump({'version': 1, 'payload': Payload()}, f)
+
+
+class TestProjectIndex(unittest.TestCase):
+    """Test the incremental project index"""
+
+    def setUp(self):
+        """Create a small throwaway project"""
+        self.project_path = tempfile.mkdtemp()
+        write_file(self.project_path, 'app.py', "class App:\n    pass\n")
+        write_file(self.project_path, 'pkg/util.py', "def helper():\n    return 1\n")
+        write_file(self.project_path, 'README.md', "# Demo\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_structure_matches_uncached_scan(self):
+        """Test that the cached structure matches a full scan"""
+        cached = load_project_structure(self.project_path)
+        uncached = load_project_structure(self.project_path, use_cache=False)
+
+        self.assertEqual(
+            sorted(f['path'] for f in cached['files']),
+            sorted(f['path'] for f in uncached['files'])
+        )
+        self.assertEqual(cached['directories'], ['pkg'])
+
+    def test_refresh_only_reports_changes(self):
+        """Test that a second refresh re-scans only modified files"""
+        ProjectIndex(self.project_path).refresh()
+
+        full_path = write_file(self.project_path, 'pkg/util.py', "def other():\n    return 2\n")
+        os.utime(full_path, ns=(1, 1))
+        write_file(self.project_path, 'new.py', "x = 1\n")
+        os.remove(os.path.join(self.project_path, 'README.md'))
+
+        changes = ProjectIndex(self.project_path).refresh()
+        self.assertEqual(changes['added'], ['new.py'])
+        self.assertEqual(changes['changed'], [os.path.join('pkg', 'util.py')])
+        self.assertEqual(changes['deleted'], ['README.md'])
+
+        structure = ProjectIndex(self.project_path).load_structure()
+        summaries = {f['path']: f.get('summary') for f in structure['files']}
+        self.assertEqual(summaries[os.path.join('pkg', 'util.py')], "Function: other")
+
+    def test_touched_files_are_saved(self):
+        """Test that a touched but unchanged file is not re-hashed on every refresh"""
+        ProjectIndex(self.project_path, use_hash=True).refresh()
+        os.utime(os.path.join(self.project_path, 'app.py'), ns=(1, 1))
+
+        index = ProjectIndex(self.project_path, use_hash=True)
+        self.assertFalse(any(index.refresh().values()))
+
+        index = ProjectIndex(self.project_path, use_hash=True)
+        index._hash_file = None  # fails if called
+        self.assertFalse(any(index.refresh().values()))
+
+
+class TestTrigramIndex(unittest.TestCase):
+    """Test the trigram search index"""
+
+    def setUp(self):
+        """Create a small throwaway project"""
+        self.project_path = tempfile.mkdtemp()
+        write_file(self.project_path, 'a.py', "def parse_config():\n    pass\n")
+        write_file(self.project_path, 'b.py', "def render_template():\n    pass\n")
+        write_file(self.project_path, 'c.js', "function parseArgs() {}\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_regex_to_query(self):
+        """Test literal extraction from regexes"""
+        self.assertEqual(regex_to_query(r"\w+"), MATCH_ALL)
+        self.assertEqual(regex_to_query("ab.c"), MATCH_ALL)
+        self.assertEqual(regex_to_query("abcd")[0], 'and')
+        self.assertEqual(regex_to_query("abc|xyz")[0], 'or')
+        self.assertEqual(regex_to_query("abc|x"), MATCH_ALL)
+        self.assertEqual(regex_to_query("(?:abc)?def"), ('tri', 'def'))
+
+    def test_candidates_narrow_files(self):
+        """Test that candidates contain exactly the files with the literals"""
+        index = TrigramIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        index.refresh()
+
+        self.assertEqual(index.candidates(r"def parse_\w+"), ['a.py'])
+        self.assertEqual(index.candidates(r"(?i)PARSE"), ['a.py', 'c.js'])
+        self.assertEqual(index.candidates(r"render|parseArgs"), ['b.py', 'c.js'])
+        self.assertEqual(len(index.candidates(r"\(\)")), 3)
+
+    def test_case_insensitive_non_ascii(self):
+        """Test that (?i) candidates agree with re for letters casefold maps differently"""
+        write_file(self.project_path, 'cities.py', 'CITY = "İstanbul"\n')
+        index = TrigramIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        index.refresh()
+
+        for pattern in [r"(?i)istanbul", r"city = (?i:\"istanbul)"]:
+            self.assertTrue(ignores_case(pattern))
+            self.assertIn('cities.py', index.candidates(pattern))
+        self.assertNotIn('a.py', index.candidates(r"(?i)istanbul"))
+        self.assertFalse(ignores_case(r"istanbul|(?:x)"))
+        self.assertEqual(index.candidates(r"istanbul"), [])
+        self.assertIn("cities.py:1:", ToolManager(self.project_path).search_code(r"(?i)istanbul"))
+
+    def test_persisted_as_plain_data(self):
+        """Test that the index reloads from disk and never unpickles"""
+        index = TrigramIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        index.refresh()
+        index.save()
+        reloaded = TrigramIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        self.assertEqual(reloaded.candidates(r"def parse_\w+"), ['a.py'])
+        self.assertEqual(reloaded.files, index.files)
+
+        plant_pickle(index.index_file)
+        self.assertEqual(TrigramIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS).files, {})
+        self.assertEqual(UNPICKLED, [])
+
+    def test_search_code_sees_tool_edits(self):
+        """Test that create_file and modify_file update the index"""
+        tool_manager = ToolManager(self.project_path)
+        self.assertEqual(tool_manager.search_code("load_plugins"), "No matches found")
+
+        tool_manager.create_file("d.py", "def load_plugins():\n    pass\n")
+        self.assertEqual(tool_manager.search_code("load_plugins"), "d.py:1: def load_plugins():")
+
+        tool_manager.modify_file("a.py", [{"old_line": "def parse_config():", "new_line": "def load_plugins_config():"}])
+        result = tool_manager.search_code("load_plugins")
+        self.assertIn("a.py:1: def load_plugins_config():", result)
+
+        # A fresh manager reuses the index persisted on disk
+        self.assertEqual(ToolManager(self.project_path).search_code("load_plugins"), result)
+
+
+class TestXRefIndex(unittest.TestCase):
+    """Test the cross-reference index and navigation tools"""
+
+    def setUp(self):
+        """Create a small throwaway project"""
+        self.project_path = tempfile.mkdtemp()
+        write_file(self.project_path, 'models.py', (
+            "class User:\n"
+            "    def save(self):\n"
+            "        return validate(self)\n"
+            "\n"
+            "def validate(obj):\n"
+            "    return obj\n"
+        ))
+        write_file(self.project_path, 'views.py', (
+            "from models import User, validate\n"
+            "\n"
+            "def create():\n"
+            "    user = User()\n"
+            "    user.save()\n"
+            "    return validate(user)\n"
+        ))
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_lookups(self):
+        """Test definitions, references, callers and importers"""
+        index = XRefIndex(self.project_path)
+        index.refresh()
+
+        self.assertEqual(index.find_definitions('User.save'), [('models.py', 2, 'method', 'User.save')])
+        self.assertEqual(index.find_definitions('models.validate'), [('models.py', 5, 'function', 'validate')])
+        self.assertEqual(index.find_definitions('ser.save'), [])
+        self.assertEqual(index.find_definitions('odels.validate'), [])
+        self.assertEqual(index.find_references('User'), [('views.py', 1), ('views.py', 4)])
+        self.assertEqual(index.find_callers('validate'), [
+            ('models.py', 3, 'User.save'),
+            ('views.py', 6, 'create')
+        ])
+        self.assertEqual(index.find_importers('models'), ['views.py'])
+
+    def test_persisted_as_plain_data(self):
+        """Test that the index reloads from disk and never unpickles"""
+        index = XRefIndex(self.project_path)
+        index.refresh()
+        index.save()
+        reloaded = XRefIndex(self.project_path)
+        self.assertEqual(reloaded.find_callers('validate'), index.find_callers('validate'))
+        self.assertEqual(reloaded.find_importers('models'), ['views.py'])
+
+        plant_pickle(index.index_file)
+        self.assertEqual(XRefIndex(self.project_path).files, {})
+        self.assertEqual(UNPICKLED, [])
+
+    def test_tools_update_incrementally(self):
+        """Test that file edits through ToolManager update the index"""
+        tool_manager = ToolManager(self.project_path)
+        self.assertEqual(tool_manager.find_callers('create'), "No callers found for create")
+
+        tool_manager.create_file('main.py', "from views import create\n\ncreate()\n")
+        self.assertEqual(tool_manager.find_callers('create'), "main.py:3: in <module>")
+        self.assertEqual(tool_manager.find_definition('create'), "views.py:3: function create")
+
+        os.remove(os.path.join(self.project_path, 'views.py'))
+        tool_manager._notify_file_changed(os.path.join(self.project_path, 'views.py'))
+        self.assertEqual(tool_manager.find_definition('create'), "No definitions found for create")
+        self.assertEqual(tool_manager.execute_tool('find_references', {'symbol': 'save'}), "No references found for save")
+
+    def test_dotted_lookups_match_by_name(self):
+        """Test that references and callers say when a qualifier is ignored"""
+        tool_manager = ToolManager(self.project_path)
+        self.assertEqual(tool_manager.find_callers('validate'), "models.py:3: in User.save\nviews.py:6: in create")
+        self.assertEqual(
+            tool_manager.find_callers('other.validate'),
+            "Matched by name 'validate'; the qualifier 'other' is not checked\n"
+            "models.py:3: in User.save\nviews.py:6: in create"
+        )
+        self.assertEqual(tool_manager.find_references('other.missing'), "No references found for other.missing")
+
+    def test_indexes_share_one_walk(self):
+        """Test that index lookups walk the tree once and save only changes"""
+        tool_manager = ToolManager(self.project_path)
+        with mock.patch('core.tool_manager.scan_project', wraps=scan_project) as scan:
+            with tool_manager._index_lock:
+                tool_manager._get_search_index()
+                tool_manager._get_xref_index()
+                tool_manager._get_code_index()
+            self.assertEqual(scan.call_count, 1)
+
+            with mock.patch.object(XRefIndex, 'save') as save:
+                self.assertEqual(tool_manager.find_definition('create'), "views.py:3: function create")
+                save.assert_not_called()
+                tool_manager.create_file('main.py', "def create():\n    pass\n")
+                tool_manager.find_definition('create')
+                save.assert_called_once()
+            self.assertEqual(scan.call_count, 1)
+
+
+class TestCodeIndex(unittest.TestCase):
+    """Test the chunk-level code retrieval index"""
+
+    def setUp(self):
+        """Create a small throwaway project"""
+        self.project_path = tempfile.mkdtemp()
+        write_file(self.project_path, 'billing/invoice.py', (
+            '"""Invoice generation"""\n'
+            'import decimal\n'
+            '\n'
+            'class InvoiceBuilder:\n'
+            '    """Build invoices for customers"""\n'
+            '\n'
+            '    def add_line_item(self, amount):\n'
+            '        self.items.append(amount)\n'
+            '\n'
+            '    def total_with_tax(self, rate):\n'
+            '        """Sum the items and apply the VAT rate"""\n'
+            '        return sum(self.items) * (1 + rate)\n'
+        ))
+        write_file(self.project_path, 'auth.py', "def login(user, password):\n    return check_password(user, password)\n")
+        write_file(self.project_path, 'web/app.js', "function renderDashboard(widgets) {\n  return widgets.map(draw);\n}\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_python_chunks(self):
+        """Test that modules split into module, class header and methods"""
+        with open(os.path.join(self.project_path, 'billing/invoice.py')) as f:
+            chunks = python_chunks(f.read())
+        self.assertEqual(
+            [(start, end, name) for start, end, name, _ in chunks],
+            [(4, 6, 'InvoiceBuilder'), (7, 8, 'InvoiceBuilder.add_line_item'),
+             (10, 12, 'InvoiceBuilder.total_with_tax'), (1, 3, '<module>')]
+        )
+
+    def test_search_ranks_chunks(self):
+        """Test that docstrings, identifiers and paths are searchable"""
+        index = CodeIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        index.refresh()
+        self.assertEqual(index.search("how is VAT applied to the total?")[0][:4],
+                         ('billing/invoice.py', 10, 12, 'InvoiceBuilder.total_with_tax'))
+        self.assertEqual(index.search("check password on login")[0][0], 'auth.py')
+        self.assertEqual(index.search("dashboard widgets")[0][0], os.path.join('web', 'app.js'))
+
+    def test_incremental_update_and_persistence(self):
+        """Test that edits replace a file's chunks and survive reloading"""
+        index = CodeIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        index.refresh()
+        write_file(self.project_path, 'auth.py', "def logout(session):\n    session.clear()\n")
+        index.update_file('auth.py')
+        index.save()
+
+        reloaded = CodeIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS)
+        self.assertEqual(reloaded.search("login password"), [])
+        self.assertEqual(reloaded.search("logout session")[0][:4], ('auth.py', 1, 2, 'logout'))
+        self.assertEqual(reloaded.search("invoice line"), index.search("invoice line"))
+
+        # The reloaded index keeps updating incrementally
+        os.remove(os.path.join(self.project_path, 'auth.py'))
+        reloaded.update_file('auth.py')
+        self.assertEqual(reloaded.search("logout session"), [])
+
+        plant_pickle(index.index_file)
+        self.assertEqual(CodeIndex(self.project_path, ToolManager.SEARCH_EXTENSIONS).files, {})
+        self.assertEqual(UNPICKLED, [])
+
+    def test_agent_fills_code_budget(self):
+        """Test that the prompt gets the best matching snippets within budget"""
+        os.environ.setdefault("OPENAI_API_KEY", "test-key")
+        from core.agent import CodingAgent
+        agent = CodingAgent(self.project_path)
+        context = agent._code_context("apply the VAT rate to the invoice total", 200)
+        self.assertTrue(context.startswith("### billing/invoice.py:10-12 (InvoiceBuilder.total_with_tax)"))
+        self.assertLessEqual(agent.tokenizer.count(context), 200)
+        self.assertEqual(agent._code_context("apply the VAT rate", 0), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
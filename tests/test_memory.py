@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Tests for SessionMemory and token budgeting"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+from unittest import mock
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from core.agent import CodingAgent
+from core.memory import SessionMemory
+from core.memory_store import MemoryStore
+from utils.tokenizer import HeuristicTokenizer, count_message_tokens
+
+
+class CharTokenizer:
+    """One token per character, so budgets are easy to reason about"""
+
+    name = "chars"
+
+    def __init__(self):
+        self.calls = 0
+
+    def count(self, text):
+        self.calls += 1
+        return len(text)
+
+
+class TestTokenBudget(unittest.TestCase):
+    """Test token counting and history budgeting"""
+
+    def setUp(self):
+        self.tokenizer = CharTokenizer()
+        self.project_path = tempfile.mkdtemp()
+        self.memory = SessionMemory(session_id="budget-test", tokenizer=self.tokenizer,
+                                    project_path=self.project_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_heuristic_counts_code_symbols(self):
+        """Test that symbols in code count as tokens, unlike a word split"""
+        tokenizer = HeuristicTokenizer()
+        code = "def f(a, b):\n    return a[b] + {'k': 1}\n"
+        self.assertGreater(tokenizer.count(code), len(code.split()))
+        self.assertEqual(tokenizer.count(""), 0)
+
+    def test_context_keeps_latest_entries_in_order(self):
+        """Test that the newest entries that fit are kept, oldest first"""
+        for i in range(5):
+            self.memory.add_interaction(f"q{i}", f"a{i}")
+        entry_size = len("User: q0\nAgent: a0\n")
+        context = self.memory.get_context(max_tokens=entry_size * 2)
+        self.assertEqual(context, "User: q3\nAgent: a3\nUser: q4\nAgent: a4")
+
+    def test_entry_counts_are_cached(self):
+        """Test that each entry is only tokenized once"""
+        for i in range(5):
+            self.memory.add_interaction(f"q{i}", f"a{i}")
+        self.memory.get_context()
+        calls = self.tokenizer.calls
+        self.memory.get_context()
+        self.assertEqual(self.tokenizer.calls, calls)
+
+    def test_prompt_budget_covers_whole_prompt(self):
+        """Test that history only gets what the rest of the prompt leaves"""
+        project_path = tempfile.mkdtemp()
+        try:
+            agent = CodingAgent(project_path)
+            agent.tokenizer = self.tokenizer
+            for i in range(50):
+                self.memory.add_interaction(f"question {i}", "x" * 100)
+
+            agent.prompt_budget = 10 ** 6
+            messages = agent._prepare_messages("hi", self.memory)
+            self.assertEqual(len(messages), 2 + 2 * len(self.memory.history))
+            self.assertEqual(messages[1], {"role": "user", "content": self.memory.history[0]['user']})
+
+            agent.prompt_budget = count_message_tokens(agent._prepare_messages("hi", self.memory)[:1], self.tokenizer)
+            self.assertEqual(len(agent._prepare_messages("hi", self.memory)), 2)
+
+            fixed = count_message_tokens(agent._prepare_messages("hi", self.memory), self.tokenizer) + agent.tools_tokens()
+            agent.prompt_budget = fixed + 500
+            messages = agent._prepare_messages("hi", self.memory)
+            self.assertGreater(len(messages), 2)
+            self.assertLessEqual(count_message_tokens(messages, self.tokenizer) + agent.tools_tokens(), agent.prompt_budget)
+        finally:
+            shutil.rmtree(project_path)
+
+    def test_prompt_prefix_is_stable(self):
+        """Test that each prompt extends the previous one's prefix"""
+        project_path = tempfile.mkdtemp()
+        try:
+            agent = CodingAgent(project_path)
+            agent.tokenizer = self.tokenizer
+            for i in range(10):
+                self.memory.add_interaction(f"question {i}", "x" * 100)
+            agent.prompt_budget = count_message_tokens(agent._prepare_messages("q", self.memory)[:1], self.tokenizer) + agent.tools_tokens() + 1000
+
+            previous = agent._prepare_messages("q", self.memory)[:-1]
+            shifts = 0
+            for i in range(10, 40):
+                self.memory.add_interaction(f"question {i}", "x" * 100)
+                messages = agent._prepare_messages("q", self.memory)
+                if messages[:len(previous)] != previous:
+                    shifts += 1
+                    # Only the system prompt is guaranteed when the window moves
+                    self.assertEqual(messages[0], previous[0])
+                previous = messages[:-1]
+            # The window restarts with room to grow instead of sliding every turn
+            self.assertLessEqual(shifts, 10)
+        finally:
+            shutil.rmtree(project_path)
+
+
+def append_interactions(project_path, worker, count):
+    memory = SessionMemory(session_id="shared", project_path=project_path)
+    for i in range(count):
+        memory.add_interaction(f"w{worker}-{i}", "ok")
+
+
+class TestMemoryStore(unittest.TestCase):
+    """Test the append-only session store"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def memory(self, session_id="s", **kwargs):
+        return SessionMemory(session_id=session_id, project_path=self.project_path, **kwargs)
+
+    def test_sessions_are_separate(self):
+        """Test that session ids get their own namespace"""
+        self.memory("alice").add_interaction("hi alice", "ok")
+        self.memory("bob").add_interaction("hi bob", "ok")
+        self.assertEqual([e['user'] for e in self.memory("alice").history], ["hi alice"])
+        self.assertEqual([e['user'] for e in self.memory("bob").history], ["hi bob"])
+
+    def test_sees_writes_of_other_instances(self):
+        """Test that a session picks up interactions added elsewhere"""
+        first, second = self.memory(), self.memory()
+        first.add_interaction("one", "1")
+        self.assertIn("one", second.get_context())
+        second.add_interaction("two", "2")
+        first.add_interaction("three", "3")
+        self.assertEqual([e['user'] for e in first.history], ["one", "two", "three"])
+        first.reset()
+        self.assertEqual(second.get_context(), "")
+
+    def test_lazy_tail_load(self):
+        """Test that loading only keeps the latest entries after a reset"""
+        memory = self.memory(max_history=3)
+        memory.add_interaction("before reset", "x")
+        memory.reset()
+        for i in range(15):
+            memory.add_interaction(f"q{i}", "a")
+        with open(memory.store.path, 'a') as f:
+            f.write('{"op": "add", "entr')  # torn write
+        # Without summaries the window is capped at HISTORY_LIMIT_FACTOR * max_history
+        history = self.memory(max_history=3).history
+        self.assertEqual([e['user'] for e in history], [f"q{i}" for i in range(3, 15)])
+
+    def test_summary_folds_old_turns(self):
+        """Test that old turns are folded into a persisted running summary"""
+        calls = []
+
+        def summarizer(previous, entries):
+            calls.append([e['user'] for e in entries])
+            return (previous + " " if previous else "") + ",".join(e['user'] for e in entries)
+
+        memory = self.memory(max_history=4)
+        for i in range(5):
+            memory.add_interaction(f"q{i}", "a")
+        memory.compact_in_background(summarizer)
+        memory.wait_for_compaction()
+
+        self.assertEqual(calls, [["q0", "q1", "q2"]])
+        self.assertEqual([e['user'] for e in memory.history], ["q3", "q4"])
+        context = memory.get_context()
+        self.assertTrue(context.startswith("Summary of earlier conversation:\nq0,q1,q2"))
+        self.assertNotIn("User: q0", context)
+
+        # Another instance loads the summary and only the unfolded turns
+        reloaded = self.memory(max_history=4)
+        self.assertEqual(reloaded.summary, "q0,q1,q2")
+        self.assertEqual([e['user'] for e in reloaded.history], ["q3", "q4"])
+
+        for i in range(5, 8):
+            memory.add_interaction(f"q{i}", "a")
+        self.assertTrue(memory.compact(summarizer))
+        self.assertEqual(memory.summary, "q0,q1,q2 q3,q4,q5")
+        reloaded.sync()
+        self.assertEqual(reloaded.summary, memory.summary)
+        self.assertEqual([e['user'] for e in reloaded.history], ["q6", "q7"])
+
+
+    def test_summary_is_kept_at_exit(self):
+        """Test that the CLI lets a background summary finish before exiting"""
+        import time
+        import malaz_cli
+
+        def slow_summarizer(previous, entries):
+            time.sleep(0.3)
+            return "slow summary"
+
+        memory = self.memory(max_history=2)
+        for i in range(3):
+            memory.add_interaction(f"q{i}", "a")
+        memory.compact_in_background(slow_summarizer)
+        self.assertFalse(memory.wait_for_compaction(0))
+        malaz_cli.end_session(mock.Mock(tracer=mock.Mock(spans=[])), memory)
+        self.assertEqual(self.memory(max_history=2).summary, "slow summary")
+
+    def test_retrieves_relevant_older_turns(self):
+        """Test that a turn outside the recent window is found by relevance"""
+        memory = self.memory(max_history=2)
+        memory.add_interaction("how do we configure the redis cache timeout?", "set REDIS_TIMEOUT in settings.py")
+        for i in range(12):
+            memory.add_interaction(f"small talk {i}", "ok")
+        self.assertNotIn("redis", "".join(e['user'] for e in memory.history))
+
+        context = memory.get_context(query="what was the redis timeout setting?")
+        self.assertIn("Relevant earlier turns:\nUser: how do we configure the redis cache timeout?", context)
+        self.assertTrue(context.endswith("User: small talk 11\nAgent: ok"))
+        self.assertNotIn("redis", memory.get_context())
+
+        # New turns are indexed as they are added
+        memory.add_interaction("switch logging to json format", "done")
+        for i in range(12):
+            memory.add_interaction(f"more talk {i}", "ok")
+        self.assertEqual(memory.retrieve("json logging")[0]['user'], "switch logging to json format")
+
+    def test_retrieves_turns_pushed_out_of_the_window(self):
+        """Test that a loaded turn that doesn't fit the budget can still be retrieved"""
+        memory = self.memory()
+        memory.add_interaction("where is the zanzibar deployment config?", "in deploy/zanzibar.yml")
+        for i in range(15):
+            memory.add_interaction(f"filler question {i} " + "words " * 20, "ok " * 20)
+        self.assertIn("zanzibar", memory.history[0]['user'])
+
+        parts = memory.get_prompt_parts(max_tokens=800, query="zanzibar config")
+        self.assertNotIn("zanzibar", "".join(e['user'] for e in parts['turns']))
+        self.assertEqual([e['user'] for e in parts['relevant']], ["where is the zanzibar deployment config?"])
+
+    def test_compaction(self):
+        """Test that compaction drops reset history and old entries"""
+        store = MemoryStore(os.path.join(self.project_path, "memory"), "c", max_entries=5)
+        store.append({'user': 'gone'})
+        store.reset()
+        for i in range(8):
+            store.append({'user': f"q{i}"})
+        store.compact()
+        self.assertEqual([e['user'] for e in store.iter_entries()], [f"q{i}" for i in range(3, 8)])
+        with open(store.path) as f:
+            self.assertEqual(len(f.readlines()), 5)
+
+    def test_tail_finds_summary_behind_many_turns(self):
+        """Test that a summary older than the loaded turns is still found"""
+        store = self.memory(max_history=2).store
+        store.append({'id': 'old', 'user': 'folded'})
+        store.summarize("earlier talk", 'old')
+        for i in range(30):
+            store.append({'id': str(i), 'user': f"q{i}"})
+
+        entries, summary = MemoryStore(os.path.dirname(store.path), "s").tail(5)
+        self.assertEqual(summary, "earlier talk")
+        self.assertEqual([e['user'] for e in entries], [f"q{i}" for i in range(25, 30)])
+
+        # The same after compaction moved the summary next to what it covers
+        store.compact()
+        memory = self.memory(max_history=2)
+        self.assertEqual(memory.summary, "earlier talk")
+        self.assertEqual(len(memory.history), 8)
+
+    def test_concurrent_processes(self):
+        """Test that writers in several processes never lose entries"""
+        workers = [
+            multiprocessing.Process(target=append_interactions, args=(self.project_path, w, 25))
+            for w in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        memory = self.memory("shared", max_history=1000)
+        self.assertEqual(len(memory.history), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+Tests for the modify_file patch engine
+"""
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "dummy-key-for-testing")
+
+from utils.patch_engine import patch_file, parse_unified_diff, PatchError
+from core.tool_manager import ToolManager
+
+SOURCE = """def load(path):
+    with open(path) as f:
+        return f.read()
+
+
+def save(path, data):
+    with open(path, 'w') as f:
+        f.write(data)
+
+
+def main():
+    data = load('in.txt')
+    save('out.txt', data)
+"""
+
+
+class TestPatchEngine(unittest.TestCase):
+    """Test hunks, search/replace blocks and line patches"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'io_utils.py')
+        self.write(SOURCE)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, text, newline=None):
+        with open(self.path, 'w', newline=newline) as f:
+            f.write(text)
+
+    def read(self):
+        with open(self.path, newline='') as f:
+            return f.read()
+
+    def test_unified_diff_with_wrong_line_numbers(self):
+        diff = (
+            "--- a/io_utils.py\n+++ b/io_utils.py\n"
+            "@@ -3,4 +3,4 @@\n"
+            " def save(path, data):\n"
+            "-    with open(path, 'w') as f:\n"
+            "+    with open(path, 'w', encoding='utf-8') as f:\n"
+            "         f.write(data)\n"
+        )
+        self.assertEqual(patch_file(self.path, [{"diff": diff}]), (1, []))
+        self.assertIn("open(path, 'w', encoding='utf-8')", self.read())
+        self.assertEqual(os.listdir(self.directory), ['io_utils.py'])
+
+    def test_fuzzy_context(self):
+        """Test whitespace differences and a stale context line"""
+        diff = (
+            "@@ -11,3 +11,3 @@\n"
+            " def main():\n"
+            "-  data = load('in.txt')\n"
+            "+    data = load('input.txt')\n"
+            "     save('old.txt', data)\n"
+        )
+        self.assertEqual(patch_file(self.path, [{"diff": diff}]), (1, []))
+        self.assertIn("    data = load('input.txt')\n    save('out.txt', data)\n", self.read())
+
+    def test_search_replace(self):
+        patches = [{"search": "def main():\n    data = load('in.txt')", "replace": "def main(path='in.txt'):\n    data = load(path)"}]
+        self.assertEqual(patch_file(self.path, patches), (1, []))
+        self.assertIn("def main(path='in.txt'):\n    data = load(path)\n    save(", self.read())
+
+    def test_ambiguous_search_is_reported(self):
+        self.write("retries = 3\nconnect()\nretries = 3\n")
+        applied, failures = patch_file(self.path, [{"search": "retries = 3", "replace": "retries = 5"}])
+        self.assertEqual(applied, 0)
+        self.assertEqual(failures, ["patch 1: matches 2 places (lines 1, 3); add context or set replace_all"])
+
+        patches = [{"search": "retries = 3", "replace": "retries = 5", "replace_all": True}]
+        self.assertEqual(patch_file(self.path, patches), (1, []))
+        self.assertEqual(self.read(), "retries = 5\nconnect()\nretries = 5\n")
+
+    def test_line_patches_take_successive_occurrences(self):
+        self.write("x = 1\nx = 1\n")
+        patches = [{"old_line": "x = 1", "new_line": "x = 2"}, {"old_line": "x = 1", "new_line": "x = 3"}]
+        self.assertEqual(patch_file(self.path, patches), (2, []))
+        self.assertEqual(self.read(), "x = 2\nx = 3\n")
+
+    def test_failed_patches_are_reported(self):
+        patches = [
+            {"old_line": "def main():", "new_line": "def run():"},
+            {"old_line": "def missing():", "new_line": "def found():"},
+            {"diff": "no hunks here"},
+        ]
+        applied, failures = patch_file(self.path, patches)
+        self.assertEqual(applied, 1)
+        self.assertEqual(failures, ["patch 2: no match for 'def missing():'", "patch 3: no @@ hunks found in diff"])
+        self.assertIn("def run():", self.read())
+
+    def test_strict_writes_nothing_on_failure(self):
+        patches = [{"old_line": "def main():", "new_line": "def run():"}, {"search": "nope", "replace": ""}]
+        self.assertEqual(patch_file(self.path, patches, strict=True)[0], 0)
+        self.assertEqual(self.read(), SOURCE)
+
+    def test_search_without_replace_is_rejected(self):
+        applied, failures = patch_file(self.path, [{"search": "def main():"}])
+        self.assertEqual((applied, failures), (0, ["patch 1: search block has no 'replace'"]))
+        self.assertEqual(self.read(), SOURCE)
+
+    def test_insertion_inside_changed_lines_is_rejected(self):
+        patches = [
+            {"search": "def load(path):\n    with open(path) as f:\n        return f.read()", "replace": "load = open"},
+            {"diff": "@@ -2,0 +3,1 @@\n+    # read it all\n"},
+            {"diff": "@@ -3,0 +4,1 @@\n+\n"},
+        ]
+        applied, failures = patch_file(self.path, patches)
+        self.assertEqual(applied, 2)
+        self.assertEqual(failures, ["patch 2: insertion point is inside lines changed by another patch"])
+        self.assertTrue(self.read().startswith("load = open\n\n\n\ndef save("))
+
+    def test_line_patch_matches_indentation_exactly(self):
+        self.write("def f():\n    x = 1\n    return x\n")
+        applied, failures = patch_file(self.path, [{"old_line": "x = 1", "new_line": "x = 2"}])
+        self.assertEqual((applied, failures), (0, ["patch 1: no match for 'x = 1'"]))
+        self.assertEqual(self.read(), "def f():\n    x = 1\n    return x\n")
+
+        self.assertEqual(patch_file(self.path, [{"old_line": "    x = 1", "new_line": "    x = 2"}]), (1, []))
+        self.assertEqual(self.read(), "def f():\n    x = 2\n    return x\n")
+
+    def test_change_around_earlier_insertion_is_rejected(self):
+        self.write("a\nb\nc\nd\ne\n")
+        patches = [
+            {"diff": "@@ -2,0 +3,1 @@\n+INSERTED\n"},
+            {"search": "b\nc\nd", "replace": "B\nC\nD"},
+        ]
+        applied, failures = patch_file(self.path, patches)
+        self.assertEqual(applied, 1)
+        self.assertEqual(failures, ["patch 2: lines span the insertion point of another patch"])
+        self.assertEqual(self.read(), "a\nb\nINSERTED\nc\nd\ne\n")
+
+    def test_keeps_line_endings(self):
+        self.write("a\r\nb\r\nc", newline='')
+        patches = [{"old_line": "c", "new_line": "c\nd"}, {"old_line": "a", "new_line": "A"}]
+        self.assertEqual(patch_file(self.path, patches), (2, []))
+        self.assertEqual(self.read(), "A\r\nb\r\nc\r\nd")
+
+    def test_parse_insertion_hunk(self):
+        hunks = parse_unified_diff("@@ -2,0 +3,1 @@\n+import os\n")
+        self.assertEqual((hunks[0].hint, hunks[0].old), (2, []))
+        with self.assertRaises(PatchError):
+            parse_unified_diff("@@ -1 +1 @@\n?oops\n")
+
+    def test_large_file(self):
+        lines = [f"value_{i} = {i}\n" for i in range(200000)]
+        self.write("".join(lines))
+        patches = [{"old_line": f"value_{i} = {i}", "new_line": f"value_{i} = -{i}"} for i in range(0, 200000, 20000)]
+        self.assertEqual(patch_file(self.path, patches), (10, []))
+        with open(self.path) as f:
+            result = f.readlines()
+        self.assertEqual(len(result), 200000)
+        self.assertEqual(result[20000], "value_20000 = -20000\n")
+        self.assertEqual(result[20001], lines[20001])
+
+
+class TestModifyFileTool(unittest.TestCase):
+    """Test the modify_file tool result"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write(SOURCE)
+        self.tool_manager = ToolManager(self.project_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def test_reports_failures(self):
+        result = self.tool_manager.modify_file("app.py", [
+            {"old_line": "def main():", "new_line": "def run():"},
+            {"search": "def nothing():", "replace": ""},
+        ])
+        self.assertTrue(result.startswith("File modified: app.py (1/2 changes applied)"))
+        self.assertIn("- patch 2: no match for 'def nothing():'", result)
+
+    def test_no_changes_is_an_error(self):
+        result = self.tool_manager.modify_file("app.py", [{"old_line": "nope", "new_line": "yes"}])
+        self.assertTrue(result.startswith("Error: No changes applied to app.py"))
+
+
+if __name__ == '__main__':
+    unittest.main()
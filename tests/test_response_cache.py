@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Tests for the on-disk LLM response cache"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from core.agent import CodingAgent
+from core.memory import SessionMemory
+from utils.response_cache import ResponseCache
+from tests.test_agent import FakeCompletions, chunk
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test ResponseCache storage, expiry and eviction"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_key_depends_on_request(self):
+        """Test that keys change with any part of the request"""
+        messages = [{"role": "user", "content": "hi"}]
+        key = ResponseCache.make_key("gpt-4o-mini", messages, {"max_tokens": 10})
+        self.assertEqual(key, ResponseCache.make_key("gpt-4o-mini", list(messages), {"max_tokens": 10}))
+        self.assertNotEqual(key, ResponseCache.make_key("gpt-4o", messages, {"max_tokens": 10}))
+        self.assertNotEqual(key, ResponseCache.make_key("gpt-4o-mini", messages, {"max_tokens": 20}))
+
+    def test_round_trip_and_persistence(self):
+        """Test that entries survive reopening the database"""
+        tool_calls = [{"id": "call_1", "type": "function", "function": {"name": "search_code", "arguments": "{}"}}]
+        cache = ResponseCache(self.db_path)
+        cache.put("k", "content", tool_calls)
+        cache.close()
+
+        cache = ResponseCache(self.db_path)
+        self.assertEqual(cache.get("k"), ("content", tool_calls))
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_ttl_expiry(self):
+        """Test that expired entries are misses"""
+        cache = ResponseCache(self.db_path, ttl=0)
+        cache.put("k", "content", [])
+        self.assertIsNone(cache.get("k"))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entries go first"""
+        cache = ResponseCache(self.db_path, max_bytes=200)
+        cache.put("a", "x" * 50, [])
+        cache.put("b", "x" * 50, [])
+        cache.get("a")
+        cache.put("c", "x" * 50, [])
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+
+class TestAgentResponseCache(unittest.TestCase):
+    """Test response caching in CodingAgent"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+        self.agent = CodingAgent(self.project_path)
+        self.agent.response_cache = ResponseCache(os.path.join(self.project_path, "cache.sqlite"))
+        self.memory = SessionMemory(project_path=self.project_path)
+
+    def tearDown(self):
+        self.memory.reset()
+        shutil.rmtree(self.project_path)
+
+    def ask(self, **options):
+        self.memory.reset()
+        tokens = []
+        response = self.agent.process_request("hi", self.memory, on_token=tokens.append, **options)
+        return response, "".join(tokens)
+
+    def test_repeated_request_is_cached(self):
+        """Test that an identical request replays without calling the model"""
+        completions = FakeCompletions([[chunk("Hel"), chunk("lo")]])
+        self.agent.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+        self.assertEqual(self.ask(), ("Hello", "Hello"))
+        self.assertEqual(self.ask(), ("Hello", "Hello"))
+        self.assertEqual(len(completions.calls), 1)
+
+    def test_bypass_and_refresh(self):
+        """Test the per-request bypass and refresh flags"""
+        completions = FakeCompletions([[chunk("one")], [chunk("two")], [chunk("three")]])
+        self.agent.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+        self.assertEqual(self.ask()[0], "one")
+        self.assertEqual(self.ask(use_cache=False)[0], "two")
+        self.assertEqual(self.ask()[0], "one")
+        self.assertEqual(self.ask(refresh_cache=True)[0], "three")
+        self.assertEqual(self.ask()[0], "three")
+
+
+if __name__ == '__main__':
+    unittest.main()
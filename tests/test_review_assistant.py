@@ -0,0 +1,124 @@
+"""
+Tests for the code review rule engine
+"""
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.review_assistant import CodeReviewer, ReviewRule
+import ast
+
+
+CODE = '''"""Module docstring"""
+
+def undocumented():
+    x = 1
+    return x
+
+class Documented:
+    """Class docstring"""
+'''
+
+
+class PrintRule(ReviewRule):
+    """Flag print calls"""
+    node_types = (ast.Call,)
+
+    def check(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == 'print':
+            yield {"line": node.lineno, "message": "Avoid print", "severity": "low"}
+
+
+class FailingRule(ReviewRule):
+    """Raise on functions named explode"""
+    node_types = (ast.FunctionDef,)
+
+    def check(self, node):
+        if node.name == 'explode':
+            raise ValueError("rule bug")
+        return []
+
+
+class TestCodeReviewer(unittest.TestCase):
+    """Test single-pass rules and batch reviews"""
+
+    def test_review_code(self):
+        """Test that the default rules report in line order"""
+        report = CodeReviewer().review_code(CODE, "sample.py")
+        self.assertEqual(report, "Code Review for sample.py:\n\nLine 3 (low): Missing docstring for functiondef")
+
+    def test_register_rule(self):
+        """Test that custom rules join the same pass"""
+        reviewer = CodeReviewer()
+        reviewer.register_rule(PrintRule())
+        report = reviewer.review_code('"""Doc"""\nprint(1)\n')
+        self.assertIn("Line 2 (low): Avoid print", report)
+
+    def test_review_directory_uses_cache(self):
+        """Test batch review and per-file caching by content hash"""
+        project_path = tempfile.mkdtemp()
+        cache_dir = tempfile.mkdtemp()
+        try:
+            for i in range(20):
+                with open(os.path.join(project_path, f"m{i}.py"), 'w') as f:
+                    f.write(CODE)
+            with open(os.path.join(project_path, "broken.py"), 'w') as f:
+                f.write("def broken(:\n")
+
+            reviewer = CodeReviewer()
+            report = reviewer.review_directory(project_path, cache_dir=cache_dir)
+            self.assertTrue(report.startswith(f"Reviewed 21 files in {project_path}: 20 issues found"))
+            self.assertIn("broken.py: Syntax error", report)
+
+            reviewer._run_reviews = lambda pending, workers: self.fail("cache miss")
+            self.assertEqual(reviewer.review_directory(project_path, cache_dir=cache_dir), report)
+        finally:
+            shutil.rmtree(project_path)
+            shutil.rmtree(cache_dir)
+
+    def test_rule_error_only_fails_its_file(self):
+        """Test that an exception in one file is reported and the batch goes on"""
+        project_path = tempfile.mkdtemp()
+        try:
+            for i in range(20):
+                with open(os.path.join(project_path, f"m{i}.py"), 'w') as f:
+                    f.write(CODE)
+            with open(os.path.join(project_path, "bad.py"), 'w') as f:
+                f.write('"""Doc"""\ndef explode():\n    """Doc"""\n')
+
+            # A rule defined in a test module, inside a process pool
+            reviewer = CodeReviewer()
+            reviewer.register_rule(FailingRule())
+            report = reviewer.review_directory(project_path)
+            self.assertTrue(report.startswith(f"Reviewed 21 files in {project_path}: 20 issues found"))
+            self.assertIn("bad.py: Review failed: ValueError: rule bug", report)
+        finally:
+            shutil.rmtree(project_path)
+
+    def test_unpicklable_rule_falls_back_to_serial(self):
+        """Test that a rule the process pool can't pickle still runs"""
+        class LocalRule(PrintRule):
+            pass
+
+        reviewer = CodeReviewer(rules=[LocalRule()])
+        pending = [(f"m{i}.py", '"""Doc"""\nprint(1)\n', None) for i in range(20)]
+        results = reviewer._run_reviews(pending, workers=2)
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results[0][1][0]["message"], "Avoid print")
+
+    def test_cache_depends_on_rule_settings(self):
+        """Test that changing a rule setting invalidates cached results"""
+        reviewer = CodeReviewer()
+        signature = reviewer._rules_signature()
+        self.assertEqual(CodeReviewer()._rules_signature(), signature)
+        reviewer.rules[0].max_statements = 5
+        self.assertNotEqual(reviewer._rules_signature(), signature)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for the scope-aware static analysis
+"""
+import unittest
+import ast
+import os
+import sys
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.scope_analysis import analyze_tree
+
+
+CODE = '''import os
+import sys
+import json as js
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from collections import OrderedDict
+
+__all__ = ["exported"]
+from helpers import exported
+
+def outer(arg):
+    unused = 1
+    first, second = arg
+    counter = 0
+    def inner():
+        nonlocal counter
+        counter += 1
+        return os.getcwd()
+    with open(arg) as handle:
+        pass
+    return inner, missing_name
+
+class Thing:
+    attr = 1
+    items = [attr for _ in range(3)]
+
+    def method(self) -> "OrderedDict":
+        return attr + later()
+
+def later():
+    return [y for y in range(3) if (z := y)]
+'''
+
+
+class TestScopeAnalysis(unittest.TestCase):
+    """Test unused imports, unused locals and undefined names"""
+
+    def test_reports(self):
+        """Test the issues reported for a module with nested scopes"""
+        issues = analyze_tree(ast.parse(CODE))
+        self.assertEqual(issues, [
+            (2, "Unused import: sys"),
+            (3, "Unused import: js"),
+            (12, "Unused local variable 'unused' in function 'outer'"),
+            (19, "Unused local variable 'handle' in function 'outer'"),
+            (21, "Undefined name: missing_name"),
+            (25, "Undefined name: attr"),
+            (28, "Undefined name: attr"),
+            (31, "Unused local variable 'z' in function 'later'"),
+        ])
+
+    def test_package_init_reexports(self):
+        """Test that module-level imports in __init__ are not reported"""
+        self.assertEqual(analyze_tree(ast.parse("import os\n"), is_package_init=True), [])
+
+    def test_star_import_disables_undefined(self):
+        """Test that undefined names are not reported after import *"""
+        self.assertEqual(analyze_tree(ast.parse("from os import *\ngetcwd()\n")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for the parallel code search engine
+"""
+import unittest
+import os
+import re
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.search_engine import CodeSearcher, MMAP_THRESHOLD
+from core.tool_manager import ToolManager
+
+
+SAMPLE = (
+    "import os\n"
+    "def handler(event):\n"
+    "    # TODO: validate event\n"
+    "    return os.path.join('a', 'b')\n"
+    "\n"
+    "class Handler:\n"
+    "    pass  # TODO\n"
+)
+
+
+class TestCodeSearcher(unittest.TestCase):
+    """Test CodeSearcher against a naive per-line regex scan"""
+
+    def setUp(self):
+        """Create files below and above the mmap threshold"""
+        self.project_path = tempfile.mkdtemp()
+        self.paths = ['small.py', 'large.py']
+        with open(os.path.join(self.project_path, 'small.py'), 'w') as f:
+            f.write(SAMPLE)
+        with open(os.path.join(self.project_path, 'large.py'), 'w') as f:
+            f.write(SAMPLE * (MMAP_THRESHOLD // len(SAMPLE) + 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.project_path)
+
+    def naive_search(self, pattern):
+        regex = re.compile(pattern)
+        results = []
+        for rel_path in self.paths:
+            with open(os.path.join(self.project_path, rel_path)) as f:
+                for i, line in enumerate(f, 1):
+                    if regex.search(line):
+                        results.append((rel_path, i, line.strip()))
+        return results
+
+    def test_matches_naive_scan(self):
+        """Test literal, multiline and line-only paths give identical results"""
+        for pattern in ["TODO", r"def \w+\(", r"^\s+pass", r"\)$", r"\s+return", r"(?<=# )TODO", r"\Aimport"]:
+            searcher = CodeSearcher(pattern)
+            self.assertEqual(
+                list(searcher.iter_matches(self.project_path, self.paths)),
+                self.naive_search(pattern),
+                pattern
+            )
+
+    def test_per_file_cap(self):
+        """Test that max_per_file stops scanning a file early"""
+        searcher = CodeSearcher("TODO", max_per_file=3)
+        matches = list(searcher.iter_matches(self.project_path, self.paths))
+        self.assertEqual([m[0] for m in matches], ['small.py'] * 2 + ['large.py'] * 3)
+
+    def test_invalid_utf8_is_searched_by_both_paths(self):
+        """Test that literal and regex patterns agree on a file that isn't UTF-8"""
+        with open(os.path.join(self.project_path, 'latin1.py'), 'wb') as f:
+            f.write("name = 'café'  # TODO\n".encode('latin-1'))
+        expected = [('latin1.py', 1, "name = 'caf\ufffd'  # TODO")]
+        for pattern in ["TODO", r"TO+DO"]:
+            matches = list(CodeSearcher(pattern).iter_matches(self.project_path, ['latin1.py']))
+            self.assertEqual(matches, expected, pattern)
+
+    def test_search_code_result_cap(self):
+        """Test that search_code stops at max_results"""
+        tool_manager = ToolManager(self.project_path)
+        result = tool_manager.search_code("TODO", max_results=5, max_per_file=1000)
+        lines = result.splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[-1].startswith("... (stopped after 5 matches"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Tests that trivial CLI invocations stay free of heavy imports
+"""
+import unittest
+import os
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+spec = importlib.util.spec_from_file_location(
+    "check_import_time", os.path.join(ROOT, "scripts", "check_import_time.py")
+)
+check_import_time = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(check_import_time)
+
+
+class TestStartupImports(unittest.TestCase):
+    """Test the import footprint of --version and --help"""
+
+    def test_parse_importtime(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      1500 |       2000 | argparse\n"
+        )
+        self.assertEqual(check_import_time.parse_importtime(stderr), {"_io": 120, "argparse": 1500})
+
+    def test_trivial_invocations_skip_heavy_modules(self):
+        for args in check_import_time.INVOCATIONS:
+            _, modules = check_import_time.measure(args)
+            self.assertIn("argparse", modules)
+            heavy = [name for name in modules if name.startswith(check_import_time.FORBIDDEN)]
+            self.assertEqual(heavy, [], f"{' '.join(args)} imports {heavy}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for request tracing, /stats percentiles and Chrome trace export
+"""
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_API_KEY", "dummy-key-for-testing")
+
+import openai
+from benchmarks.fake_openai import FakeOpenAIServer, scripted
+from core.agent import CodingAgent
+from core.memory import SessionMemory
+from core.tracing import Tracer
+
+
+class TestTracer(unittest.TestCase):
+    """Test span recording and statistics"""
+
+    def test_phase_percentiles(self):
+        tracer = Tracer()
+        for i in range(1, 101):
+            tracer.record("tool", "search_code", 0, i * 1000000)
+        stats = tracer.phase_stats()["tool"]
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['p50'], 51.0)
+        self.assertEqual(stats['p95'], 96.0)
+        self.assertIn("tool", tracer.format_stats())
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False)
+        with tracer.span("llm", "chat.completion") as args:
+            args['prompt_tokens'] = 10
+        self.assertEqual(len(tracer.spans), 0)
+        self.assertEqual(tracer.format_stats(), "No requests traced yet")
+
+    def test_chrome_trace_export(self):
+        tracer = Tracer()
+        with tracer.span("llm", "chat.completion", model="m") as args:
+            args['prompt_tokens'] = 10
+        directory = tempfile.mkdtemp()
+        try:
+            path = tracer.export_chrome(os.path.join(directory, "traces", "session.json"))
+            with open(path) as f:
+                trace = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+        event = trace["traceEvents"][0]
+        self.assertEqual((event["ph"], event["cat"], event["name"]), ("X", "llm", "chat.completion"))
+        self.assertEqual(event["args"], {"model": "m", "prompt_tokens": 10})
+        self.assertGreaterEqual(event["dur"], 0)
+
+
+class TestAgentTracing(unittest.TestCase):
+    """Test the spans recorded for a request with tool calls"""
+
+    def setUp(self):
+        self.project_path = tempfile.mkdtemp()
+        with open(os.path.join(self.project_path, 'app.py'), 'w') as f:
+            f.write("def main():\n    return 'hello'\n")
+        script = scripted([[("search_code", {"pattern": "def main"})], "Found it."])
+        self.server = FakeOpenAIServer(script).start()
+        self.agent = CodingAgent(self.project_path)
+        self.agent.openai_client = openai.OpenAI(api_key="test", base_url=self.server.base_url, max_retries=0)
+        self.memory = SessionMemory(project_path=self.project_path)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.project_path)
+
+    def test_request_spans(self):
+        self.agent.process_request("where is main?", self.memory, on_token=lambda text: None)
+        spans = {}
+        for category, name, _, _, _, args in self.agent.tracer.spans:
+            spans.setdefault(category, []).append((name, args))
+
+        self.assertEqual(spans["request"][0][1], {"session": "default"})
+        self.assertEqual(len(spans["context"]), 1)
+        self.assertEqual(spans["tool"], [("search_code", {})])
+        self.assertEqual(len(spans["memory"]), 1)
+        self.assertEqual(len(spans["llm"]), 2)
+        for name, args in spans["llm"]:
+            self.assertTrue(args["stream"])
+            self.assertGreater(args["prompt_tokens"], 0)
+            self.assertIn("cached_tokens", args)
+
+        stats = self.agent.tracer.phase_stats()
+        self.assertGreaterEqual(stats["request"]["p50"], stats["llm"]["p50"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import ast
+import sys
+import marshal
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("MALAZ_AST_CACHE_SIZE", "256"))
+# Bump when the summary layout changes so stale files on disk are ignored
+SUMMARY_VERSION = 1
+
+def content_hash(source):
+    """Get the cache key for a piece of source code"""
+    return hashlib.sha1(source.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+class ASTCache:
+    """Size-bounded LRU cache of parsed ASTs keyed by content hash.
+
+    Every analyzer asks this cache instead of calling ``ast.parse`` itself,
+    so one version of a file is parsed once no matter how many tools look at
+    it. Returned trees are shared and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.trees = OrderedDict()
+        self.summaries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def parse(self, source):
+        """Parse source code, reusing the tree of identical content"""
+        key = content_hash(source)
+        with self._lock:
+            tree = self.trees.get(key)
+            if tree is not None:
+                self.trees.move_to_end(key)
+                self.hits += 1
+                return tree
+
+        tree = ast.parse(source)
+        with self._lock:
+            self.misses += 1
+            self._store(self.trees, key, tree)
+        return tree
+
+    def parse_file(self, file_path, encoding='utf-8'):
+        """Read and parse a file, returning (source, tree)"""
+        with open(file_path, 'r', encoding=encoding) as f:
+            source = f.read()
+        return source, self.parse(source)
+
+    def summarize(self, source, cache_dir=None):
+        """Get the imports, classes and functions defined in source code.
+
+        When ``cache_dir`` is given, summaries are also persisted there with
+        ``marshal`` so later runs can skip parsing unchanged files entirely.
+        """
+        key = content_hash(source)
+        with self._lock:
+            summary = self.summaries.get(key)
+            if summary is not None:
+                self.summaries.move_to_end(key)
+                return summary
+
+        summary_file = None
+        if cache_dir:
+            summary_file = os.path.join(cache_dir, f"{key}.marshal")
+            summary = self._load_summary(summary_file)
+
+        if summary is None:
+            summary = build_summary(self.parse(source))
+            if summary_file:
+                self._save_summary(summary_file, summary)
+
+        with self._lock:
+            self._store(self.summaries, key, summary)
+        return summary
+
+    def clear(self):
+        """Drop every cached tree and summary"""
+        with self._lock:
+            self.trees.clear()
+            self.summaries.clear()
+
+    def _store(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    @staticmethod
+    def _load_summary(summary_file):
+        try:
+            with open(summary_file, 'rb') as f:
+                data = marshal.load(f)
+            if data.get('version') == SUMMARY_VERSION:
+                return data['summary']
+        except Exception:
+            pass
+        return None
+
+    @staticmethod
+    def _save_summary(summary_file, summary):
+        try:
+            os.makedirs(os.path.dirname(summary_file), exist_ok=True)
+            tmp_file = f"{summary_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'wb') as f:
+                marshal.dump({'version': SUMMARY_VERSION, 'summary': summary}, f)
+            os.replace(tmp_file, summary_file)
+        except OSError:
+            pass
+
+def build_summary(tree):
+    """Collect imports, classes and functions from a parsed module"""
+    summary = {"imports": [], "classes": [], "functions": []}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                summary["imports"].append(f"import {alias.name}")
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module if node.module else ""
+            summary["imports"].append(f"from {module} import {', '.join(a.name for a in node.names)}")
+        elif isinstance(node, ast.ClassDef):
+            summary["classes"].append(node.name)
+        elif isinstance(node, ast.FunctionDef):
+            summary["functions"].append(node.name)
+    return summary
+
+def summary_dir(cache_root):
+    """Get the on-disk summary directory for the running Python version"""
+    return os.path.join(cache_root, f"ast_summaries_py{sys.version_info[0]}{sys.version_info[1]}")
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_ast_cache():
+    """Get the process-wide AST cache shared by all analyzers"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = ASTCache()
+    return _shared_cache
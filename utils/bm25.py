@@ -0,0 +1,117 @@
+import re
+import math
+import heapq
+from collections import Counter
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+_CAMEL_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or
+please so that the this to was what when where which who why with you your
+""".split())
+
+def tokenize(text):
+    """Split text into lowercase terms, including identifier parts.
+
+    ``load_project_structure`` and ``CodeReviewer`` produce the full
+    identifier as well as ``load``/``project``/``structure`` and
+    ``code``/``reviewer``, so both exact names and words match.
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text or ""):
+        lower = word.lower()
+        if lower in STOPWORDS:
+            continue
+        terms.append(lower)
+        parts = [p.lower() for piece in word.split('_') for p in _CAMEL_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(p for p in parts if p not in STOPWORDS)
+    return terms
+
+class BM25Index:
+    """Incremental Okapi BM25 index over short documents.
+
+    Adding or removing a document only touches that document's terms, so
+    keeping the index current costs O(document size) per update.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_terms = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_terms
+
+    def add(self, doc_id, text):
+        """Index a document, replacing any previous version of it"""
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = (terms, length)
+        self.total_length += length
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id):
+        entry = self.doc_terms.pop(doc_id, None)
+        if entry is None:
+            return
+        terms, length = entry
+        self.total_length -= length
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def to_data(self):
+        """Get the index as plain dicts and tuples, e.g. for ``marshal``"""
+        return {
+            'k1': self.k1,
+            'b': self.b,
+            'postings': self.postings,
+            'doc_terms': {doc_id: (dict(terms), length) for doc_id, (terms, length) in self.doc_terms.items()},
+            'total_length': self.total_length,
+        }
+
+    @classmethod
+    def from_data(cls, data):
+        """Rebuild an index saved with ``to_data``"""
+        index = cls(data['k1'], data['b'])
+        index.postings = data['postings']
+        index.doc_terms = {doc_id: (Counter(terms), length) for doc_id, (terms, length) in data['doc_terms'].items()}
+        index.total_length = data['total_length']
+        return index
+
+    def clear(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.total_length = 0
+
+    def search(self, query, k=5, exclude=()):
+        """Get up to ``k`` (doc_id, score) pairs, best first"""
+        if not self.doc_terms:
+            return []
+        doc_count = len(self.doc_terms)
+        average_length = self.total_length / doc_count or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, count in docs.items():
+                if doc_id in exclude:
+                    continue
+                length = self.doc_terms[doc_id][1]
+                norm = count + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
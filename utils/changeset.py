@@ -0,0 +1,166 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from utils.patch_engine import apply_patches
+
+class ChangesetError(Exception):
+    """A changeset that was rejected before any file changed"""
+
+    def __init__(self, problems):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _make_parent_dirs(paths):
+    """Create missing parent directories; returns the ones created, deepest first"""
+    created = []
+    for path in paths:
+        directory = os.path.dirname(path)
+        missing = []
+        while directory and not os.path.isdir(directory):
+            missing.append(directory)
+            directory = os.path.dirname(directory)
+        for directory in reversed(missing):
+            os.makedirs(directory, exist_ok=True)
+            created.append(directory)
+    return sorted(set(created), key=len, reverse=True)
+
+def _remove_dirs(directories):
+    for directory in directories:
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+def _backup(path):
+    """Keep the current version of a file aside; returns the backup path or None"""
+    if not os.path.exists(path):
+        return None
+    backup = f"{path}.{os.getpid()}.bak"
+    _remove(backup)
+    try:
+        os.link(path, backup)
+    except OSError:
+        shutil.copy2(path, backup)
+    return backup
+
+class Changeset:
+    """Creates, modifications and deletions of many files applied all or nothing.
+
+    Every new file version is first staged next to its target, in
+    parallel. Only when all of them are ready are they moved into place
+    with ``os.replace``, keeping backups of the originals, so a failure at
+    any point restores every file. Paths must already be validated.
+    """
+
+    MAX_WORKERS = 8
+
+    def __init__(self, creates=(), modifications=(), deletions=(), root=None):
+        self.creates = list(creates)
+        self.modifications = list(modifications)
+        self.deletions = list(deletions)
+        self.root = root
+        self.staged = {}
+
+    def name(self, path):
+        return os.path.relpath(path, self.root) if self.root else path
+
+    def check(self):
+        """Get the problems that can be found without touching any file"""
+        problems = []
+        seen = set()
+        paths = [path for path, _ in self.creates + self.modifications] + self.deletions
+        for path in paths:
+            if path in seen:
+                problems.append(f"{self.name(path)}: listed more than once")
+            seen.add(path)
+        for path in [path for path, _ in self.modifications] + self.deletions:
+            if not os.path.isfile(path):
+                problems.append(f"{self.name(path)}: file not found")
+        for path, _ in self.creates:
+            if os.path.isdir(path):
+                problems.append(f"{self.name(path)}: is a directory")
+        return problems
+
+    def _stage_create(self, path, content):
+        tmp_file = self.staged[path]
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return []
+
+    def _stage_modify(self, path, patches):
+        tmp_file = self.staged[path]
+        applied, failures = apply_patches(path, patches, tmp_file)
+        if failures or not applied:
+            return [f"{self.name(path)}: {failure}" for failure in failures] or [f"{self.name(path)}: no patches"]
+        shutil.copymode(path, tmp_file)
+        return []
+
+    def _stage(self, stage, path, change):
+        try:
+            return stage(path, change)
+        except Exception as e:
+            return [f"{self.name(path)}: {e}"]
+
+    def stage(self):
+        """Write every new file version to a temporary file in parallel; returns problems"""
+        jobs = [(self._stage_create, path, content) for path, content in self.creates]
+        jobs += [(self._stage_modify, path, patches) for path, patches in self.modifications]
+        for _, path, _ in jobs:
+            self.staged[path] = f"{path}.{os.getpid()}.tmp"
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(jobs))) as executor:
+            results = list(executor.map(lambda job: self._stage(*job), jobs))
+        return [problem for problems in results for problem in problems]
+
+    def commit(self):
+        """Move the staged files into place and delete files, restoring everything on failure"""
+        backups = {}
+        done = []
+        try:
+            for path, tmp_file in self.staged.items():
+                backups[path] = _backup(path)
+                os.replace(tmp_file, path)
+                done.append(path)
+            for path in self.deletions:
+                backups[path] = f"{path}.{os.getpid()}.bak"
+                os.replace(path, backups[path])
+                done.append(path)
+        except BaseException:
+            for path in reversed(done):
+                if backups[path] is None:
+                    _remove(path)
+                else:
+                    os.replace(backups[path], path)
+            for path, backup in backups.items():
+                if path not in done and backup is not None:
+                    _remove(backup)
+            raise
+        for backup in backups.values():
+            if backup is not None:
+                _remove(backup)
+
+    def apply(self):
+        """Apply the whole changeset or raise; ChangesetError means nothing changed"""
+        problems = self.check()
+        if problems:
+            raise ChangesetError(problems)
+        created_dirs = _make_parent_dirs(path for path, _ in self.creates)
+        committed = False
+        try:
+            problems = self.stage()
+            if problems:
+                raise ChangesetError(problems)
+            self.commit()
+            committed = True
+        finally:
+            for tmp_file in self.staged.values():
+                _remove(tmp_file)
+            if not committed:
+                _remove_dirs(created_dirs)
@@ -0,0 +1,206 @@
+import os
+import ast
+import time
+from utils.file_utils import get_cache_dir, scan_project, read_cache_data, write_cache_data
+from utils.ast_cache import get_ast_cache
+from utils.bm25 import BM25Index
+
+def _identifiers(node):
+    """Collect the names a piece of code defines and uses"""
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name):
+            names.append(child.id)
+        elif isinstance(child, ast.Attribute):
+            names.append(child.attr)
+        elif isinstance(child, ast.arg):
+            names.append(child.arg)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.append(child.name)
+    return names
+
+def _start_line(node):
+    decorators = getattr(node, 'decorator_list', None)
+    return min([d.lineno for d in decorators] + [node.lineno]) if decorators else node.lineno
+
+def python_chunks(source):
+    """Split a module into (start, end, name, text) chunks.
+
+    Functions and methods become chunks of their own; classes contribute a
+    chunk for their header and docstring, and module-level code before the
+    first definition forms a module chunk. ``text`` holds the identifiers
+    and docstrings that get indexed.
+    """
+    tree = get_ast_cache().parse(source)
+    chunks = []
+
+    def add_function(node, prefix=""):
+        name = prefix + node.name
+        text = [name, ast.get_docstring(node) or ""] + _identifiers(node)
+        chunks.append((_start_line(node), node.end_lineno, name, " ".join(text)))
+
+    first_definition = None
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            first_definition = first_definition or _start_line(node)
+            add_function(node)
+        elif isinstance(node, ast.ClassDef):
+            first_definition = first_definition or _start_line(node)
+            methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            header_end = _start_line(methods[0]) - 1 if methods else node.end_lineno
+            header = [node.name, ast.get_docstring(node) or ""] + [m.name for m in methods]
+            header += [name for base in node.bases for name in _identifiers(base)]
+            chunks.append((_start_line(node), header_end, node.name, " ".join(header)))
+            for method in methods:
+                add_function(method, f"{node.name}.")
+
+    module_end = (first_definition - 1) if first_definition else len(source.splitlines())
+    if module_end > 0:
+        module_nodes = [n for n in tree.body if n.lineno <= module_end]
+        text = [ast.get_docstring(tree) or ""]
+        for node in module_nodes:
+            text.extend(_identifiers(node))
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                text.extend(alias.name for alias in node.names)
+                text.append(getattr(node, 'module', None) or "")
+        chunks.append((1, module_end, "<module>", " ".join(text)))
+    return chunks
+
+def window_chunks(source, size=50):
+    """Split non-Python source into fixed windows of lines"""
+    lines = source.splitlines()
+    return [
+        (start + 1, min(start + size, len(lines)), None, "\n".join(lines[start:start + size]))
+        for start in range(0, len(lines), size)
+    ]
+
+class CodeIndex:
+    """Persistent, incremental BM25 index over code chunks.
+
+    Python files are split into functions, methods, class headers and
+    module-level code and indexed by identifiers and docstrings; other
+    source files are indexed in windows of lines. Chunks are keyed by
+    ``rel_path:start_line`` so re-indexing a file only replaces its own
+    chunks.
+    """
+
+    VERSION = 2
+    INDEX_FILE = "code_index.marshal"
+    MAX_FILE_SIZE = 1024 * 1024
+
+    def __init__(self, project_path, extensions):
+        self.project_path = os.path.abspath(project_path)
+        self.extensions = tuple(extensions)
+        self.index_file = os.path.join(get_cache_dir(self.project_path), self.INDEX_FILE)
+        self._reset()
+        self.dirty = False
+        self.last_refresh = 0.0
+        self.load()
+
+    def _reset(self):
+        self.files = {}
+        self.chunks = {}
+        self.bm25 = BM25Index()
+
+    def load(self):
+        """Load the index from disk, discarding it on version mismatch"""
+        data = read_cache_data(self.index_file)
+        if data is None:
+            return
+
+        try:
+            if data.get('version') == self.VERSION and data.get('extensions') == self.extensions:
+                self.files = data['files']
+                self.chunks = data['chunks']
+                self.bm25 = BM25Index.from_data(data['bm25'])
+        except Exception:
+            self._reset()
+
+    def save(self):
+        """Persist the index atomically if it changed"""
+        if not self.dirty:
+            return
+
+        data = {
+            'version': self.VERSION,
+            'extensions': self.extensions,
+            'files': self.files,
+            'chunks': self.chunks,
+            'bm25': self.bm25.to_data()
+        }
+        write_cache_data(self.index_file, data)
+        self.dirty = False
+
+    def refresh(self, files=None):
+        """Re-index source files added or changed since the last refresh.
+
+        ``files`` is a ``scan_project`` listing to use instead of walking
+        the tree again.
+        """
+        seen = set()
+        if files is None:
+            files = scan_project(self.project_path)
+        for rel_path, stat in files:
+            if not rel_path.endswith(self.extensions):
+                continue
+            seen.add(rel_path)
+            entry = self.files.get(rel_path)
+            if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                self._index_file(rel_path, stat)
+
+        for rel_path in [p for p in self.files if p not in seen]:
+            self._remove_file(rel_path)
+        self.last_refresh = time.time()
+
+    def update_file(self, rel_path):
+        """Re-index a single file after it was created, modified or deleted"""
+        rel_path = os.path.normpath(rel_path)
+        if not rel_path.endswith(self.extensions):
+            return
+        try:
+            stat = os.stat(os.path.join(self.project_path, rel_path))
+        except OSError:
+            self._remove_file(rel_path)
+            return
+        self._index_file(rel_path, stat)
+
+    def search(self, query, k=10):
+        """Get up to ``k`` (rel_path, start, end, name, score) chunks, best first"""
+        return [
+            self.chunks[chunk_id] + (score,)
+            for chunk_id, score in self.bm25.search(query, k)
+        ]
+
+    def _index_file(self, rel_path, stat):
+        """Replace the chunks of one file"""
+        self._remove_file(rel_path)
+        chunk_ids = []
+        if stat.st_size <= self.MAX_FILE_SIZE:
+            try:
+                with open(os.path.join(self.project_path, rel_path), 'r', encoding='utf-8') as f:
+                    source = f.read()
+                chunks = python_chunks(source) if rel_path.endswith('.py') else window_chunks(source)
+            except Exception:
+                # Unreadable or unparsable files are tracked but contribute nothing
+                chunks = []
+
+            # The path makes "the config loader" match config/loader.py
+            path_terms = os.path.splitext(rel_path)[0].replace(os.sep, " ")
+            for start, end, name, text in chunks:
+                chunk_id = f"{rel_path}:{start}"
+                self.chunks[chunk_id] = (rel_path, start, end, name)
+                self.bm25.add(chunk_id, f"{path_terms} {text}")
+                chunk_ids.append(chunk_id)
+
+        self.files[rel_path] = (stat.st_mtime_ns, stat.st_size, chunk_ids)
+        self.dirty = True
+
+    def _remove_file(self, rel_path):
+        """Drop every chunk of one file"""
+        entry = self.files.pop(rel_path, None)
+        if entry is None:
+            return
+        for chunk_id in entry[2]:
+            self.chunks.pop(chunk_id, None)
+            self.bm25.remove(chunk_id)
+        self.dirty = True
@@ -2,11 +2,12 @@ import ast
 import inspect
 import tokenize
 from io import StringIO
+from utils.ast_cache import get_ast_cache
 
 def extract_functions(file_path):
     """Extract function signatures and docstrings from a Python file"""
     with open(file_path, 'r') as f:
-        tree = ast.parse(f.read())
+        tree = get_ast_cache().parse(f.read())
     
     functions = []
     for node in ast.walk(tree):
@@ -46,7 +47,7 @@ def generate_docstring(code):
     """Generate docstring for a function"""
     try:
         # Parse function
-        tree = ast.parse(code)
+        tree = get_ast_cache().parse(code)
         func = next(node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef))
         
         # Generate docstring
@@ -73,7 +74,7 @@ def format_code(code):
     """Format code using black-style formatting rules (simplified)"""
     try:
         # Parse and unparse for basic formatting
-        tree = ast.parse(code)
+        tree = get_ast_cache().parse(code)
         formatted = ast.unparse(tree)
         
         # Add basic indentation
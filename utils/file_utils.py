@@ -1,6 +1,9 @@
 import os
 import json
 import ast
+import marshal
+
+CACHE_DIR_NAME = ".malaz"
 
 def detect_dependencies(project_path):
     """Detect project dependencies based on files"""
@@ -24,8 +27,111 @@ def detect_dependencies(project_path):
     
     return dependencies
 
-def load_project_structure(project_path):
-    """Generate detailed project structure with file contents summary"""
+def get_cache_dir(project_path):
+    """Get (and create) the directory used for Malaz caches and indexes"""
+    cache_dir = os.path.join(project_path, CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def read_cache_data(path):
+    """Load a dict written by ``write_cache_data``; None if missing or unreadable.
+
+    Cache files live inside the project, which may be an untrusted clone,
+    so they hold plain data in ``marshal`` format and never pickles: loading
+    one cannot run code.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def write_cache_data(path, data):
+    """Atomically write a dict of plain data (dicts, lists, tuples, sets, str, numbers)"""
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        marshal.dump(data, f)
+    os.replace(tmp_file, path)
+
+def walk_project(project_path):
+    """Walk the project tree, skipping hidden directories.
+
+    Yields (root, subdirs, files) tuples where ``subdirs`` lists the full
+    paths of the directories descended into next and ``files`` is a list of
+    (file_name, stat_result) pairs, so callers never need a second stat call.
+    """
+    stack = [project_path]
+    while stack:
+        root = stack.pop()
+        try:
+            entries = sorted(os.scandir(root), key=lambda e: e.name)
+        except OSError:
+            continue
+
+        files = []
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith('.'):
+                        subdirs.append(entry.path)
+                elif entry.is_file():
+                    files.append((entry.name, entry.stat()))
+            except OSError:
+                continue
+
+        yield root, subdirs, files
+        stack.extend(reversed(subdirs))
+
+def scan_project(project_path):
+    """List (relative path, stat_result) of every project file in one walk.
+
+    Indexes accept this listing in ``refresh`` so several of them can share
+    a single walk of the tree.
+    """
+    return [
+        (os.path.relpath(os.path.join(root, file_name), project_path), stat)
+        for root, _, files in walk_project(project_path)
+        for file_name, stat in files
+    ]
+
+def build_file_info(project_path, rel_path, size):
+    """Build the metadata entry for a single project file"""
+    file_name = os.path.basename(rel_path)
+    file_path = os.path.join(project_path, rel_path)
+    file_info = {
+        "path": rel_path,
+        "size": size,
+        "type": "file"
+    }
+
+    # Add language-specific metadata
+    if file_name.endswith('.py'):
+        file_info["type"] = "python"
+        file_info["summary"] = get_python_file_summary(file_path)
+    elif file_name.endswith('.js'):
+        file_info["type"] = "javascript"
+    elif file_name == 'package.json':
+        file_info["type"] = "package.json"
+        file_info["dependencies"] = get_package_dependencies(file_path)
+    elif file_name.endswith('.json'):
+        file_info["type"] = "json"
+    elif file_name == 'requirements.txt':
+        file_info["type"] = "python-dependencies"
+
+    return file_info
+
+def load_project_structure(project_path, use_cache=True):
+    """Generate detailed project structure with file contents summary.
+
+    With ``use_cache`` the per-file metadata comes from the persistent
+    project index, so only added, changed or deleted files are re-scanned.
+    """
+    if use_cache:
+        from utils.project_index import ProjectIndex
+        return ProjectIndex(project_path).load_structure()
+
     structure = {
         "path": project_path,
         "directories": [],
@@ -33,38 +139,13 @@ def load_project_structure(project_path):
         "dependencies": detect_dependencies(project_path)
     }
 
-    for root, dirs, files in os.walk(project_path):
-        # Skip hidden directories# Skip hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-        for dir_name in dirs:
-            structure["dependencies"].append(os.path.relpath(os.path.join(root, dir_name), project_path))
-        
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            rel_path = os.path.relpath(file_path, project_path)
-
-            file_info = {
-                "path": rel_path,
-                "size": os.path.getsize(file_path),
-                "type": "file"
-            }
-
-            # Add language-specific metadata
-            if file_name.endswith('.py'):
-                file_info["type"] = "python"
-                file_info["summary"] = get_python_file_summary(file_path)
-            elif file_name.endswith('.js'):
-                file_info["type"] = "javascript"
-            elif file_name.endswith('.json'):
-                file_info["type"] = "json"
-            elif file_name == 'package.json':
-                file_info["type"] = "package.json"
-                file_info["dependencies"] = get_package_dependencies(file_path)
-            elif file_name == 'requirements.txt':
-                file_info["type"] = "python-dependencies"
-
-            structure["files"].append(file_info)
+    for root, subdirs, files in walk_project(project_path):
+        for dir_path in subdirs:
+            structure["directories"].append(os.path.relpath(dir_path, project_path))
+
+        for file_name, stat in files:
+            rel_path = os.path.relpath(os.path.join(root, file_name), project_path)
+            structure["files"].append(build_file_info(project_path, rel_path, stat.st_size))
 
     return structure
 
@@ -0,0 +1,439 @@
+import os
+import re
+import shutil
+import difflib
+from array import array
+from itertools import chain, islice
+
+# Bytes of lines read at a time when indexing or copying a file
+BATCH_BYTES = 1 << 20
+BATCH_LINES = 8192
+# Files bigger than this are streamed instead of read into memory
+STREAM_BYTES = 16 * 1024 * 1024
+# Above this many distinct lines to look up, one pass over the index beats a search per line
+FIND_LIMIT = 16
+
+# Context lines that may be dropped from each end of a diff hunk that does not match
+MAX_FUZZ = 2
+
+KEEP, DELETE, INSERT = ' ', '-', '+'
+
+_HUNK_HEADER = re.compile(r'^@@+ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@+')
+
+class PatchError(ValueError):
+    """A patch that cannot be parsed"""
+
+def _loose(text):
+    """Line text with whitespace differences ignored"""
+    return ' '.join(text.split())
+
+def _split(text):
+    """Split a block of text into lines without their endings"""
+    if not text:
+        return []
+    if text.endswith('\n'):
+        text = text[:-1]
+    return [line.rstrip('\r') for line in text.split('\n')]
+
+class Hunk:
+    """One edit of a file: the ops that turn the lines it expects into new lines.
+
+    ``ops`` is a list of ``(op, text)`` with op KEEP, DELETE or INSERT.
+    ``hint`` is the 0-based line where the hunk is expected, if known, and
+    ``mode`` how to choose among several matches: "nearest" (to the hint),
+    "first", "unique" or "all".
+    """
+
+    def __init__(self, patch, ops, hint=None, mode='nearest'):
+        self.patch = patch
+        self.ops = ops
+        self.hint = hint
+        self.mode = mode
+        self.old = [text for op, text in ops if op != INSERT]
+
+    def variants(self):
+        """The hunk followed by copies with up to MAX_FUZZ context lines dropped from each end"""
+        yield self
+        if self.mode != 'nearest':
+            return
+        previous = (0, len(self.ops))
+        for fuzz in range(1, MAX_FUZZ + 1):
+            start = 0
+            while start < fuzz and start < len(self.ops) and self.ops[start][0] == KEEP:
+                start += 1
+            end = len(self.ops)
+            while len(self.ops) - end < fuzz and end > start and self.ops[end - 1][0] == KEEP:
+                end -= 1
+            ops = self.ops[start:end]
+            if (start, end) == previous or not any(op != INSERT for op, _ in ops):
+                return
+            previous = (start, end)
+            yield Hunk(self.patch, ops, None if self.hint is None else self.hint + start, self.mode)
+
+def parse_unified_diff(text, patch=0):
+    """Parse the @@ hunks of a unified diff; file headers are ignored"""
+    hunks = []
+    ops = None
+    hint = None
+    bare_blanks = 0
+    lines = text.split('\n')
+
+    def finish():
+        if ops:
+            del ops[len(ops) - bare_blanks:]
+            if ops:
+                hunks.append(Hunk(patch, list(ops), hint))
+
+    for number, line in enumerate(lines):
+        line = line.rstrip('\r')
+        if line.startswith('@@'):
+            finish()
+            match = _HUNK_HEADER.match(line)
+            if match is None:
+                hint = None
+            elif match.group(2) == '0':
+                # Pure insertion after line N
+                hint = int(match.group(1))
+            else:
+                hint = max(int(match.group(1)) - 1, 0)
+            ops = []
+            bare_blanks = 0
+            continue
+        is_header = (
+            line.startswith('diff ')
+            or (line.startswith('--- ') and number + 1 < len(lines) and lines[number + 1].startswith('+++ '))
+        )
+        if is_header:
+            finish()
+            ops = None
+            continue
+        if ops is None or line.startswith('\\'):
+            continue
+        if line == '':
+            # Editors and models often strip the space of empty context lines
+            ops.append((KEEP, ''))
+            bare_blanks += 1
+            continue
+        if line[0] not in (KEEP, DELETE, INSERT):
+            raise PatchError(f"unexpected line in hunk: {line[:60]!r}")
+        ops.append((line[0], line[1:]))
+        bare_blanks = 0
+    finish()
+
+    if not hunks:
+        raise PatchError("no @@ hunks found in diff")
+    return hunks
+
+def _replacement_ops(old, new):
+    """Ops that turn ``old`` lines into ``new`` ones, keeping lines they share"""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.extend((KEEP, text) for text in old[i1:i2])
+            continue
+        ops.extend((DELETE, text) for text in old[i1:i2])
+        ops.extend((INSERT, text) for text in new[j1:j2])
+    return ops
+
+def parse_patch(patch, number=0):
+    """Parse one ``modify_file`` patch into hunks.
+
+    A patch is a unified diff (``{"diff": ...}``), a search/replace block
+    (``{"search": ..., "replace": ...}``, which must match exactly one place
+    unless ``replace_all`` is set) or a legacy line patch (``{"old_line":
+    ..., "new_line": ...}``, which replaces the first occurrence not taken
+    by an earlier patch).
+    """
+    if not isinstance(patch, dict):
+        raise PatchError("patch must be an object")
+    if patch.get('diff'):
+        return parse_unified_diff(patch['diff'], number)
+    if 'search' in patch:
+        old = _split(patch['search'])
+        if not old:
+            raise PatchError("empty search block")
+        if 'replace' not in patch:
+            raise PatchError("search block has no 'replace'")
+        mode = 'all' if patch.get('replace_all') else 'unique'
+        return [Hunk(number, _replacement_ops(old, _split(patch['replace'])), mode=mode)]
+    if 'old_line' in patch and 'new_line' in patch:
+        old = _split(patch['old_line']) or ['']
+        new = patch['new_line'].rstrip('\n').split('\n')
+        mode = 'all' if patch.get('replace_all') else 'first'
+        return [Hunk(number, _replacement_ops(old, new), mode=mode)]
+    raise PatchError("expected 'diff', 'search'/'replace' or 'old_line'/'new_line'")
+
+class LineIndex:
+    """Hashes of every line of a file, built in one pass.
+
+    Lines are compared by hash, exactly or loosely (whitespace differences
+    ignored), so matching a hunk is a slice comparison whatever the number
+    of patches. Files up to STREAM_BYTES are kept in memory; bigger ones
+    are streamed in batches and never held whole. Loose hashes are only
+    computed when an exact match fails.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lines = None
+        if os.path.getsize(path) <= STREAM_BYTES:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                self.lines = f.readlines()
+        self.exact = array('q')
+        self.newline = None
+        self._loose = None
+        last = ''
+        for batch in self.batches():
+            if self.newline is None:
+                text = batch[0].rstrip('\r\n')
+                self.newline = batch[0][len(text):] or None
+            # Exact hashes include the line ending, which saves stripping every line
+            self.exact.extend(map(hash, batch))
+            last = batch[-1]
+        self.newline = self.newline or '\n'
+        self.final_newline = last == '' or last.endswith(('\n', '\r'))
+        if not self.final_newline:
+            self.exact[-1] = hash(last + self.newline)
+
+    def batches(self):
+        """Lists of the file lines, with their endings"""
+        if self.lines is not None:
+            if self.lines:
+                yield self.lines
+            return
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            yield from iter(lambda: f.readlines(BATCH_BYTES), [])
+
+    @property
+    def loose(self):
+        if self._loose is None:
+            self._loose = array('q')
+            for batch in self.batches():
+                self._loose.extend(hash(_loose(line)) for line in batch)
+        return self._loose
+
+    def __len__(self):
+        return len(self.exact)
+
+    def hashes(self, lines, loose=False):
+        if loose:
+            return array('q', (hash(_loose(text)) for text in lines))
+        return array('q', (hash(text + self.newline) for text in lines))
+
+    def positions(self, wanted, loose=False):
+        """Get {hash: [line numbers]} for the wanted hashes"""
+        hashes = self.loose if loose else self.exact
+        if len(wanted) > FIND_LIMIT:
+            found = {h: [] for h in wanted}
+            for number, h in enumerate(hashes):
+                numbers = found.get(h)
+                if numbers is not None:
+                    numbers.append(number)
+            return found
+        # Searching the raw buffer runs at memchr speed, unlike array.index
+        buffer = hashes.tobytes()
+        size = hashes.itemsize
+        found = {}
+        for h in wanted:
+            numbers = found[h] = []
+            needle = array('q', [h]).tobytes()
+            offset = buffer.find(needle)
+            while offset != -1:
+                if offset % size == 0:
+                    numbers.append(offset // size)
+                offset = buffer.find(needle, offset + 1)
+        return found
+
+def _find(index, hunk, hint, positions, loose, claimed, inserted):
+    """Get (start lines, error) of a hunk variant.
+
+    ``claimed`` marks the lines earlier hunks change and ``inserted`` the
+    points (before line N) where earlier hunks insert lines.
+    """
+    size = len(hunk.old)
+    if size == 0:
+        if hint is None or not 0 <= hint <= len(index):
+            return [], "insertion has no context or line number"
+        if 0 < hint < len(index) and claimed[hint - 1] and claimed[hint]:
+            return [], "insertion point is inside lines changed by another patch"
+        return [hint], None
+
+    lines = index.loose if loose else index.exact
+    expected = index.hashes(hunk.old, loose)
+    starts = [
+        start for start in positions.get(expected[0], ())
+        if lines[start:start + size] == expected and claimed.find(1, start, start + size) == -1
+    ]
+    if not starts:
+        return [], None
+    free = [start for start in starts if inserted.find(1, start + 1, start + size) == -1]
+    if not free:
+        return [], "lines span the insertion point of another patch"
+    starts = free
+    if hunk.mode == 'all':
+        chosen = []
+        for start in starts:
+            if not chosen or start >= chosen[-1] + size:
+                chosen.append(start)
+        return chosen, None
+    if hunk.mode == 'first':
+        return starts[:1], None
+    if hint is not None:
+        return [min(starts, key=lambda start: abs(start - hint))], None
+    if len(starts) > 1:
+        where = ", ".join(str(start + 1) for start in starts[:5])
+        return [], f"matches {len(starts)} places (lines {where}); add context or set replace_all"
+    return starts, None
+
+def locate(index, hunks):
+    """Place hunks on the file.
+
+    Returns (edits, failures): edits are ``(start, end, ops)`` on the
+    original line numbers, failures ``{patch number: reason}``. Every hunk
+    is tried exactly first; diff hunks are then tried ignoring whitespace
+    and with less context. Search/replace blocks and line patches only
+    match exactly, since their new lines are written as given.
+    """
+    variants = [list(hunk.variants()) for hunk in hunks]
+    edits = []
+    # Lines already taken by an edit
+    claimed = bytearray(len(index))
+    # Points (before line N) where an edit inserts lines
+    inserted = bytearray(len(index) + 1)
+    failures = {}
+    offsets = {}
+    positions = {}
+
+    for hunk, hunk_variants in zip(hunks, variants):
+        if hunk.patch in failures:
+            continue
+        starts, error, placed = [], None, None
+        for loose in ((False, True) if hunk.mode == 'nearest' else (False,)):
+            if loose not in positions:
+                wanted = {index.hashes(v.old[:1], loose)[0] for vs in variants for v in vs if v.old}
+                positions[loose] = index.positions(wanted, loose)
+            for variant in hunk_variants:
+                hint = None if variant.hint is None else variant.hint + offsets.get(hunk.patch, 0)
+                starts, error = _find(index, variant, hint, positions[loose], loose, claimed, inserted)
+                if starts or error:
+                    placed = variant
+                    break
+            if starts or error:
+                break
+
+        if not starts:
+            first = hunk.old[0] if hunk.old else ''
+            failures[hunk.patch] = error or f"no match for {first.strip()[:60]!r}"
+            continue
+        if placed.hint is not None:
+            offsets[hunk.patch] = starts[0] - placed.hint
+        for start in starts:
+            end = start + len(placed.old)
+            edits.append((start, end, placed.ops, hunk.patch))
+            if start == end:
+                inserted[start] = 1
+            claimed[start:end] = b'\x01' * (end - start)
+
+    edits = [(start, end, ops) for start, end, ops, patch in edits if patch not in failures]
+    return edits, failures
+
+class _LineWriter:
+    """Write lines, giving the output the same final newline (or lack of one) as the input"""
+
+    def __init__(self, out, newline):
+        self.out = out
+        self.newline = newline
+        self.last = None
+
+    def write(self, line):
+        if self.last is not None:
+            if not self.last.endswith(('\n', '\r')):
+                self.last += self.newline
+            self.out.write(self.last)
+        self.last = line
+
+    def write_many(self, lines):
+        if not lines:
+            return
+        self.write(lines[0])
+        if len(lines) > 1:
+            # Only the last line of a file can lack its newline
+            self.out.write(self.last)
+            self.out.writelines(lines[1:-1])
+            self.last = lines[-1]
+
+    def close(self, final_newline):
+        if self.last is None:
+            return
+        text = self.last.rstrip('\r\n')
+        if final_newline:
+            self.out.write(self.last if text != self.last else text + self.newline)
+        else:
+            self.out.write(text)
+
+def write_patched(index, target, edits):
+    """Write the indexed file with the edits applied to ``target``"""
+    src = chain.from_iterable(index.batches())
+    with open(target, 'w', encoding='utf-8', newline='') as out:
+        writer = _LineWriter(out, index.newline)
+        number = 0
+        for start, end, ops in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+            while number < start:
+                batch = list(islice(src, min(start - number, BATCH_LINES)))
+                writer.write_many(batch)
+                number += len(batch)
+            for op, text in ops:
+                if op == INSERT:
+                    writer.write(text + index.newline)
+                    continue
+                line = next(src)
+                number += 1
+                if op == KEEP:
+                    writer.write(line)
+        for batch in iter(lambda: list(islice(src, BATCH_LINES)), []):
+            writer.write_many(batch)
+        writer.close(index.final_newline)
+
+def apply_patches(path, patches, target):
+    """Write ``path`` with the patches applied to ``target``.
+
+    Returns (applied, failures) where failures lists "patch N: reason".
+    A patch applies completely or not at all; ``target`` is only written
+    when at least one patch applies.
+    """
+    hunks = []
+    failures = {}
+    for number, patch in enumerate(patches, 1):
+        try:
+            hunks.extend(parse_patch(patch, number))
+        except PatchError as e:
+            failures[number] = str(e)
+
+    index = LineIndex(path)
+    edits, missed = locate(index, hunks)
+    failures.update(missed)
+    applied = len(patches) - len(failures)
+    if applied:
+        write_patched(index, target, edits)
+    return applied, [f"patch {number}: {failures[number]}" for number in sorted(failures)]
+
+def patch_file(path, patches, strict=False):
+    """Apply patches to a file in place; see ``apply_patches``.
+
+    The result goes to a temporary file that replaces the original with
+    ``os.replace``, so the file is never left half written. With
+    ``strict`` nothing is written unless every patch applies.
+    """
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        applied, failures = apply_patches(path, patches, tmp_file)
+        if applied and not (strict and failures):
+            shutil.copymode(path, tmp_file)
+            os.replace(tmp_file, path)
+        else:
+            applied = 0 if strict else applied
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return applied, failures
@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+from utils.file_utils import (
+    get_cache_dir,
+    walk_project,
+    build_file_info,
+    detect_dependencies,
+)
+
+class ProjectIndex:
+    """Persistent, incremental index of project files.
+
+    Entries are keyed by relative path and store the mtime and size seen at
+    the last scan (plus an optional content hash), so a refresh only re-reads
+    files that were added or changed since the previous run.
+    """
+
+    VERSION = 1
+    INDEX_FILE = "project_index.json"
+
+    def __init__(self, project_path, use_hash=False):
+        self.project_path = os.path.abspath(project_path)
+        self.use_hash = use_hash
+        self.index_file = os.path.join(get_cache_dir(self.project_path), self.INDEX_FILE)
+        self.entries = {}
+        self.directories = []
+        self.load()
+
+    def load(self):
+        """Load the index from disk, discarding it on version mismatch"""
+        if not os.path.exists(self.index_file):
+            return
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION and data.get('use_hash') == self.use_hash:
+                self.entries = data.get('entries', {})
+                self.directories = data.get('directories', [])
+        except Exception:
+            self.entries = {}
+            self.directories = []
+
+    def save(self):
+        """Persist the index atomically"""
+        data = {
+            'version': self.VERSION,
+            'use_hash': self.use_hash,
+            'directories': self.directories,
+            'entries': self.entries
+        }
+        tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_file, self.index_file)
+
+    def refresh(self):
+        """Rescan the tree and update changed entries.
+
+        Returns a dict with the relative paths that were added, changed and
+        deleted since the last refresh.
+        """
+        changes = {'added': [], 'changed': [], 'deleted': []}
+        seen = set()
+        directories = []
+        # Entries whose metadata changed without a content change
+        touched = False
+
+        for root, subdirs, files in walk_project(self.project_path):
+            for dir_path in subdirs:
+                directories.append(os.path.relpath(dir_path, self.project_path))
+
+            for file_name, stat in files:
+                rel_path = os.path.relpath(os.path.join(root, file_name), self.project_path)
+                seen.add(rel_path)
+                entry = self.entries.get(rel_path)
+
+                if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    continue
+
+                digest = self._hash_file(rel_path) if self.use_hash else None
+                if entry and digest is not None and entry.get('hash') == digest:
+                    # Touched but unchanged (e.g. branch switch): keep metadata
+                    entry['mtime'] = stat.st_mtime_ns
+                    touched = True
+                    continue
+
+                changes['changed' if entry else 'added'].append(rel_path)
+                self.entries[rel_path] = {
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'hash': digest,
+                    'info': build_file_info(self.project_path, rel_path, stat.st_size)
+                }
+
+        for rel_path in list(self.entries):
+            if rel_path not in seen:
+                del self.entries[rel_path]
+                changes['deleted'].append(rel_path)
+
+        dirs_changed = directories != self.directories
+        self.directories = directories
+        if dirs_changed or touched or any(changes.values()):
+            self.save()
+        return changes
+
+    def load_structure(self):
+        """Refresh the index and return the project structure"""
+        self.refresh()
+        return {
+            "path": self.project_path,
+            "directories": list(self.directories),
+            "files": [self.entries[path]['info'] for path in sorted(self.entries)],
+            "dependencies": detect_dependencies(self.project_path)
+        }
+
+    def _hash_file(self, rel_path):
+        """Compute the content hash of a file"""
+        digest = hashlib.sha1()
+        try:
+            with open(os.path.join(self.project_path, rel_path), 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b''):
+                    digest.update(block)
+        except OSError:
+            return None
+        return digest.hexdigest()
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from utils.file_utils import get_cache_dir
+
+class ResponseCache:
+    """On-disk cache of chat completion results backed by SQLite.
+
+    Entries are keyed by a hash of the model, messages, tools and request
+    parameters and store the assistant content and tool calls. Entries older
+    than ``ttl`` seconds are ignored, and once the stored size passes
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    VERSION = 1
+    DB_FILE = "response_cache.sqlite"
+
+    def __init__(self, db_path, ttl=86400, max_bytes=100 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, project_path):
+        """Create the project cache if ``MALAZ_CACHE`` is enabled, else None"""
+        if os.getenv("MALAZ_CACHE", "0").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            os.path.join(get_cache_dir(project_path), cls.DB_FILE),
+            ttl=float(os.getenv("MALAZ_CACHE_TTL", "86400")),
+            max_bytes=int(float(os.getenv("MALAZ_CACHE_MAX_MB", "100")) * 1024 * 1024)
+        )
+
+    @classmethod
+    def make_key(cls, model, messages, params):
+        """Hash everything that determines a completion"""
+        payload = json.dumps(
+            {'version': cls.VERSION, 'model': model, 'messages': messages, 'params': params},
+            sort_keys=True, separators=(',', ':'), default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Get (content, tool_calls) for a key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        value = json.loads(row[0])
+        return value['content'], value['tool_calls']
+
+    def put(self, key, content, tool_calls):
+        """Store a completion result and evict entries over the size limit"""
+        value = json.dumps({'content': content, 'tool_calls': tool_calls}, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Get entry count, stored bytes and hit/miss counters"""
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {'entries': count, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk from the least recently used entry until enough is freed
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            doomed.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
@@ -1,8 +1,106 @@
+import os
 import ast
+import json
+import pickle
 import difflib
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.ast_cache import get_ast_cache, content_hash
+from utils.file_utils import walk_project
+
+class ReviewRule:
+    """Base class for review rules.
+
+    Rules declare the AST node types they care about and are all run during a
+    single traversal of the tree; ``check`` yields finding dicts.
+    """
+    node_types = ()
+
+    def check(self, node):
+        return []
+
+class FunctionLengthRule(ReviewRule):
+    """Flag functions whose body is too long"""
+    node_types = (ast.FunctionDef,)
+    max_statements = 30
+
+    def check(self, node):
+        if len(node.body) > self.max_statements:
+            yield {
+                "line": node.lineno,
+                "message": f"Function '{node.name}' is too long ({len(node.body)} lines). Consider refactoring.",
+                "severity": "medium"
+            }
+
+class DocstringRule(ReviewRule):
+    """Flag modules, classes and functions without a docstring"""
+    node_types = (ast.FunctionDef, ast.ClassDef, ast.Module)
+
+    def check(self, node):
+        body = node.body
+        if not (body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)):
+            yield {
+                "line": node.lineno if hasattr(node, 'lineno') else 1,
+                "message": f"Missing docstring for {type(node).__name__.lower()}",
+                "severity": "low"
+            }
+
+class NamingRule(ReviewRule):
+    """Flag assigned names with characters outside letters, digits and underscores"""
+    node_types = (ast.Name,)
+
+    def check(self, node):
+        if isinstance(node.ctx, ast.Store) and not node.id.replace('_', '').isalnum():
+            yield {
+                "line": node.lineno,
+                "message": f"Invalid variable name: '{node.id}' should only contain letters, numbers, and underscores",
+                "severity": "high"
+            }
+
+DEFAULT_RULES = (FunctionLengthRule, DocstringRule, NamingRule)
+
+class RuleVisitor(ast.NodeVisitor):
+    """Run every registered rule in one pass over the tree"""
+
+    def __init__(self, rules):
+        self.dispatch = {}
+        for rule in rules:
+            for node_type in rule.node_types:
+                self.dispatch.setdefault(node_type, []).append(rule)
+        self.findings = []
+
+    def visit(self, node):
+        for rule in self.dispatch.get(type(node), ()):
+            self.findings.extend(rule.check(node))
+        self.generic_visit(node)
+
+def collect_findings(code, rules):
+    """Run rules over code and return findings sorted by line"""
+    visitor = RuleVisitor(rules)
+    visitor.visit(get_ast_cache().parse(code))
+    return sorted(visitor.findings, key=lambda finding: finding["line"])
+
+def _review_worker(args):
+    """Review one file in a worker process"""
+    file_path, code, rules = args
+    try:
+        return file_path, collect_findings(code, rules), None
+    except SyntaxError as e:
+        return file_path, None, f"Syntax error: {e.msg} at line {e.lineno}"
+    except Exception as e:
+        # A deeply nested file or a buggy rule must not abort the whole batch
+        return file_path, None, f"Review failed: {type(e).__name__}: {e}"
 
 class CodeReviewer:
-    def __init__(self):
+    REVIEW_CACHE_FILE = "review_cache.json"
+    # Below this many files a process pool costs more than it saves
+    MIN_PARALLEL_FILES = 16
+    MAX_CACHE_ENTRIES = 50000
+
+    def __init__(self, rules=None):
         self.best_practices = [
             "Use meaningful variable names",
             "Keep functions small and focused",
@@ -11,73 +109,169 @@ class CodeReviewer:
             "Handle exceptions appropriately",
             "Follow PEP 8 style guide"
         ]
-    
+        self.rules = [rule() for rule in DEFAULT_RULES] if rules is None else list(rules)
+
+    def register_rule(self, rule):
+        """Add a rule instance to the review pass"""
+        self.rules.append(rule)
+
     def review_file(self, file_path):
         """Perform code review on a single file"""
         try:
             with open(file_path, 'r') as f:
                 code = f.read()
-            
+
             return self.review_code(code, file_path)
         except Exception as e:
             return f"Review failed: {str(e)}"
-    
+
     def review_code(self, code, file_name="code.py"):
         """Perform code review on code string"""
         try:
-            # Parse AST
-            tree = ast.parse(code)
-            
-            # Initialize findings
-            findings = []
-            
-            # Check for best practices
-            # 1. Check function length
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    if len(node.body) > 30:
-                        findings.append({
-                            "line": node.lineno,
-                            "message": f"Function '{node.name}' is too long ({len(node.body)} lines). Consider refactoring.",
-                            "severity": "medium"
-                        })
-            
-            # 2. Check for docstrings
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Module)):
-                    if not (node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Str)):
-                        findings.append({
-                            "line": node.lineno if hasattr(node, 'lineno') else 1,
-                            "message": f"Missing docstring for {type(node).__name__.lower()}",
-                            "severity": "low"
-                        })
-            
-            # 3. Check variable naming conventions
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
-                    if not node.id.replace('_', '').isalnum():
-                        findings.append({
-                            "line": node.lineno,
-                            "message": f"Invalid variable name: '{node.id}' should only contain letters, numbers, and underscores",
-                            "severity": "high"
-                        })
-            
-            # Format findings
-            if findings:
-                report = f"Code Review for {file_name}:\n"
-                for finding in findings:
-                    report += f"\nLine {finding['line']} ({finding['severity']}): {finding['message']}"
-                return report
-            return "No issues found. Code follows best practices."
-        
+            findings = collect_findings(code, self.rules)
         except SyntaxError as e:
             return f"Syntax error: {e.msg} at line {e.lineno}"
-    
+        return self.format_findings(file_name, findings)
+
+    def format_findings(self, file_name, findings):
+        """Format findings into a review report"""
+        if findings:
+            report = f"Code Review for {file_name}:\n"
+            for finding in findings:
+                report += f"\nLine {finding['line']} ({finding['severity']}): {finding['message']}"
+            return report
+        return "No issues found. Code follows best practices."
+
+    def review_directory(self, dir_path, cache_dir=None, workers=None, max_findings=200):
+        """Review every Python file under a directory.
+
+        Files are reviewed in a process pool and results are cached per file
+        by content hash in ``cache_dir``, so only changed files are re-reviewed.
+        """
+        results = self.review_paths(self._find_python_files(dir_path), cache_dir, workers)
+
+        total = sum(len(findings) for findings, _ in results.values() if findings)
+        report = f"Reviewed {len(results)} files in {dir_path}: {total} issues found\n"
+        shown = 0
+        for file_path in sorted(results):
+            findings, error = results[file_path]
+            rel_path = os.path.relpath(file_path, dir_path)
+            if error:
+                report += f"\n{rel_path}: {error}\n"
+            elif findings:
+                if shown >= max_findings:
+                    continue
+                findings = findings[:max_findings - shown]
+                shown += len(findings)
+                report += "\n" + self.format_findings(rel_path, findings) + "\n"
+
+        if shown < total:
+            report += f"\n... {total - shown} more issues not shown"
+        return report.rstrip()
+
+    def review_paths(self, file_paths, cache_dir=None, workers=None):
+        """Review many files, returning {path: (findings, error)}"""
+        cache = self._load_cache(cache_dir)
+        signature = self._rules_signature()
+        results = {}
+        pending = []
+
+        for file_path in file_paths:
+            try:
+                with open(file_path, 'r') as f:
+                    code = f.read()
+            except Exception as e:
+                results[file_path] = (None, f"Review failed: {str(e)}")
+                continue
+
+            key = f"{signature}:{content_hash(code)}"
+            if key in cache:
+                results[file_path] = tuple(cache[key])
+            else:
+                pending.append((file_path, code, key))
+
+        if not pending:
+            return results
+
+        for file_path, findings, error in self._run_reviews(pending, workers):
+            results[file_path] = (findings, error)
+
+        if cache_dir:
+            for file_path, _, key in pending:
+                cache[key] = list(results[file_path])
+            self._save_cache(cache_dir, cache)
+        return results
+
+    def _run_reviews(self, pending, workers):
+        """Run reviews serially or in a process pool"""
+        jobs = [(file_path, code, self.rules) for file_path, code, _ in pending]
+        if len(jobs) >= self.MIN_PARALLEL_FILES and workers != 1:
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    return list(pool.map(_review_worker, jobs, chunksize=max(1, len(jobs) // 64)))
+            except (OSError, ImportError, NotImplementedError, BrokenProcessPool,
+                    pickle.PicklingError, TypeError, AttributeError):
+                # No multiprocessing here, a worker died, or a custom rule
+                # can't be pickled: fall back to serial
+                pass
+        return [_review_worker(job) for job in jobs]
+
+    def _rules_signature(self):
+        """Identify the active rule set so cached results match it.
+
+        Covers each rule's class, settings (public non-callable attributes
+        such as ``max_statements``) and source, so changing any of them
+        invalidates cached results.
+        """
+        parts = []
+        for rule in self.rules:
+            rule_type = type(rule)
+            try:
+                source = inspect.getsource(rule_type)
+            except (OSError, TypeError):
+                source = ""
+            settings = sorted(
+                (name, repr(getattr(rule, name))) for name in dir(rule)
+                if not name.startswith('_') and not callable(getattr(rule, name))
+            )
+            parts.append([f"{rule_type.__module__}.{rule_type.__qualname__}", settings, source])
+        return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _find_python_files(dir_path):
+        return [
+            os.path.join(root, file_name)
+            for root, _, files in walk_project(dir_path)
+            for file_name, _ in files if file_name.endswith('.py')
+        ]
+
+    def _load_cache(self, cache_dir):
+        if not cache_dir:
+            return {}
+        try:
+            with open(os.path.join(cache_dir, self.REVIEW_CACHE_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_cache(self, cache_dir, cache):
+        # Oldest entries go first; they belong to file versions long replaced
+        for key in list(cache)[:max(0, len(cache) - self.MAX_CACHE_ENTRIES)]:
+            del cache[key]
+        try:
+            cache_file = os.path.join(cache_dir, self.REVIEW_CACHE_FILE)
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, separators=(',', ':'))
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+
     def suggest_improvement(self, old_code, suggestion):
         """Generate diff for code improvement"""
         old_lines = old_code.splitlines(keepends=True)
         new_lines = suggestion.splitlines(keepends=True)
-        
+
         diff = difflib.unified_diff(
             old_lines,
             new_lines,
@@ -85,4 +279,4 @@ class CodeReviewer:
             tofile='suggested',
             lineterm=''
         )
-        return '\n'.join(diff)
\ No newline at end of file
+        return '\n'.join(diff)
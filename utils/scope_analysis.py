@@ -0,0 +1,351 @@
+import ast
+import builtins
+
+# Names that exist at runtime without ever being bound in source
+IMPLICIT_NAMES = set(dir(builtins)) | {
+    '__file__', '__name__', '__doc__', '__package__', '__spec__', '__loader__',
+    '__builtins__', '__path__', '__annotations__', '__cached__', '__dict__',
+}
+CLASS_IMPLICIT_NAMES = {'__qualname__', '__module__'}
+
+class Binding:
+    """A single place where a name is bound"""
+    __slots__ = ('name', 'kind', 'lineno', 'used')
+
+    def __init__(self, name, kind, lineno):
+        self.name = name
+        self.kind = kind
+        self.lineno = lineno
+        self.used = False
+
+class Scope:
+    """Definitions and uses recorded for one module, class or function"""
+
+    def __init__(self, kind, name, parent=None):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.bindings = {}
+        self.uses = []
+        self.globals = set()
+        self.nonlocals = set()
+        self.uses_locals = False
+
+    def bind(self, name, kind, lineno):
+        self.bindings.setdefault(name, []).append(Binding(name, kind, lineno))
+
+class ScopeAnalyzer(ast.NodeVisitor):
+    """Build per-scope symbol tables in a single traversal.
+
+    Uses are only resolved after the whole module has been visited, so a
+    function may refer to names defined further down. Resolution walks each
+    use up its scope chain (skipping class scopes, as Python does), which
+    keeps the whole analysis linear in the size of the tree.
+    """
+
+    # Binding kinds reported when never read inside a function
+    LOCAL_KINDS = ('assign', 'with', 'except', 'walrus')
+
+    def __init__(self, is_package_init=False):
+        self.is_package_init = is_package_init
+        self.module = Scope('module', '<module>')
+        self.scope = self.module
+        self.scopes = [self.module]
+        self.star_import = False
+
+    def analyze(self, tree):
+        """Analyze a module tree and return a list of (lineno, message)"""
+        self.visit(tree)
+        undefined = self._resolve()
+        return sorted(self._unused_imports() + self._unused_locals() + undefined)
+
+    # -- scope handling -------------------------------------------------
+
+    def _push(self, kind, name):
+        scope = Scope(kind, name, self.scope)
+        self.scopes.append(scope)
+        self.scope = scope
+        return scope
+
+    def _pop(self):
+        self.scope = self.scope.parent
+
+    def _use(self, name, lineno):
+        self.scope.uses.append((name, lineno))
+
+    def _bind(self, name, kind, lineno):
+        scope = self.scope
+        if name in scope.globals:
+            self.module.bind(name, kind, lineno)
+        elif name in scope.nonlocals:
+            target = self._lookup_scope(scope.parent, name)
+            (target or scope).bind(name, kind, lineno)
+        else:
+            scope.bind(name, kind, lineno)
+
+    # -- definitions ----------------------------------------------------
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            name = alias.asname or alias.name.split('.')[0]
+            self._bind(name, 'import', node.lineno)
+
+    def visit_ImportFrom(self, node):
+        if node.module == '__future__':
+            return
+        for alias in node.names:
+            if alias.name == '*':
+                self.star_import = True
+                continue
+            self._bind(alias.asname or alias.name, 'import', node.lineno)
+
+    def visit_Global(self, node):
+        self.scope.globals.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        self.scope.nonlocals.update(node.names)
+
+    def _visit_function(self, node, name):
+        for decorator in getattr(node, 'decorator_list', []):
+            self.visit(decorator)
+        args = node.args
+        for default in args.defaults + [d for d in args.kw_defaults if d is not None]:
+            self.visit(default)
+        all_args = getattr(args, 'posonlyargs', []) + args.args + args.kwonlyargs
+        all_args += [a for a in (args.vararg, args.kwarg) if a is not None]
+        for arg in all_args:
+            self._visit_annotation(arg.annotation)
+        self._visit_annotation(getattr(node, 'returns', None))
+        if name is not None:
+            self._bind(name, 'def', node.lineno)
+
+        self._push('function', name or '<lambda>')
+        for arg in all_args:
+            self.scope.bind(arg.arg, 'param', node.lineno)
+        if isinstance(node.body, list):
+            for statement in node.body:
+                self.visit(statement)
+        else:
+            self.visit(node.body)
+        self._pop()
+
+    def visit_FunctionDef(self, node):
+        self._visit_function(node, node.name)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._visit_function(node, None)
+
+    def visit_ClassDef(self, node):
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self._push('class', node.name)
+        for statement in node.body:
+            self.visit(statement)
+        self._pop()
+        self._bind(node.name, 'def', node.lineno)
+
+    def _visit_comprehension(self, node, elements):
+        generators = node.generators
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(generators[0].iter)
+        self._push('comprehension', '<comprehension>')
+        for i, generator in enumerate(generators):
+            if i:
+                self.visit(generator.iter)
+            self._visit_target(generator.target, 'loop')
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in elements:
+            self.visit(element)
+        self._pop()
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    # -- assignments ----------------------------------------------------
+
+    def _visit_target(self, target, kind):
+        if isinstance(target, ast.Name):
+            self._bind(target.id, kind, target.lineno)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self._visit_target(element, 'unpack' if kind == 'assign' else kind)
+        elif isinstance(target, ast.Starred):
+            self._visit_target(target.value, kind)
+        else:
+            self.visit(target)
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            self._visit_target(target, 'assign')
+        if self.scope is self.module and any(
+                isinstance(t, ast.Name) and t.id == '__all__' for t in node.targets):
+            self._use_all(node.value)
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        if isinstance(node.target, ast.Name):
+            self._use(node.target.id, node.lineno)
+            self._bind(node.target.id, 'augassign', node.lineno)
+        else:
+            self.visit(node.target)
+
+    def visit_AnnAssign(self, node):
+        self._visit_annotation(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self._visit_target(node.target, 'assign')
+        elif not isinstance(node.target, ast.Name):
+            self.visit(node.target)
+
+    def visit_NamedExpr(self, node):
+        self.visit(node.value)
+        # Walrus targets bind in the nearest non-comprehension scope
+        scope = self.scope
+        while scope.kind == 'comprehension':
+            scope = scope.parent
+        scope.bind(node.target.id, 'walrus', node.lineno)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self._visit_target(node.target, 'loop')
+        for statement in node.body + node.orelse:
+            self.visit(statement)
+
+    visit_AsyncFor = visit_For
+
+    def visit_With(self, node):
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self._visit_target(item.optional_vars, 'with')
+        for statement in node.body:
+            self.visit(statement)
+
+    visit_AsyncWith = visit_With
+
+    def visit_ExceptHandler(self, node):
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name:
+            self._bind(node.name, 'except', node.lineno)
+        for statement in node.body:
+            self.visit(statement)
+
+    def visit_MatchAs(self, node):
+        if node.pattern is not None:
+            self.visit(node.pattern)
+        if node.name:
+            self._bind(node.name, 'loop', node.lineno)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self._bind(node.name, 'loop', node.lineno)
+
+    def visit_MatchMapping(self, node):
+        self.generic_visit(node)
+        if node.rest:
+            self._bind(node.rest, 'loop', node.lineno)
+
+    # -- uses -----------------------------------------------------------
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self._bind(node.id, 'assign', node.lineno)
+        else:
+            self._use(node.id, node.lineno)
+            if node.id == 'locals':
+                self.scope.uses_locals = True
+
+    def _visit_annotation(self, annotation):
+        if annotation is None:
+            return
+        if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str):
+            # String annotations still count as uses of the names inside them
+            try:
+                parsed = ast.parse(annotation.value, mode='eval').body
+            except SyntaxError:
+                return
+            for node in ast.walk(parsed):
+                if isinstance(node, ast.Name):
+                    self._use(node.id, annotation.lineno)
+            return
+        self.visit(annotation)
+
+    def _use_all(self, value):
+        if isinstance(value, (ast.List, ast.Tuple)):
+            for element in value.elts:
+                if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                    self._use(element.value, element.lineno)
+
+    # -- resolution -----------------------------------------------------
+
+    def _lookup_scope(self, scope, name):
+        """Find the scope a name resolves to, starting at ``scope``"""
+        first = True
+        while scope is not None:
+            if first or scope.kind != 'class':
+                if name in scope.bindings:
+                    return scope
+            first = False
+            scope = scope.parent
+        return None
+
+    def _resolve(self):
+        undefined = []
+        for scope in self.scopes:
+            for name, lineno in scope.uses:
+                if name in scope.globals:
+                    target = self.module if name in self.module.bindings else None
+                else:
+                    target = self._lookup_scope(scope, name)
+
+                if target is not None:
+                    for binding in target.bindings[name]:
+                        binding.used = True
+                elif name in IMPLICIT_NAMES or (scope.kind == 'class' and name in CLASS_IMPLICIT_NAMES):
+                    continue
+                elif name == '__class__' and scope.kind == 'function':
+                    continue
+                elif not self.star_import:
+                    undefined.append((lineno, f"Undefined name: {name}"))
+        return undefined
+
+    def _unused_imports(self):
+        issues = []
+        for scope in self.scopes:
+            if scope is self.module and self.is_package_init:
+                # Package __init__ imports are usually re-exports
+                continue
+            for bindings in scope.bindings.values():
+                for binding in bindings:
+                    if binding.kind == 'import' and not binding.used:
+                        issues.append((binding.lineno, f"Unused import: {binding.name}"))
+        return issues
+
+    def _unused_locals(self):
+        issues = []
+        for scope in self.scopes:
+            if scope.kind != 'function' or scope.uses_locals:
+                continue
+            for name, bindings in scope.bindings.items():
+                if name.startswith('_') or name in scope.globals or name in scope.nonlocals:
+                    continue
+                if any(b.used for b in bindings) or any(b.kind not in self.LOCAL_KINDS for b in bindings):
+                    continue
+                issues.append((bindings[0].lineno,
+                               f"Unused local variable '{name}' in function '{scope.name}'"))
+        return issues
+
+def analyze_tree(tree, is_package_init=False):
+    """Report unused imports, unused locals and undefined names in a module"""
+    return ScopeAnalyzer(is_package_init).analyze(tree)
@@ -0,0 +1,154 @@
+import os
+import re
+import io
+import mmap
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Files smaller than this are read directly; mmap setup isn't worth it
+MMAP_THRESHOLD = 64 * 1024
+# Longest line text returned for a single match
+MAX_LINE_LENGTH = 300
+# How both search paths decode: invalid UTF-8 bytes become U+FFFD, so a
+# file that isn't clean UTF-8 is still searched and gives the same results
+# for literal and regex patterns
+DECODE_ERRORS = 'replace'
+# Regex features whose meaning depends on the line being searched alone
+_LINE_ONLY = re.compile(r'\\[AZ]|\(\?<[=!]')
+
+class CodeSearcher:
+    """Search a set of files for a regex, one line per match.
+
+    Files are fanned out to a thread pool and results are yielded in path
+    order as soon as each file is done. Pure literals are matched with a
+    bytes-level ``find`` on the (memory-mapped) file contents; other patterns
+    run once over the whole decoded file in multiline mode and each hit is
+    confirmed against its line, so results match a per-line ``re.search``.
+    """
+
+    def __init__(self, pattern, max_per_file=None, workers=None):
+        self.regex = re.compile(pattern)
+        self.max_per_file = max_per_file
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.literal = self._get_literal(pattern)
+        self.text_regex = None
+        if self.literal is None and not _LINE_ONLY.search(pattern):
+            self.text_regex = re.compile(pattern, re.MULTILINE)
+
+    @staticmethod
+    def _get_literal(pattern):
+        """Get the pattern as bytes if it has no regex syntax at all"""
+        if not pattern or re.search(r'[.^$*+?{}\[\]\\|()]', pattern):
+            return None
+        return pattern.encode('utf-8')
+
+    def iter_matches(self, project_path, rel_paths):
+        """Yield (rel_path, line_number, line) tuples as files are searched"""
+        paths = iter(rel_paths)
+        window = self.workers * 4
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                for rel_path in paths:
+                    pending.append(pool.submit(self.search_file, project_path, rel_path))
+                    if len(pending) >= window:
+                        break
+
+                while pending:
+                    for match in pending.popleft().result():
+                        yield match
+                    rel_path = next(paths, None)
+                    if rel_path is not None:
+                        pending.append(pool.submit(self.search_file, project_path, rel_path))
+            finally:
+                # Caller stopped early: don't start files nobody will read
+                for future in pending:
+                    future.cancel()
+
+    def search_file(self, project_path, rel_path):
+        """Search a single file and return its matches"""
+        try:
+            with open(os.path.join(project_path, rel_path), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return []
+                if size < MMAP_THRESHOLD:
+                    return self._search_buffer(rel_path, f.read())
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self._search_buffer(rel_path, data)
+        except Exception:
+            return []
+
+    def _search_buffer(self, rel_path, data):
+        """Search file contents (bytes or mmap)"""
+        if self.literal is not None:
+            return self._search_literal(rel_path, data)
+
+        text = bytes(data).decode('utf-8', errors=DECODE_ERRORS)
+        if self.text_regex is None:
+            return self._search_lines(rel_path, text)
+        return self._search_text(rel_path, text)
+
+    def _search_literal(self, rel_path, data):
+        """Literal fast path: bytes ``find`` without decoding the file"""
+        matches = []
+        line_number = 1
+        line_start = 0
+        pos = data.find(self.literal)
+        while pos != -1:
+            start = data.rfind(b'\n', 0, pos) + 1
+            end = data.find(b'\n', pos)
+            end = len(data) if end == -1 else end
+            line_number += data[line_start:start].count(b'\n')
+            line_start = start
+
+            line = bytes(data[start:end]).decode('utf-8', errors=DECODE_ERRORS)
+            matches.append(self._format(rel_path, line_number, line))
+            if self.max_per_file and len(matches) >= self.max_per_file:
+                break
+            pos = data.find(self.literal, end)
+        return matches
+
+    def _search_text(self, rel_path, text):
+        """Run the regex once over the whole text, confirming each line"""
+        matches = []
+        line_number = 1
+        line_start = 0
+        pos = 0
+        while True:
+            match = self.text_regex.search(text, pos)
+            if match is None:
+                break
+            start = text.rfind('\n', 0, match.start()) + 1
+            end = text.find('\n', match.start())
+            end = len(text) if end == -1 else end + 1
+            line_number += text.count('\n', line_start, start)
+            line_start = start
+
+            line = text[start:end]
+            if self.regex.search(line):
+                matches.append(self._format(rel_path, line_number, line))
+                if self.max_per_file and len(matches) >= self.max_per_file:
+                    break
+            if end >= len(text):
+                break
+            pos = end
+        return matches
+
+    def _search_lines(self, rel_path, text):
+        """Fallback for patterns that only make sense line by line"""
+        matches = []
+        for i, line in enumerate(io.StringIO(text), 1):
+            if self.regex.search(line):
+                matches.append(self._format(rel_path, i, line))
+                if self.max_per_file and len(matches) >= self.max_per_file:
+                    break
+        return matches
+
+    @staticmethod
+    def _format(rel_path, line_number, line):
+        line = line.strip()
+        if len(line) > MAX_LINE_LENGTH:
+            line = line[:MAX_LINE_LENGTH] + "..."
+        return rel_path, line_number, line
@@ -0,0 +1,83 @@
+import os
+import re
+import json
+from functools import lru_cache
+
+# Words (split into ~4 character pieces), single symbols and runs of
+# whitespace roughly match how BPE tokenizers split source code
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s+")
+
+class HeuristicTokenizer:
+    """Approximate token counter used when tiktoken is not available"""
+
+    name = "heuristic"
+
+    def count(self, text):
+        if not text:
+            return 0
+        total = 0
+        for match in _TOKEN_PATTERN.finditer(text):
+            piece = match.group()
+            if piece[0].isspace():
+                # Indentation and line breaks: about one token per line
+                total += max(1, piece.count('\n'))
+            elif piece[0].isalnum() or piece[0] == '_':
+                total += (len(piece) + 3) // 4
+            else:
+                total += 1
+        return total
+
+class TiktokenTokenizer:
+    """Exact token counts for OpenAI models via tiktoken"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count(self, text):
+        if not text:
+            return 0
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model=None):
+    """Get the tokenizer for a model.
+
+    Uses tiktoken when it is installed and its encoding can be loaded, and
+    falls back to HeuristicTokenizer otherwise (or when ``MALAZ_TOKENIZER``
+    is set to ``heuristic``).
+    """
+    if os.getenv("MALAZ_TOKENIZER", "auto").lower() == "heuristic":
+        return HeuristicTokenizer()
+    try:
+        import tiktoken
+    except ImportError:
+        return HeuristicTokenizer()
+
+    model = model or os.getenv("MALAZ_MODEL", "gpt-4o-mini")
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encodings are downloaded on first use, which fails offline
+        return HeuristicTokenizer()
+    return TiktokenTokenizer(encoding)
+
+def count_message_tokens(messages, tokenizer):
+    """Count the prompt tokens of chat messages, including per-message overhead"""
+    total = 3  # every reply is primed with <|start|>assistant<|message|>
+    for message in messages:
+        total += 4
+        total += tokenizer.count(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call["function"]
+            total += tokenizer.count(function["name"]) + tokenizer.count(function["arguments"])
+    return total
+
+def count_tools_tokens(tools, tokenizer):
+    """Approximate the prompt tokens taken by tool definitions"""
+    if not tools:
+        return 0
+    return tokenizer.count(json.dumps(tools, separators=(',', ':')))
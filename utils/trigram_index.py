@@ -0,0 +1,307 @@
+import os
+import re
+import time
+
+try:
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from utils.file_utils import get_cache_dir, scan_project, read_cache_data, write_cache_data
+
+_REPEATS = tuple(
+    getattr(sre_constants, name)
+    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(sre_constants, name)
+)
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+# Query nodes: ('all',) matches every file, ('tri', t) a single trigram,
+# ('and', [...]) / ('or', [...]) combine sub-queries.
+MATCH_ALL = ('all',)
+
+def _and(parts):
+    parts = [p for p in parts if p != MATCH_ALL]
+    if not parts:
+        return MATCH_ALL
+    return parts[0] if len(parts) == 1 else ('and', parts)
+
+def _or(parts):
+    if not parts or any(p == MATCH_ALL for p in parts):
+        return MATCH_ALL
+    return parts[0] if len(parts) == 1 else ('or', parts)
+
+def _literal_query(literal):
+    literal = literal.casefold()
+    if len(literal) < 3:
+        return MATCH_ALL
+    trigrams = sorted({literal[i:i + 3] for i in range(len(literal) - 2)})
+    return _and([('tri', t) for t in trigrams])
+
+def _sequence_query(items):
+    parts = []
+    run = []
+
+    def flush():
+        if run:
+            parts.append(_literal_query(''.join(run)))
+            del run[:]
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+
+        if op is sre_constants.SUBPATTERN:
+            sub_items = list(av[-1])
+            if sub_items and all(sub_op is sre_constants.LITERAL for sub_op, _ in sub_items):
+                # Plain literal group such as (foo): keep the run going
+                run.extend(chr(sub_av) for _, sub_av in sub_items)
+                continue
+            flush()
+            parts.append(_sequence_query(sub_items))
+        elif op is sre_constants.BRANCH:
+            flush()
+            parts.append(_or([_sequence_query(branch) for branch in av[1]]))
+        elif op in _REPEATS:
+            flush()
+            if av[0] >= 1:
+                parts.append(_sequence_query(av[2]))
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            flush()
+            parts.append(_sequence_query(av))
+        else:
+            # Anything else (classes, anchors, lookarounds...) breaks the run
+            flush()
+
+    flush()
+    return _and(parts)
+
+def _has_ignorecase_group(items):
+    for op, av in items:
+        if op is sre_constants.SUBPATTERN and av[1] & re.IGNORECASE:
+            return True
+        for value in av if isinstance(av, (tuple, list)) else ():
+            subpatterns = value if isinstance(value, list) else [value]
+            for sub in subpatterns:
+                if isinstance(sub, sre_parse.SubPattern) and _has_ignorecase_group(sub):
+                    return True
+    return False
+
+def ignores_case(pattern):
+    """Check whether any part of a regex matches case-insensitively"""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return True
+    state = getattr(parsed, 'state', None) or parsed.pattern
+    return bool(state.flags & re.IGNORECASE) or _has_ignorecase_group(parsed)
+
+def regex_to_query(pattern):
+    """Convert a regex into a trigram query that every match must satisfy"""
+    try:
+        return _sequence_query(sre_parse.parse(pattern))
+    except Exception:
+        return MATCH_ALL
+
+def extract_trigrams(text):
+    """Get the set of case-folded trigrams in a string"""
+    text = text.casefold()
+    return set(map(''.join, zip(text, text[1:], text[2:])))
+
+class TrigramIndex:
+    """Persistent trigram index used to narrow regex searches.
+
+    Each indexed file gets an integer id and every trigram maps to the set of
+    ids containing it. Changed or deleted files simply drop their id from the
+    live table; stale ids are filtered at query time and purged once they
+    make up a large share of the postings.
+
+    Trigrams are case-folded. ``re`` treats some non-ASCII letters as equal
+    ignoring case where ``str.casefold`` does not (``İ`` and ``i``), so files
+    with non-ASCII text are always candidates for case-insensitive patterns.
+    """
+
+    VERSION = 3
+    INDEX_FILE = "trigram_index.marshal"
+    MAX_FILE_SIZE = 1024 * 1024
+
+    def __init__(self, project_path, extensions):
+        self.project_path = os.path.abspath(project_path)
+        self.extensions = tuple(extensions)
+        self.index_file = os.path.join(get_cache_dir(self.project_path), self.INDEX_FILE)
+        self.files = {}
+        self.paths = {}
+        self.postings = {}
+        self.unindexed = set()
+        self.non_ascii = set()
+        self.next_id = 0
+        self.dead_ids = 0
+        self.dirty = False
+        self.last_refresh = 0.0
+        self.load()
+
+    def load(self):
+        """Load the index from disk, discarding it on version mismatch"""
+        data = read_cache_data(self.index_file)
+        if data is None:
+            return
+
+        try:
+            if data.get('version') != self.VERSION or data.get('extensions') != self.extensions:
+                return
+            self.files = data['files']
+            self.postings = data['postings']
+            self.unindexed = data['unindexed']
+            self.non_ascii = data['non_ascii']
+            self.next_id = data['next_id']
+            self.dead_ids = data['dead_ids']
+            self.paths = {file_id: path for path, (file_id, _, _) in self.files.items()}
+        except Exception:
+            self.files, self.paths, self.postings = {}, {}, {}
+            self.unindexed, self.non_ascii = set(), set()
+            self.next_id = self.dead_ids = 0
+
+    def save(self):
+        """Persist the index atomically if it changed"""
+        if not self.dirty:
+            return
+
+        data = {
+            'version': self.VERSION,
+            'extensions': self.extensions,
+            'files': self.files,
+            'postings': self.postings,
+            'unindexed': self.unindexed,
+            'non_ascii': self.non_ascii,
+            'next_id': self.next_id,
+            'dead_ids': self.dead_ids
+        }
+        write_cache_data(self.index_file, data)
+        self.dirty = False
+
+    def refresh(self, files=None):
+        """Re-index files added or changed since the last refresh.
+
+        ``files`` is a ``scan_project`` listing to use instead of walking
+        the tree again.
+        """
+        seen = set()
+        if files is None:
+            files = scan_project(self.project_path)
+        for rel_path, stat in files:
+            if not rel_path.endswith(self.extensions):
+                continue
+            seen.add(rel_path)
+            entry = self.files.get(rel_path)
+            if entry is None or entry[1] != stat.st_mtime_ns or entry[2] != stat.st_size:
+                self._index_file(rel_path, stat)
+
+        for rel_path in [p for p in self.files if p not in seen]:
+            self._remove_file(rel_path)
+
+        self.last_refresh = time.time()
+        self._maybe_compact()
+
+    def update_file(self, rel_path):
+        """Re-index a single file after it was created, modified or deleted"""
+        rel_path = os.path.normpath(rel_path)
+        if not rel_path.endswith(self.extensions):
+            return
+        try:
+            stat = os.stat(os.path.join(self.project_path, rel_path))
+        except OSError:
+            self._remove_file(rel_path)
+            return
+        self._index_file(rel_path, stat)
+
+    def candidates(self, pattern):
+        """Get the sorted relative paths of files that may match a regex"""
+        ids = self._evaluate(regex_to_query(pattern))
+        if ids is None:
+            paths = set(self.files)
+        else:
+            paths = {self.paths[i] for i in ids if i in self.paths}
+        paths |= self.unindexed
+        if self.non_ascii and ignores_case(pattern):
+            paths |= self.non_ascii
+        return sorted(paths)
+
+    def _evaluate(self, query):
+        """Evaluate a query to a set of file ids (None means every file)"""
+        kind = query[0]
+        if kind == 'all':
+            return None
+        if kind == 'tri':
+            return self.postings.get(query[1], set())
+
+        results = [self._evaluate(part) for part in query[1]]
+        if kind == 'and':
+            results = sorted((r for r in results if r is not None), key=len)
+            if not results:
+                return None
+            ids = set(results[0])
+            for result in results[1:]:
+                ids &= result
+                if not ids:
+                    break
+            return ids
+
+        if any(r is None for r in results):
+            return None
+        return set().union(*results)
+
+    def _index_file(self, rel_path, stat):
+        """Add (or replace) the postings for one file"""
+        self._remove_file(rel_path)
+        file_id = self.next_id
+        self.next_id += 1
+        self.files[rel_path] = (file_id, stat.st_mtime_ns, stat.st_size)
+        self.paths[file_id] = rel_path
+        self.dirty = True
+
+        if stat.st_size > self.MAX_FILE_SIZE:
+            self.unindexed.add(rel_path)
+            return
+
+        try:
+            with open(os.path.join(self.project_path, rel_path), 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+        except OSError:
+            self.unindexed.add(rel_path)
+            return
+        if not text.isascii():
+            self.non_ascii.add(rel_path)
+
+        for trigram in extract_trigrams(text):
+            posting = self.postings.get(trigram)
+            if posting is None:
+                self.postings[trigram] = {file_id}
+            else:
+                posting.add(file_id)
+
+    def _remove_file(self, rel_path):
+        """Drop a file from the live table; its postings become stale"""
+        entry = self.files.pop(rel_path, None)
+        self.unindexed.discard(rel_path)
+        self.non_ascii.discard(rel_path)
+        if entry is not None:
+            del self.paths[entry[0]]
+            self.dead_ids += 1
+            self.dirty = True
+
+    def _maybe_compact(self):
+        """Purge stale ids once they outnumber the live ones"""
+        if self.dead_ids <= max(len(self.paths), 1000):
+            return
+        live = self.paths
+        for trigram in list(self.postings):
+            posting = {i for i in self.postings[trigram] if i in live}
+            if posting:
+                self.postings[trigram] = posting
+            else:
+                del self.postings[trigram]
+        self.dead_ids = 0
+        self.dirty = True
@@ -0,0 +1,269 @@
+import os
+import ast
+import time
+from utils.file_utils import get_cache_dir, scan_project, read_cache_data, write_cache_data
+from utils.ast_cache import get_ast_cache
+
+class _XRefCollector(ast.NodeVisitor):
+    """Collect definitions, references, imports and calls from one module"""
+
+    def __init__(self):
+        self.stack = []
+        self.definitions = []
+        self.references = []
+        self.imports = []
+        self.calls = []
+        self.in_class = False
+
+    def _qualname(self, name):
+        return ".".join(self.stack + [name])
+
+    def _caller(self):
+        return ".".join(self.stack) or "<module>"
+
+    def _visit_definition(self, node, kind):
+        if kind == 'function' and self.in_class:
+            kind = 'method'
+        self.definitions.append((node.name, self._qualname(node.name), kind, node.lineno))
+        for child in getattr(node, 'decorator_list', []) + getattr(node, 'bases', []):
+            self.visit(child)
+        outer = self.in_class
+        self.in_class = kind == 'class'
+        self.stack.append(node.name)
+        for field in ('args', 'returns', 'keywords', 'body'):
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for child in value:
+                    self.visit(child)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+        self.stack.pop()
+        self.in_class = outer
+
+    def visit_ClassDef(self, node):
+        self._visit_definition(node, 'class')
+
+    def visit_FunctionDef(self, node):
+        self._visit_definition(node, 'function')
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append((alias.name, node.lineno))
+
+    def visit_ImportFrom(self, node):
+        module = "." * node.level + (node.module or "")
+        self.imports.append((module, node.lineno))
+        for alias in node.names:
+            if alias.name != '*':
+                self.references.append((alias.name, node.lineno))
+
+    def visit_Assign(self, node):
+        # Module and class level assignments are definitions too
+        if not self.stack or self.in_class:
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.definitions.append((target.id, self._qualname(target.id), 'variable', node.lineno))
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if not isinstance(node.ctx, ast.Store):
+            self.references.append((node.id, node.lineno))
+
+    def visit_Attribute(self, node):
+        self.references.append((node.attr, node.lineno))
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else getattr(func, 'attr', None)
+        if name:
+            self.calls.append((name, self._caller(), node.lineno))
+        self.generic_visit(node)
+
+class XRefIndex:
+    """Persistent, incremental cross-reference index for Python files.
+
+    Per-file records are kept alongside global maps from a short symbol name
+    to ``{rel_path: [entries]}``, so lookups are dict hits and re-indexing a
+    file only touches the names that file mentions.
+    """
+
+    VERSION = 2
+    INDEX_FILE = "xref_index.marshal"
+
+    def __init__(self, project_path):
+        self.project_path = os.path.abspath(project_path)
+        self.index_file = os.path.join(get_cache_dir(self.project_path), self.INDEX_FILE)
+        self._reset()
+        self.dirty = False
+        self.last_refresh = 0.0
+        self.load()
+
+    def _reset(self):
+        self.files = {}
+        self.definitions = {}
+        self.references = {}
+        self.callers = {}
+        self.importers = {}
+
+    def load(self):
+        """Load the index from disk, discarding it on version mismatch"""
+        data = read_cache_data(self.index_file)
+        if data is None:
+            return
+
+        try:
+            if data.get('version') == self.VERSION:
+                self.files = data['files']
+                self.definitions = data['definitions']
+                self.references = data['references']
+                self.callers = data['callers']
+                self.importers = data['importers']
+        except Exception:
+            self._reset()
+
+    def save(self):
+        """Persist the index atomically if it changed"""
+        if not self.dirty:
+            return
+
+        data = {
+            'version': self.VERSION,
+            'files': self.files,
+            'definitions': self.definitions,
+            'references': self.references,
+            'callers': self.callers,
+            'importers': self.importers
+        }
+        write_cache_data(self.index_file, data)
+        self.dirty = False
+
+    def refresh(self, files=None):
+        """Re-index Python files added or changed since the last refresh.
+
+        ``files`` is a ``scan_project`` listing to use instead of walking
+        the tree again.
+        """
+        seen = set()
+        if files is None:
+            files = scan_project(self.project_path)
+        for rel_path, stat in files:
+            if not rel_path.endswith('.py'):
+                continue
+            seen.add(rel_path)
+            entry = self.files.get(rel_path)
+            if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                self._index_file(rel_path, stat)
+
+        for rel_path in [p for p in self.files if p not in seen]:
+            self._remove_file(rel_path)
+        self.last_refresh = time.time()
+
+    def update_file(self, rel_path):
+        """Re-index a single file after it was created, modified or deleted"""
+        rel_path = os.path.normpath(rel_path)
+        if not rel_path.endswith('.py'):
+            return
+        try:
+            stat = os.stat(os.path.join(self.project_path, rel_path))
+        except OSError:
+            self._remove_file(rel_path)
+            return
+        self._index_file(rel_path, stat)
+
+    def find_definitions(self, symbol):
+        """Get (rel_path, line, kind, qualname) for a name or dotted qualname"""
+        name = symbol.split('.')[-1]
+        results = []
+        for rel_path, entries in self.definitions.get(name, {}).items():
+            for qualname, kind, line in entries:
+                if '.' not in symbol or self._matches_qualified(symbol, rel_path, qualname):
+                    results.append((rel_path, line, kind, qualname))
+        return sorted(results)
+
+    def find_references(self, symbol):
+        """Get (rel_path, line) for every use of a name.
+
+        Only the last part of a dotted symbol is matched: uses are recorded
+        by bare name, so ``a.foo`` also finds ``b.foo``.
+        """
+        name = symbol.split('.')[-1]
+        return sorted(
+            (rel_path, line)
+            for rel_path, lines in self.references.get(name, {}).items()
+            for line in lines
+        )
+
+    def find_callers(self, symbol):
+        """Get (rel_path, line, caller_qualname) for every call of a name.
+
+        Like ``find_references``, matches the bare name only.
+        """
+        name = symbol.split('.')[-1]
+        return sorted(
+            (rel_path, line, caller)
+            for rel_path, entries in self.callers.get(name, {}).items()
+            for caller, line in entries
+        )
+
+    def find_importers(self, module):
+        """Get the files importing a module"""
+        return sorted(self.importers.get(module, ()))
+
+    @staticmethod
+    def _matches_qualified(symbol, rel_path, qualname):
+        module = os.path.splitext(rel_path)[0].replace(os.sep, '.')
+        full_name = f"{module}.{qualname}"
+        return any(name == symbol or name.endswith('.' + symbol) for name in (qualname, full_name))
+
+    def _index_file(self, rel_path, stat):
+        """Replace the entries for one file"""
+        self._remove_file(rel_path)
+        collector = _XRefCollector()
+        try:
+            with open(os.path.join(self.project_path, rel_path), 'r', encoding='utf-8') as f:
+                collector.visit(get_ast_cache().parse(f.read()))
+        except Exception:
+            # Unreadable or unparsable files are tracked but contribute nothing
+            pass
+
+        record = {'definitions': set(), 'references': set(), 'callers': set(), 'imports': set()}
+        for name, qualname, kind, line in collector.definitions:
+            self.definitions.setdefault(name, {}).setdefault(rel_path, []).append((qualname, kind, line))
+            record['definitions'].add(name)
+        for name, line in collector.references:
+            self.references.setdefault(name, {}).setdefault(rel_path, []).append(line)
+            record['references'].add(name)
+        for name, caller, line in collector.calls:
+            self.callers.setdefault(name, {}).setdefault(rel_path, []).append((caller, line))
+            record['callers'].add(name)
+        for module, _ in collector.imports:
+            self.importers.setdefault(module, set()).add(rel_path)
+            record['imports'].add(module)
+
+        self.files[rel_path] = (stat.st_mtime_ns, stat.st_size, record)
+        self.dirty = True
+
+    def _remove_file(self, rel_path):
+        """Drop every entry contributed by one file"""
+        entry = self.files.pop(rel_path, None)
+        if entry is None:
+            return
+        record = entry[2]
+        for key in ('definitions', 'references', 'callers'):
+            table = getattr(self, key)
+            for name in record[key]:
+                by_file = table.get(name)
+                if by_file is not None:
+                    by_file.pop(rel_path, None)
+                    if not by_file:
+                        del table[name]
+        for module in record['imports']:
+            importers = self.importers.get(module)
+            if importers is not None:
+                importers.discard(rel_path)
+                if not importers:
+                    del self.importers[module]
+        self.dirty = True